@@ -0,0 +1,103 @@
+# Benchmark of choosing the next arcade sentence, at growing question banks.
+#
+# Run from the repository root with:
+#   python -m benchmarks.bench_arcade_scheduler [questions ...]
+#
+# The history is synthetic: ANSWERS answers to random sentences over the last 14 days. "bulk" is
+# sentence_scores(), the scores of all the sentences at once; "next" and "add" are the ArcadeScheduler.
+
+import datetime
+import random
+import sys
+import time
+
+from core.arcade_scheduler import ArcadeScheduler
+from core.scoring_arcade import (
+    Scoring_Arcade,
+    MIN_SCORE_AGE,
+    SCORE_WINDOW,
+    WEIGHT_POINTS,
+    weighting_slope,
+)
+from core.scoring_serialization import ScoreDO, ScoreHistoryDO
+
+SIZES = [1_000, 10_000, 50_000]
+ANSWERS = 20_000
+
+
+def make_arcade(questions: set[str], history: ScoreHistoryDO) -> Scoring_Arcade:
+    # Just what sentence_scores() needs, without a config and a questions file.
+    arcade = Scoring_Arcade.__new__(Scoring_Arcade)
+    arcade._questions = questions
+    arcade._score_history = history
+    return arcade
+
+
+def make_history(sentences: list[str], rng: random.Random) -> ScoreHistoryDO:
+    now = datetime.datetime.now()
+    history = [
+        ScoreDO.model_construct(
+            correct_sentence=rng.choice(sentences),
+            correct_accuracy=rng.random(),
+            flag_correct=True,
+            time_penalty=1.0,
+            timestamp=now - datetime.timedelta(seconds=rng.uniform(60, 14 * 86400)),
+        )
+        for _ in range(ANSWERS)
+    ]
+    history.sort(key=lambda score: score.timestamp)
+    return ScoreHistoryDO(history=history)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    rng = random.Random(0)
+    print(
+        f"{'questions':>10} {'bulk [ms]':>10} {'build [ms]':>11} {'next [us]':>10} {'add [us]':>10}"
+    )
+    for size in sizes:
+        sentences = [f"Zdanie numer {i}." for i in range(size)]
+        history = make_history(sentences, rng)
+        now = datetime.datetime.now()
+
+        start = time.perf_counter()
+        make_arcade(set(sentences), history).sentence_scores()[0]
+        bulk_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scheduler = ArcadeScheduler(
+            sentences,
+            history.scores_since(now - SCORE_WINDOW),
+            slope=weighting_slope(*WEIGHT_POINTS),
+            window=SCORE_WINDOW.total_seconds(),
+            min_age=MIN_SCORE_AGE.total_seconds(),
+            now=now,
+        )
+        build_time = time.perf_counter() - start
+
+        # One answer every few seconds, each to the sentence just chosen.
+        count = 2000
+        next_time = add_time = 0.0
+        for _ in range(count):
+            now += datetime.timedelta(seconds=5)
+            start = time.perf_counter()
+            sentence = scheduler.next_sentence(now)
+            next_time += time.perf_counter() - start
+            score = ScoreDO.model_construct(
+                correct_sentence=sentence,
+                correct_accuracy=rng.random(),
+                flag_correct=True,
+                time_penalty=1.0,
+                timestamp=now,
+            )
+            start = time.perf_counter()
+            scheduler.add_score(score, now)
+            add_time += time.perf_counter() - start
+
+        print(
+            f"{size:>10} {bulk_time * 1e3:10.1f} {build_time * 1e3:11.1f} {next_time / count * 1e6:10.2f} {add_time / count * 1e6:10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
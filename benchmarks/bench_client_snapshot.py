@@ -0,0 +1,70 @@
+# Time to the first arcade sentence, preparing the state from the files and from the snapshot of the client state.
+#
+# Run from the repository root with:
+#   python -m benchmarks.bench_client_snapshot [questions ...]
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from core.client_snapshot import write_client_snapshot
+from core.config import ConfigDataDO
+from core.scoring_arcade import Scoring_Arcade
+
+SIZES = [1_000, 10_000]
+
+
+def make_config(directory: Path, questions: int) -> ConfigDataDO:
+    questions_file = directory / "sentences.txt"
+    questions_file.write_text(
+        "\n".join(
+            f"Zdanie numer {i}, w którym Ala ma kota, a kot ma Alę."
+            for i in range(questions)
+        ),
+        "utf-8",
+    )
+    return ConfigDataDO(
+        story_mode=False,
+        questions_file=questions_file,
+        scores_file=directory / "scores.json",
+        history_file=directory / "history.json",
+        history_journal_file=directory / "history.jsonl",
+        snapshot_file=directory / "snapshot.bin",
+    )
+
+
+def first_sentence(config: ConfigDataDO, use_snapshot: bool) -> float:
+    start = time.perf_counter()
+    if use_snapshot:
+        assert config.load_snapshot() is not None
+    Scoring_Arcade(config).get_next_sentence()
+    ans = time.perf_counter() - start
+    config.close_storage()
+    return ans
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'questions':>10} {'from files [ms]':>16} {'from snapshot [ms]':>19}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            config = make_config(Path(directory), size)
+            first_sentence(config, False)  # Builds the persisted question index
+            cold = first_sentence(config, False)
+
+            scoring = Scoring_Arcade(config)
+            config.close_storage()
+            write_client_snapshot(
+                config,
+                scoring.question_index,
+                scoring.score_history,
+                scoring.sentence_scores(),
+                {},
+            )
+            warm = first_sentence(config, True)
+        print(f"{size:>10} {cold * 1000:>16.1f} {warm * 1000:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
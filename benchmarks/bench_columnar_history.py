@@ -0,0 +1,73 @@
+# Memory of the answer history as ScoreDOs and as ColumnarScoreHistory, and the time of an aggregate query.
+#
+# Run from the repository root with:
+#   python -m benchmarks.bench_columnar_history [size ...]
+
+import datetime
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from core.columnar_history import ColumnarScoreHistory
+from core.scoring_serialization import ScoreDO
+
+SIZES = [10_000, 100_000]
+SENTENCES = 500
+WORDS = 12
+
+
+def make_scores(size: int) -> list[ScoreDO]:
+    start = datetime.datetime.now() - datetime.timedelta(minutes=5 * size)
+    return [
+        ScoreDO(
+            correct_sentence=f"Zdanie numer {i % SENTENCES} jest trochę dłuższe od innych.",
+            respeak_sentence=f"Zdanie numer {i % SENTENCES} jest trochę dłuższe od innych.",
+            user_answer=f"zdanie numer {i % SENTENCES} jest trochę dłuższe",
+            timestamp=start + datetime.timedelta(minutes=5 * i),
+            saved_audio=Path(f"data/audio/user/{i}.wav"),
+            correct_accuracy=(i % 7) / 7,
+            time_penalty=1.0,
+            correct_words=[(i + j) % 5 != 0 for j in range(WORDS)],
+            respeak_words=[(i + j) % 4 != 0 for j in range(WORDS)],
+        )
+        for i in range(size)
+    ]
+
+
+def measure(build) -> tuple[object, int]:
+    tracemalloc.start()
+    ans = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return ans, size
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(
+        f"{'size':>10} {'ScoreDO [MB]':>13} {'columnar [MB]':>14} {'mean scan [ms]':>15} {'mean columnar [ms]':>19}"
+    )
+    for size in sizes:
+        scores, scores_memory = measure(lambda: make_scores(size))
+        columnar, columnar_memory = measure(lambda: ColumnarScoreHistory(scores))
+
+        start = time.perf_counter()
+        sums: dict[str, list[float]] = {}
+        for score in scores:
+            sums.setdefault(score.correct_sentence, []).append(score.overall_score)
+        {sentence: sum(values) / len(values) for sentence, values in sums.items()}
+        scan_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        columnar.mean_overall_score_by_sentence()
+        columnar_time = time.perf_counter() - start
+
+        print(
+            f"{size:>10} {scores_memory / 2**20:13.1f} {columnar_memory / 2**20:14.1f} "
+            f"{scan_time * 1e3:15.2f} {columnar_time * 1e3:19.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
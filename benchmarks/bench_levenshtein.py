@@ -0,0 +1,100 @@
+# Benchmark of the character alignment engines in core.levenshtein, across sentence lengths.
+#
+# Run from the repository root with:
+#   python -m benchmarks.bench_levenshtein
+#
+# The passages are cut from elf77.txt and the "user" version of each passage is a deterministic mutation of it,
+# so the numbers are comparable between runs.
+
+import difflib
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from core.levenshtein import bitparallel_edit_script, levenshtein_edit_script
+
+STORY_FILE = Path(__file__).parent.parent / "elf77.txt"
+LENGTHS = [50, 100, 200, 500, 1000, 2000, 5000, 10000]
+LEGACY_MAX_LENGTH = 500  # The pure-Python loop takes too long above that.
+
+
+def legacy_levenshtein(s1: str, s2: str) -> int:
+    # The pure-Python double loop that the NumPy engine replaced.
+    m, n = len(s1), len(s2)
+    dp = np.zeros((m + 1, n + 1), dtype=int)
+    operations = np.empty((m + 1, n + 1), dtype=str)
+    for i in range(m + 1):
+        for j in range(n + 1):
+            if i == 0:
+                dp[i][j] = j
+            elif j == 0:
+                dp[i][j] = i
+            elif s1[i - 1] == s2[j - 1]:
+                dp[i][j] = dp[i - 1][j - 1]
+            else:
+                dp[i][j] = 1 + min(dp[i - 1][j], dp[i][j - 1], dp[i - 1][j - 1])
+                if dp[i][j] == dp[i - 1][j] + 1:
+                    operations[i][j] = "D"
+                elif dp[i][j] == dp[i][j - 1] + 1:
+                    operations[i][j] = "I"
+                else:
+                    operations[i][j] = "S"
+    return dp[m][n]
+
+
+def mutate(text: str, rnd: random.Random, error_rate: float = 0.05) -> str:
+    chars = list(text)
+    for _ in range(int(len(chars) * error_rate)):
+        pos = rnd.randrange(len(chars))
+        op = rnd.random()
+        if op < 0.33:
+            del chars[pos]
+        elif op < 0.66:
+            chars.insert(pos, rnd.choice("aeiouyząęół "))
+        else:
+            chars[pos] = rnd.choice("aeiouyząęół ")
+    return "".join(chars)
+
+
+def timeit(fun, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def make_cases() -> list[tuple[str, str]]:
+    text = " ".join(STORY_FILE.read_text(encoding="utf-8").split())
+    rnd = random.Random(77)
+    return [(text[:length], mutate(text[:length], rnd)) for length in LENGTHS]
+
+
+def main():
+    print(
+        f"{'length':>8} {'legacy [s]':>12} {'numpy [s]':>12} {'bitparallel [s]':>16} {'difflib [s]':>12}"
+    )
+    for correct, user in make_cases():
+        if len(correct) <= LEGACY_MAX_LENGTH:
+            legacy = f"{timeit(legacy_levenshtein, correct, user, repeat=1):12.4f}"
+        else:
+            legacy = f"{'-':>12}"
+        numpy_time = timeit(levenshtein_edit_script, correct, user)
+        bitparallel_time = timeit(bitparallel_edit_script, correct, user)
+        difflib_time = timeit(
+            lambda a, b: difflib.SequenceMatcher(
+                None, a, b, autojunk=False
+            ).get_matching_blocks(),
+            correct,
+            user,
+        )
+        print(
+            f"{len(correct):>8} {legacy} {numpy_time:12.4f} {bitparallel_time:16.4f} {difflib_time:12.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Peak memory of the character alignment engines in core.levenshtein.
+#
+# Run from the repository root with:
+#   python -m benchmarks.bench_levenshtein_memory
+#
+# Every measurement runs in a fresh interpreter, because the peak resident set size (ru_maxrss) of a process
+# never goes down. The reported number is the growth of the peak RSS caused by a single alignment.
+
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_levenshtein import make_cases
+from core.levenshtein import EDIT_SCRIPT_ENGINES
+
+ENGINES = ["numpy-full", "hirschberg", "bitparallel"]
+
+
+def measure(engine: str, case_index: int) -> tuple[float, float]:
+    correct, user = make_cases()[case_index]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if engine == "numpy-full":
+        EDIT_SCRIPT_ENGINES["numpy"](correct, user, low_memory_threshold=sys.maxsize)
+    else:
+        EDIT_SCRIPT_ENGINES[engine](correct, user)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak - baseline) / 1024, elapsed  # ru_maxrss is in kB on Linux
+
+
+def main():
+    if len(sys.argv) == 3:
+        rss, elapsed = measure(sys.argv[1], int(sys.argv[2]))
+        print(f"{rss} {elapsed}")
+        return
+
+    header = f"{'length':>8}"
+    for engine in ENGINES:
+        header += f" {engine + ' [MB]':>18} {engine + ' [s]':>17}"
+    print(header)
+    for case_index, (correct, _) in enumerate(make_cases()):
+        line = f"{len(correct):>8}"
+        for engine in ENGINES:
+            out = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_levenshtein_memory",
+                    engine,
+                    str(case_index),
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.split()
+            line += f" {float(out[0]):18.1f} {float(out[1]):17.4f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
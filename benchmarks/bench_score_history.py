@@ -0,0 +1,87 @@
+# Benchmark of the indexed ScoreHistoryDO, at growing history sizes.
+#
+# Run from the repository root with:
+#   python -m benchmarks.bench_score_history [size ...]
+#
+# The history is synthetic: SENTENCES distinct sentences answered in turn, one answer every few minutes,
+# so the last 14 days hold only the tail of it.
+
+import datetime
+import sys
+import time
+
+from core.scoring_serialization import ScoreDO, ScoreHistoryDO
+
+SIZES = [10_000, 100_000, 1_000_000]
+SENTENCES = 500
+ANSWER_INTERVAL = datetime.timedelta(minutes=5)
+
+
+def make_history(size: int) -> ScoreHistoryDO:
+    start = datetime.datetime.now() - size * ANSWER_INTERVAL
+    # model_construct skips the validation, which would dominate the set-up time.
+    history = [
+        ScoreDO.model_construct(
+            correct_sentence=f"Zdanie numer {i % SENTENCES}.",
+            timestamp=start + i * ANSWER_INTERVAL,
+        )
+        for i in range(size)
+    ]
+    return ScoreHistoryDO.model_construct(history=history)
+
+
+def full_scan(
+    history: ScoreHistoryDO, since: datetime.datetime, sentence: str
+) -> list[ScoreDO]:
+    # What finding the recent answers of a sentence costs without the index.
+    return [
+        score
+        for score in history.history
+        if score.correct_sentence == sentence and score.timestamp >= since
+    ]
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(
+        f"{'size':>10} {'index [s]':>10} {'scan [ms]':>10} {'bisect [ms]':>12} {'add [us]':>10}"
+    )
+    for size in sizes:
+        history = make_history(size)
+        history.__init__(history=history.history)  # The state right after loading
+        since = datetime.datetime.now() - datetime.timedelta(days=14)
+        sentence = "Zdanie numer 7."
+
+        start = time.perf_counter()
+        history.scores_by_sentence(sentence)
+        index_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = full_scan(history, since, sentence)
+        scan_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(100):
+            found = history.scores_since(since, sentence)
+        bisect_time = (time.perf_counter() - start) / 100
+        assert found == expected
+
+        count = 1000
+        start = time.perf_counter()
+        for i in range(count):
+            history.add_score(
+                ScoreDO.model_construct(
+                    correct_sentence=f"Zdanie numer {i % SENTENCES}.",
+                    timestamp=datetime.datetime.now(),
+                ),
+                f"Zdanie numer {i % SENTENCES}.",
+            )
+        add_time = (time.perf_counter() - start) / count
+
+        print(
+            f"{size:>10} {index_time:10.3f} {scan_time * 1e3:10.2f} {bisect_time * 1e3:12.4f} {add_time * 1e6:10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
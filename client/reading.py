@@ -14,22 +14,27 @@ from core import (
     get_resource_path,
     ConfigDataDO,
     IScoring,
-    IRespeak,
     load_config,
     Scoring_Arcade,
     Scoring_Story,
     TotalScoreDO,
     ScoreDO,
-    VoiceSample,
     just_letters_mapping,
     get_respeak_server,
+    CachedRespeak,
+    write_client_snapshot,
 )
 from .recorder import Recorder
 from .speech2text import Speech2Text
 
 
-def highlight_sentence(correct_sentence: str, words: list[bool]) -> str:
-    char_ranges = just_letters_mapping(correct_sentence)
+def highlight_sentence(
+    correct_sentence: str,
+    words: list[bool],
+    char_ranges: list[tuple[int, int]] | None = None,
+) -> str:
+    if char_ranges is None:
+        char_ranges = just_letters_mapping(correct_sentence)
     formatted_text = ""
     last_end = 0
     for i, (start, end) in enumerate(char_ranges):
@@ -51,7 +56,8 @@ class Answer(BaseModel):
     question: str
     answer: str
     accuracy: float
-    recording: VoiceSample
+    # Read back through the recording writer, from the archive or while it is still being written.
+    saved_audio: Path
 
 
 class ReadingApp:
@@ -60,6 +66,7 @@ class ReadingApp:
     _recorder: Recorder
     _speech2text: Speech2Text
     _config: ConfigDataDO
+    _config_path: Path
 
     started_recording: bool
     rerolled: int
@@ -83,11 +90,13 @@ class ReadingApp:
     _effort_label: tk.Label
     _clear_button: tk.Button
 
-    _respeak_executor: IRespeak
+    _respeak_executor: CachedRespeak
     respoken_sentence: str
 
-    def __init__(self, config: ConfigDataDO):
+    def __init__(self, config: ConfigDataDO, config_path: Path = Path("config.json")):
         self._config = config
+        self._config_path = config_path
+        snapshot = config.load_snapshot()
 
         self._total_score = config.load_total_scores()
 
@@ -96,6 +105,7 @@ class ReadingApp:
             self._scoring.set_next_sentence(self._total_score.story_index)
         else:
             self._scoring = Scoring_Arcade(config)
+        config.start_recording_retention(self._scoring.score_history.all_scores)
 
         self._recorder = Recorder()
 
@@ -117,7 +127,13 @@ class ReadingApp:
             server_url=config.whisper_host,
             run_locally=config.run_whisper_locally,
         )
-        self._respeak_executor = get_respeak_server(self._speech2text)
+        self._respeak_executor = CachedRespeak(
+            lambda: get_respeak_server(self._speech2text),
+            {
+                **config.question_store().respeak_transcripts(),
+                **(snapshot.respeak_transcripts() if snapshot is not None else {}),
+            },
+        )
 
         self._user_answer = None
         self._replay_last_button = None
@@ -268,12 +284,16 @@ class ReadingApp:
             # TODO replace with place or pack, rare case if answered 2 times and on 3rd time recording is too short
             return
 
+        saved_audio_file = (
+            self._config.recordings_directory
+            / f"{datetime.datetime.now().isoformat(sep='-', timespec='seconds')}.wav"
+        )
         self.answers.append(
             Answer(
                 question=self.current_sentence,
                 answer=transcript,
                 accuracy=0,
-                recording=self._recorder.get_last_recording(),
+                saved_audio=saved_audio_file,
             )
         )
         self.current_answer = len(self.answers) - 1
@@ -290,16 +310,10 @@ class ReadingApp:
             self.setup_multiple_answers_ui()
 
         self.update_window_size()
-        self.check_answer(transcript)
+        self.check_answer(transcript, saved_audio_file)
 
-    def check_answer(self, transcript: str):
-        self._config.recordings_directory.mkdir(parents=True, exist_ok=True)
-        saved_audio_file = (
-            self._config.recordings_directory
-            / f"{datetime.datetime.now().isoformat(sep='-', timespec='seconds')}.wav"
-        )
+    def check_answer(self, transcript: str, saved_audio_file: Path):
         last_audio = self._recorder.get_last_recording()
-        last_audio.save(saved_audio_file)
 
         score: ScoreDO = self._scoring.set_sentence_answer(
             sentence=self.current_sentence,
@@ -309,9 +323,17 @@ class ReadingApp:
             speaking_time=last_audio.length(),
             saved_audio_path=saved_audio_file,
         )
+        # Compressed and written in the background, see core.recording_archive.
+        self._config.recording_writer().submit(
+            last_audio, saved_audio_file, score.accuracy
+        )
         self._last_score = score
         self.update_scores(True)
-        redacted_answer_in_html = highlight_sentence(self.current_sentence, score.words)
+        redacted_answer_in_html = highlight_sentence(
+            self.current_sentence,
+            score.words,
+            self._scoring.get_char_ranges(self.current_sentence),
+        )
         self.answers[-1].accuracy = score.accuracy
         self.answers[-1].question = redacted_answer_in_html
 
@@ -410,21 +432,27 @@ class ReadingApp:
 
     def update_scores(self, show_delta=False):
         self._accuracy_score_label["text"] = (
-            f"Accuracy: {self._total_score.accuracy : .2f}"
+            f"Accuracy: {self._total_score.accuracy: .2f}"
         )
         self._total_questions_label["text"] = (
             f"Total questions: {self._total_score.total_questions}"
         )
-        self._effort_label["text"] = f"Effort: {self._total_score.effort_done : .0f}"
+        self._effort_label["text"] = f"Effort: {self._total_score.effort_done: .0f}"
         if show_delta:
             self._accuracy_score_label["text"] += (
                 f" + {np.round(self._last_score.accuracy, 2)}"
             )
             self._total_questions_label["text"] += " + 1"
-            self._effort_label["text"] += f" + {self._last_score.effort : .0f}"
+            self._effort_label["text"] += f" + {self._last_score.effort: .0f}"
 
     def replay_answer(self, event):
-        song = self.answers[self.current_answer].recording
+        # Decoded from the archive, so the answers do not keep their audio in memory.
+        song = self._config.recording_writer().load(
+            self.answers[self.current_answer].saved_audio
+        )
+        if song is None:
+            print("The recording is gone, e.g. evicted by the retention")
+            return
         Thread(target=song.play).start()
 
     def insert_colored_text(self, html_text):
@@ -556,7 +584,7 @@ class ReadingApp:
     def run_locally(self, popup, process_last_recording):
         loading = self.loading_popup("Loading", "Loading... ")
         self._config.run_whisper_locally = True
-        self._config.save_config()
+        self._config.save_later(self._config_path)
         self._speech2text.__init__(
             server_url=self._config.whisper_host,
             run_locally=self._config.run_whisper_locally,
@@ -585,6 +613,19 @@ class ReadingApp:
     def window(self):
         return self._window
 
+    def write_snapshot(self):
+        """Writes the prepared state for the next start, see core.client_snapshot."""
+        arcade_scores = None
+        if isinstance(self._scoring, Scoring_Arcade):
+            arcade_scores = self._scoring.sentence_scores()
+        write_client_snapshot(
+            self._config,
+            self._scoring.question_index,
+            self._scoring.score_history,
+            arcade_scores,
+            self._respeak_executor.transcripts,
+        )
+
 
 def main(config_path: Path = None):
     if config_path is None:
@@ -618,8 +659,10 @@ def main(config_path: Path = None):
         config.whisper_host = args.whisper_server
         config.run_whisper_locally = False
 
-    app = ReadingApp(config)
+    app = ReadingApp(config, config_path)
     try:
         app.window.mainloop()
     finally:
+        app._config.close_storage()
         app._config.save(config_path)
+        app.write_snapshot()
@@ -9,7 +9,11 @@ from .config import ConfigDataDO as ConfigDataDO, load_config as load_config
 
 from .scoring_arcade import Scoring_Arcade as Scoring_Arcade
 from .scoring_story import Scoring_Story as Scoring_Story
-from .sentence_accuracy import score_sentence
+from .sentence_accuracy import (
+    score_sentence,
+    score_sentences_batch as score_sentences_batch,
+    PreparedSentence as PreparedSentence,
+)
 
 from .voice_sample import VoiceSample as VoiceSample, voice_sample_from_wav
 
@@ -28,7 +32,12 @@ from .scoring_serialization import (
     ScoreDO as ScoreDO,
 )
 
-from .respeak_sentence import get_respeak_server as get_respeak_server
+from .client_snapshot import write_client_snapshot as write_client_snapshot
+
+from .respeak_sentence import (
+    get_respeak_server as get_respeak_server,
+    CachedRespeak as CachedRespeak,
+)
 
 __all__ = [
     "create_and_load_file",
@@ -40,6 +49,8 @@ __all__ = [
     "Scoring_Arcade",
     "Scoring_Story",
     "score_sentence",
+    "score_sentences_batch",
+    "PreparedSentence",
     "VoiceSample",
     "get_resource_path",
     "IScoring",
@@ -50,5 +61,7 @@ __all__ = [
     "ScoreHistoryDO",
     "ScoreDO",
     "get_respeak_server",
+    "CachedRespeak",
+    "write_client_snapshot",
     "voice_sample_from_wav",
 ]
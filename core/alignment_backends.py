@@ -0,0 +1,186 @@
+import difflib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from . import levenshtein
+
+AUTO_BACKEND = "auto"
+# The word-level engine of core.token_alignment. It aligns whole words, so it has no character matching blocks: as the
+# default backend it maps the words of the answers (see sentence_accuracy.word_mapper), while the character alignments
+# keep the automatic selection.
+TOKEN_BACKEND = "tokens"
+
+# With the automatic selection, inputs up to that many characters stay with difflib (the historical behaviour),
+# the longer ones go to the first backend of _auto_preference that fits into MEMORY_FRACTION of the available memory.
+DIFFLIB_MAX_LENGTH = 2000
+MEMORY_FRACTION = 0.25
+
+
+class AlignmentBackend:
+    """A named way of computing the matching blocks of two strings, with an estimate of its memory use."""
+
+    _name: str
+    _matching_blocks: Callable[[str, str], list]
+    _bytes_per_cell: float  # Memory use per cell of the (len(a), len(b)) table
+
+    def __init__(
+        self,
+        name: str,
+        matching_blocks: Callable[[str, str], list],
+        bytes_per_cell: float,
+    ):
+        self._name = name
+        self._matching_blocks = matching_blocks
+        self._bytes_per_cell = bytes_per_cell
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def matching_blocks(self, a: str, b: str) -> list:
+        return self._matching_blocks(a, b)
+
+    def memory_needed(self, len_a: int, len_b: int) -> float:
+        return self._bytes_per_cell * len_a * len_b
+
+
+class BackendCounters:
+    """How much traffic a backend has handled."""
+
+    calls: int
+    seconds: float
+    characters: int  # Sum of len(a) + len(b) of all the calls
+
+    def __init__(self, calls: int = 0, seconds: float = 0.0, characters: int = 0):
+        self.calls = calls
+        self.seconds = seconds
+        self.characters = characters
+
+    def __repr__(self):
+        return f"BackendCounters(calls={self.calls}, seconds={self.seconds:.3f}, characters={self.characters})"
+
+
+_backends: dict[str, AlignmentBackend] = {}
+_auto_preference: list[str] = []
+_default_backend: str = AUTO_BACKEND
+_counters: dict[str, BackendCounters] = {}
+_counters_lock = threading.Lock()
+
+
+def register_backend(backend: AlignmentBackend, auto: bool = False):
+    """Makes the backend available by its name. With auto=True it is also a candidate of the automatic selection,
+    tried after the backends registered before it."""
+    _backends[backend.name] = backend
+    if auto and backend.name not in _auto_preference:
+        _auto_preference.append(backend.name)
+
+
+def backend_names() -> list[str]:
+    return list(_backends) + [TOKEN_BACKEND]
+
+
+def set_default_backend(name: str):
+    """Sets the backend used instead of the automatic selection, or AUTO_BACKEND to go back to it."""
+    global _default_backend
+    if name not in (AUTO_BACKEND, TOKEN_BACKEND) and name not in _backends:
+        raise ValueError(
+            f"Unknown alignment backend {name!r}, expected one of {[AUTO_BACKEND] + backend_names()}"
+        )
+    _default_backend = name
+
+
+def default_backend() -> str:
+    return _default_backend
+
+
+def available_memory() -> int | None:
+    """Available physical memory in bytes, or None if the platform does not tell."""
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def select_backend(len_a: int, len_b: int) -> str:
+    """The name of the backend to align strings of the given lengths with."""
+    if _default_backend not in (AUTO_BACKEND, TOKEN_BACKEND):
+        return _default_backend
+    if max(len_a, len_b) <= DIFFLIB_MAX_LENGTH:
+        return "difflib"
+    memory = available_memory()
+    for name in _auto_preference:
+        if (
+            memory is None
+            or _backends[name].memory_needed(len_a, len_b) <= memory * MEMORY_FRACTION
+        ):
+            return name
+    return _auto_preference[-1]
+
+
+@contextmanager
+def count_call(name: str, characters: int):
+    """Adds the duration of the block to the counters of the backend."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _counters_lock:
+            counters = _counters.setdefault(name, BackendCounters())
+            counters.calls += 1
+            counters.seconds += elapsed
+            counters.characters += characters
+
+
+def get_backend_counters() -> dict[str, BackendCounters]:
+    """A copy of the counters of all the backends that have been called."""
+    with _counters_lock:
+        return {
+            name: BackendCounters(c.calls, c.seconds, c.characters)
+            for name, c in _counters.items()
+        }
+
+
+def reset_backend_counters():
+    with _counters_lock:
+        _counters.clear()
+
+
+def matching_blocks(a: str, b: str, backend: str = AUTO_BACKEND) -> list:
+    """Matching blocks of the two strings, computed by the given backend (or the selected one for AUTO_BACKEND)."""
+    if backend == AUTO_BACKEND:
+        backend = select_backend(len(a), len(b))
+    with count_call(backend, len(a) + len(b)):
+        return _backends[backend].matching_blocks(a, b)
+
+
+def _levenshtein_backend(engine: str) -> Callable[[str, str], list]:
+    def matching_blocks(a: str, b: str) -> list:
+        return levenshtein.SequenceMatcher(a, b, engine=engine).get_matching_blocks()
+
+    return matching_blocks
+
+
+register_backend(
+    AlignmentBackend(
+        "difflib",
+        lambda a, b: difflib.SequenceMatcher(
+            None, a, b, autojunk=False
+        ).get_matching_blocks(),
+        0.0,
+    )
+)
+# The bit vectors of the 4 deltas of each column.
+register_backend(
+    AlignmentBackend("bitparallel", _levenshtein_backend("bitparallel"), 0.5),
+    auto=True,
+)
+# The uint8 direction matrix; levenshtein itself switches to the low-memory walk above its threshold.
+register_backend(AlignmentBackend("numpy", _levenshtein_backend("numpy"), 1.0))
+register_backend(
+    AlignmentBackend("hirschberg", _levenshtein_backend("hirschberg"), 0.0),
+    auto=True,
+)
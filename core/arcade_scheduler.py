@@ -0,0 +1,321 @@
+"""Incremental choice of the next sentence in the arcade mode.
+
+The score of a sentence (see Scoring_Arcade.sentence_score) is the mean of the overall scores of its answers from
+the last `window` seconds, weighted by amplitude * exp(slope * age), with the age at least `min_age`. The weights of
+two answers differ by exp(slope * (t1 - t2)) whatever the current time is, so the mean does not change as time
+passes: each sentence keeps the weighted sums of its answers relative to its latest answer, and they change only
+when an answer is added, becomes older than min_age or drops out of the window. A heap of the scores of all the
+sentences then gives the lowest one in O(log Q).
+
+decayed_means computes the same scores from scratch for all the sentences at once, with NumPy: for the statistics,
+after an import or with other weighting parameters. The scheduler starts from it too.
+
+The answers younger than min_age have a weight that does change with time; their sentences (only the ones answered
+in the last minute) are kept out of the heap and scored directly until the answers settle."""
+
+import datetime
+import heapq
+import math
+from typing import Iterable
+
+import numpy as np
+
+from .scoring_serialization import ScoreDO
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def timestamp_seconds(timestamp: datetime.datetime) -> float:
+    """Seconds since 1970, without the local time zone, like the naive timestamps of the scores and datetime.now()."""
+    return (timestamp - _EPOCH).total_seconds()
+
+
+def score_arrays(
+    scores: Iterable[ScoreDO], sentence_ids: dict[str, int]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The sentence ids, timestamp_seconds and overall scores of the answers to the sentences of sentence_ids."""
+    rows = [
+        (
+            sentence_ids[score.correct_sentence],
+            timestamp_seconds(score.timestamp),
+            score.overall_score,
+        )
+        for score in scores
+        if score.correct_sentence in sentence_ids
+    ]
+    if len(rows) == 0:
+        return np.empty(0, np.int64), np.empty(0), np.empty(0)
+    ids, seconds, values = zip(*rows)
+    return np.array(ids, np.int64), np.array(seconds), np.array(values)
+
+
+def decayed_means(
+    sentence_ids: np.ndarray,
+    seconds: np.ndarray,
+    values: np.ndarray,
+    sentence_count: int,
+    slope: float,
+    window: float,
+    min_age: float,
+    now: float,
+) -> np.ndarray:
+    """The arcade score of each sentence id: the weighted mean of the values of its answers from the last `window`
+    seconds, with the weights exp(slope * age) and the age at least min_age. 0 for the sentences without answers.
+
+    The answers from the future (after a change of the clock) count as just given."""
+    recent = seconds >= now - window
+    ids = sentence_ids[recent]
+    age = np.maximum(now - seconds[recent], min_age)
+    # Relative to the weight at min_age, so that none of them overflows or underflows.
+    weights = np.exp(slope * (age - min_age))
+    weighted_sums = np.bincount(
+        ids, weights=weights * values[recent], minlength=sentence_count
+    )
+    weight_sums = np.bincount(ids, weights=weights, minlength=sentence_count)
+    return np.divide(
+        weighted_sums,
+        weight_sums,
+        out=np.zeros(sentence_count),
+        where=weight_sums > 0,
+    )
+
+
+class _SentenceSums:
+    """The settled answers of one sentence, as weighted sums relative to the latest of them."""
+
+    weighted: float  # Of overall_score * exp(slope * (last - t))
+    weights: float  # Of exp(slope * (last - t))
+    last: float
+    count: int
+
+    def __init__(self):
+        self.weighted = self.weights = self.last = 0.0
+        self.count = 0
+
+    def add(self, t: float, value: float, slope: float):
+        if self.count == 0:
+            self.weighted, self.weights, self.last = value, 1.0, t
+        elif t >= self.last:
+            decay = math.exp(slope * (t - self.last))
+            self.weighted = self.weighted * decay + value
+            self.weights = self.weights * decay + 1.0
+            self.last = t
+        else:
+            weight = math.exp(slope * (self.last - t))
+            self.weighted += value * weight
+            self.weights += weight
+        self.count += 1
+
+    def remove(self, t: float, value: float, slope: float):
+        self.count -= 1
+        if self.count == 0:
+            self.weighted = self.weights = 0.0  # Exactly, without the rounding errors
+            return
+        weight = math.exp(slope * (self.last - t))
+        self.weighted -= value * weight
+        self.weights -= weight
+
+    @property
+    def mean(self) -> float:
+        return self.weighted / self.weights if self.count > 0 else 0.0
+
+
+class ArcadeScheduler:
+    """Keeps the arcade scores of the sentences up to date and picks the one with the lowest score.
+
+    Ties are broken by the sentence, as in sorted(Scoring_Arcade.sentence_scores())."""
+
+    _slope: float
+    _window: float
+    _min_age: float
+    _sums: dict[str, _SentenceSums]
+    _priority: dict[str, float]  # The score of each sentence from its settled answers
+    # May hold outdated entries; the ones that differ from _priority are skipped.
+    _heap: list[tuple[float, str]]
+    # The answers younger than min_age, as (t, seq, sentence, overall_score).
+    _pending: list[tuple[float, int, str, float]]
+    _pending_counts: dict[str, int]
+    # The same, for the settled answers, to expire them.
+    _settled: list[tuple[float, int, str, float]]
+    _seq: int
+
+    def __init__(
+        self,
+        sentences: Iterable[str],
+        scores: Iterable[ScoreDO],
+        slope: float,
+        window: float,
+        min_age: float,
+        now: datetime.datetime | None = None,
+    ):
+        """:param scores: The answers from the last `window` seconds. The ones of other sentences are ignored."""
+        if now is None:
+            now = datetime.datetime.now()
+        self._slope = slope
+        self._window = window
+        self._min_age = min_age
+        self._sums = {sentence: _SentenceSums() for sentence in sentences}
+        self._pending_counts = {}
+        self._seq = 0
+        self._start(scores, timestamp_seconds(now))
+        self._priority = {sentence: sums.mean for sentence, sums in self._sums.items()}
+        self._rebuild_heap()
+
+    def _start(self, scores: Iterable[ScoreDO], now: float):
+        # The sums of all the sentences at once, as in decayed_means but relative to the latest answer of each.
+        sentences = list(self._sums)
+        ids, seconds, values = score_arrays(
+            scores, {sentence: i for i, sentence in enumerate(sentences)}
+        )
+        recent = seconds >= now - self._window
+        settled = recent & (seconds <= now - self._min_age)
+        pending = recent & ~settled
+
+        settled_ids = ids[settled]
+        last = np.full(len(sentences), -np.inf)
+        np.maximum.at(last, settled_ids, seconds[settled])
+        weights = np.exp(self._slope * (last[settled_ids] - seconds[settled]))
+        weighted_sums = np.bincount(
+            settled_ids, weights=weights * values[settled], minlength=len(sentences)
+        )
+        weight_sums = np.bincount(
+            settled_ids, weights=weights, minlength=len(sentences)
+        )
+        counts = np.bincount(settled_ids, minlength=len(sentences))
+        for i in np.flatnonzero(counts).tolist():
+            sums = self._sums[sentences[i]]
+            sums.weighted = float(weighted_sums[i])
+            sums.weights = float(weight_sums[i])
+            sums.last = float(last[i])
+            sums.count = int(counts[i])
+
+        self._settled = self._entries(
+            sentences, ids[settled], seconds[settled], values[settled]
+        )
+        self._pending = self._entries(
+            sentences, ids[pending], seconds[pending], values[pending]
+        )
+        for _, _, sentence, _ in self._pending:
+            self._pending_counts[sentence] = self._pending_counts.get(sentence, 0) + 1
+
+    def _entries(
+        self,
+        sentences: list[str],
+        ids: np.ndarray,
+        seconds: np.ndarray,
+        values: np.ndarray,
+    ) -> list[tuple[float, int, str, float]]:
+        ans = list(
+            zip(
+                seconds.tolist(),
+                range(self._seq, self._seq + len(ids)),
+                [sentences[i] for i in ids.tolist()],
+                values.tolist(),
+            )
+        )
+        self._seq += len(ids)
+        heapq.heapify(ans)
+        return ans
+
+    def __len__(self):
+        return len(self._sums)
+
+    def _rebuild_heap(self):
+        self._heap = [
+            (priority, sentence)
+            for sentence, priority in self._priority.items()
+            if sentence not in self._pending_counts
+        ]
+        heapq.heapify(self._heap)
+
+    def _update(self, sentence: str):
+        self._priority[sentence] = priority = self._sums[sentence].mean
+        if sentence not in self._pending_counts:
+            heapq.heappush(self._heap, (priority, sentence))
+            if len(self._heap) > 2 * len(self._priority) + 64:
+                self._rebuild_heap()
+
+    def _add(self, score: ScoreDO, now: float):
+        sentence = score.correct_sentence
+        if sentence not in self._sums:
+            return
+        t = timestamp_seconds(score.timestamp)
+        if t < now - self._window:
+            return
+        entry = (t, self._seq, sentence, score.overall_score)
+        self._seq += 1
+        if t > now - self._min_age:
+            self._pending_counts[sentence] = self._pending_counts.get(sentence, 0) + 1
+            heapq.heappush(self._pending, entry)
+            return
+        self._sums[sentence].add(t, entry[3], self._slope)
+        heapq.heappush(self._settled, entry)
+        self._update(sentence)
+
+    def add_score(self, score: ScoreDO, now: datetime.datetime | None = None):
+        """Counts a new answer. O(log Q)."""
+        if now is None:
+            now = datetime.datetime.now()
+        now_seconds = timestamp_seconds(now)
+        self._advance(now_seconds)
+        self._add(score, now_seconds)
+
+    def _advance(self, now: float):
+        # Settles the answers that are now older than min_age, then expires the ones that left the window.
+        while self._pending and self._pending[0][0] <= now - self._min_age:
+            entry = heapq.heappop(self._pending)
+            t, _, sentence, value = entry
+            self._pending_counts[sentence] -= 1
+            if self._pending_counts[sentence] == 0:
+                del self._pending_counts[sentence]
+            if t >= now - self._window:
+                self._sums[sentence].add(t, value, self._slope)
+                heapq.heappush(self._settled, entry)
+            self._update(sentence)
+        while self._settled and self._settled[0][0] < now - self._window:
+            t, _, sentence, value = heapq.heappop(self._settled)
+            self._sums[sentence].remove(t, value, self._slope)
+            self._update(sentence)
+
+    def _pending_score(self, sentence: str, now: float) -> float:
+        # The answers younger than min_age all weigh as if they were min_age old.
+        sums = self._sums[sentence]
+        weighted, weights = sums.weighted, sums.weights
+        if sums.count == 0:
+            weight = 1.0
+        else:
+            weight = math.exp(self._slope * (sums.last - (now - self._min_age)))
+        for _, _, pending_sentence, value in self._pending:
+            if pending_sentence == sentence:
+                weighted += value * weight
+                weights += weight
+        return weighted / weights
+
+    def score(self, sentence: str, now: datetime.datetime | None = None) -> float:
+        if now is None:
+            now = datetime.datetime.now()
+        now_seconds = timestamp_seconds(now)
+        self._advance(now_seconds)
+        if sentence in self._pending_counts:
+            return self._pending_score(sentence, now_seconds)
+        return self._priority[sentence]
+
+    def next_sentence(self, now: datetime.datetime | None = None) -> str:
+        """The sentence with the lowest score. Raises IndexError if there are no sentences."""
+        if now is None:
+            now = datetime.datetime.now()
+        now_seconds = timestamp_seconds(now)
+        self._advance(now_seconds)
+        heap = self._heap
+        while heap and (
+            heap[0][1] in self._pending_counts
+            or heap[0][0] != self._priority[heap[0][1]]
+        ):
+            heapq.heappop(heap)
+        candidates = heap[:1] + [
+            (self._pending_score(sentence, now_seconds), sentence)
+            for sentence in self._pending_counts
+        ]
+        if len(candidates) == 0:
+            raise IndexError("There are no sentences to choose from")
+        return min(candidates)[1]
@@ -0,0 +1,231 @@
+"""A single-file container of NumPy arrays and string tables, read through mmap.
+
+The file starts with MAGIC, the length of the json header (uint64, little endian) and the header, a
+ContainerHeaderDO. The sections follow, each aligned to ALIGNMENT bytes. Reading a container maps the file and views
+the sections in place, so opening it costs the same however large it is, and only the pages that are used are read.
+
+A string table is two sections: the UTF-8 bytes of all the strings and the uint64 offsets of their starts (and of
+the end). Ragged arrays (e.g. the char ranges of every sentence) are stored the same way."""
+
+import hashlib
+import mmap
+import os
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from pydantic import BaseModel, ValidationError
+
+MAGIC = b"LRSKBIN\x01"
+ALIGNMENT = 64
+_LENGTH_SIZE = 8
+
+
+class SectionDO(BaseModel):
+    offset: int  # From the start of the file
+    dtype: str  # numpy dtype.str, e.g. "<f8"
+    shape: list[int]
+
+
+class ContainerHeaderDO(BaseModel):
+    format: str = "loudreading-binary"
+    version: int = 1
+    kind: str = ""  # What the container holds, e.g. "client-snapshot"
+    metadata: dict = {}
+    sections: dict[str, SectionDO] = {}
+    payload_sha256: str = ""  # Of everything after the header
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _ragged_parts(items: list[np.ndarray], dtype) -> tuple[np.ndarray, np.ndarray]:
+    lengths = np.array([len(item) for item in items], dtype=np.uint64)
+    offsets = np.zeros(len(items) + 1, dtype=np.uint64)
+    np.cumsum(lengths, out=offsets[1:])
+    if len(items) == 0:
+        return np.empty(0, dtype=dtype), offsets
+    return np.concatenate([np.asarray(item, dtype=dtype) for item in items]), offsets
+
+
+class BinaryWriter:
+    """Collects the sections of a container, then writes them at once."""
+
+    _kind: str
+    _metadata: dict
+    _arrays: dict[str, np.ndarray]
+
+    def __init__(self, kind: str, metadata: dict | None = None):
+        self._kind = kind
+        self._metadata = metadata or {}
+        self._arrays = {}
+
+    def add_array(self, name: str, array: np.ndarray):
+        self._arrays[name] = np.ascontiguousarray(array)
+
+    def add_ragged(self, name: str, items: list[np.ndarray], dtype):
+        data, offsets = _ragged_parts(items, dtype)
+        self.add_array(f"{name}.data", data)
+        self.add_array(f"{name}.offsets", offsets)
+
+    def add_strings(self, name: str, strings: list[str]):
+        self.add_ragged(
+            name,
+            [np.frombuffer(s.encode("utf-8"), dtype=np.uint8) for s in strings],
+            np.uint8,
+        )
+
+    def write(self, path: Path):
+        """Writes the container through a temporary file and os.replace."""
+        # The offsets depend on the header length, which depends on the offsets; a few rounds settle it.
+        header_size = 0
+        while True:
+            sections = {}
+            offset = _aligned(len(MAGIC) + _LENGTH_SIZE + header_size)
+            payload_start = offset
+            for name, array in self._arrays.items():
+                sections[name] = SectionDO(
+                    offset=offset, dtype=array.dtype.str, shape=list(array.shape)
+                )
+                offset = _aligned(offset + array.nbytes)
+            header = ContainerHeaderDO(
+                kind=self._kind,
+                metadata=self._metadata,
+                sections=sections,
+                payload_sha256="0" * 64,  # The length of the real one
+            )
+            if len(header.model_dump_json().encode()) <= header_size:
+                break
+            header_size = len(header.model_dump_json().encode()) + 64
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            # The header goes there once the hash is known.
+            f.write(b"\0" * payload_start)
+            digest = hashlib.sha256()
+            for name, array in self._arrays.items():
+                data = array.tobytes() + b"\0" * (
+                    _aligned(sections[name].offset + array.nbytes)
+                    - sections[name].offset
+                    - array.nbytes
+                )
+                f.write(data)
+                digest.update(data)
+            header.payload_sha256 = digest.hexdigest()
+            f.seek(0)
+            f.write(MAGIC)
+            f.write(header_size.to_bytes(_LENGTH_SIZE, "little"))
+            f.write(header.model_dump_json().encode().ljust(header_size))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+class RaggedArray:
+    """A list of arrays stored as one data array and the offsets into it."""
+
+    _data: np.ndarray
+    _offsets: np.ndarray
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._data
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self._data[int(self._offsets[index]) : int(self._offsets[index + 1])]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_list(self) -> list:
+        """All the items as lists, much faster than indexing them one by one."""
+        data = self._data.tolist()
+        offsets = self._offsets.tolist()
+        return [data[offsets[i] : offsets[i + 1]] for i in range(len(self))]
+
+
+class StringTable(RaggedArray):
+    """A RaggedArray of UTF-8 strings, decoded on access."""
+
+    def __getitem__(self, index: int) -> str:
+        return bytes(super().__getitem__(index)).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_list(self) -> list[str]:
+        data = self._data.tobytes()
+        offsets = self._offsets.tolist()
+        return [
+            data[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(len(self))
+        ]
+
+
+class BinaryContainer:
+    """A container opened for reading. The arrays it returns are read-only views of the mapped file.
+
+    Raises ValueError if the file is not a container of the expected kind, or (with verify=True) if it is damaged."""
+
+    _path: Path
+    _mmap: mmap.mmap
+    _header: ContainerHeaderDO
+
+    def __init__(self, path: Path, kind: str | None = None, verify: bool = True):
+        self._path = path
+        with path.open("rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"{path} is empty")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a binary container")
+        header_start = len(MAGIC) + _LENGTH_SIZE
+        header_size = int.from_bytes(self._mmap[len(MAGIC) : header_start], "little")
+        try:
+            self._header = ContainerHeaderDO.model_validate_json(
+                self._mmap[header_start : header_start + header_size].rstrip()
+            )
+        except ValidationError as e:
+            raise ValueError(f"{path} has a damaged header") from e
+        if kind is not None and self._header.kind != kind:
+            raise ValueError(f"{path} holds {self._header.kind!r}, not {kind!r}")
+        if verify:
+            payload_start = _aligned(header_start + header_size)
+            digest = hashlib.sha256(memoryview(self._mmap)[payload_start:]).hexdigest()
+            if digest != self._header.payload_sha256:
+                raise ValueError(f"{path} is damaged")
+
+    @property
+    def metadata(self) -> dict:
+        return self._header.metadata
+
+    def has(self, name: str) -> bool:
+        return name in self._header.sections
+
+    def array(self, name: str) -> np.ndarray:
+        section = self._header.sections[name]
+        dtype = np.dtype(section.dtype)
+        count = int(np.prod(section.shape, dtype=np.int64))
+        return np.frombuffer(
+            self._mmap, dtype=dtype, count=count, offset=section.offset
+        ).reshape(section.shape)
+
+    def ragged(self, name: str) -> RaggedArray:
+        return RaggedArray(self.array(f"{name}.data"), self.array(f"{name}.offsets"))
+
+    def strings(self, name: str) -> StringTable:
+        return StringTable(self.array(f"{name}.data"), self.array(f"{name}.offsets"))
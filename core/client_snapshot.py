@@ -0,0 +1,193 @@
+"""Snapshot of the prepared client state, for a fast start.
+
+On a clean shutdown the client writes the entries of the question index, a few history aggregates, the arcade scores
+of the sentences and the respeak transcripts it has into one binary container (see core.binary_container). On the next
+start the snapshot is mapped instead of preparing all that again, if it is still valid: the config must hash the same, the
+source files (questions, history, total scores) must have the same mtime and size as when it was written, and the
+payload must match its hash. Anything else and the snapshot is ignored, and the state is prepared as before.
+
+The arcade scores decay with time, so the ones from the snapshot only choose the first sentence."""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .binary_container import BinaryContainer, BinaryWriter
+from .question_index import QuestionEntryDO, QuestionIndexDO
+from .scoring_serialization import ScoreHistoryDO
+
+if TYPE_CHECKING:
+    from .config import ConfigDataDO
+
+SNAPSHOT_KIND = "client-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def _source_files(config: ConfigDataDO) -> list[Path]:
+    ans = [config.questions_file, config.scores_file]
+    if config.story_bundle_file is not None:
+        ans.append(config.story_bundle_file)
+    if config.storage_backend == "sqlite":
+        ans.append(config.database_file)
+    else:
+        ans += [
+            config.history_journal_file,
+            config.history_journal_file.with_suffix(".snapshot.jsonl"),
+        ]
+    return ans
+
+
+def _source_stamps(config: ConfigDataDO) -> dict[str, list[int] | None]:
+    ans = {}
+    for path in _source_files(config):
+        try:
+            stat = path.stat()
+            ans[str(path)] = [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            ans[str(path)] = None
+    return ans
+
+
+def _config_hash(config: ConfigDataDO) -> str:
+    return hashlib.sha256(config.model_dump_json().encode()).hexdigest()
+
+
+class ClientSnapshot:
+    """A valid snapshot, mapped into memory."""
+
+    _container: BinaryContainer
+
+    def __init__(self, container: BinaryContainer):
+        self._container = container
+
+    @property
+    def written_at(self) -> datetime.datetime:
+        return datetime.datetime.fromisoformat(self._container.metadata["written_at"])
+
+    @property
+    def history_size(self) -> int:
+        """Number of the answers in the loaded history."""
+        return self._container.metadata["history_size"]
+
+    def question_index(self) -> QuestionIndexDO:
+        """The index of the questions file, without re-reading and re-hashing it."""
+        sentences = self._container.strings("sentences").to_list()
+        letters = self._container.strings("letters").to_list()
+        char_ranges = self._container.ragged("char_ranges")
+        # Tuples of all the sentences at once, then a slice of them for each.
+        flat = char_ranges.data.reshape(-1).tolist()
+        pairs = list(zip(flat[0::2], flat[1::2]))
+        range_offsets = char_ranges.offsets.tolist()
+        timeouts = self._container.array("timeouts").tolist()
+        efforts = self._container.array("efforts").tolist()
+        return QuestionIndexDO.model_construct(
+            questions_hash=self._container.metadata["questions_hash"],
+            entries=[
+                QuestionEntryDO.model_construct(
+                    sentence=sentences[i],
+                    letters=letters[i],
+                    char_ranges=pairs[range_offsets[i] : range_offsets[i + 1]],
+                    timeout=timeouts[i],
+                    effort=efforts[i],
+                )
+                for i in range(len(sentences))
+            ],
+        )
+
+    def answer_counts(self) -> dict[str, int]:
+        """Number of the answers to each indexed question in the loaded history."""
+        counts = self._container.array("answer_counts")
+        return dict(
+            zip(self._container.strings("sentences").to_list(), counts.tolist())
+        )
+
+    def arcade_scores(self) -> list[tuple[float, str]] | None:
+        """Scoring_Arcade.sentence_scores() at the time of the snapshot, if it was in the arcade mode."""
+        if not self._container.has("arcade_scores"):
+            return None
+        scores = self._container.array("arcade_scores").tolist()
+        sentences = self._container.strings("arcade_sentences").to_list()
+        return list(zip(scores, sentences))
+
+    def respeak_transcripts(self) -> dict[str, str]:
+        return dict(
+            zip(
+                self._container.strings("respeak_sentences").to_list(),
+                self._container.strings("respeak_transcripts").to_list(),
+            )
+        )
+
+
+def write_client_snapshot(
+    config: ConfigDataDO,
+    question_index: QuestionIndexDO,
+    history: ScoreHistoryDO,
+    arcade_scores: list[tuple[float, str]] | None,
+    respeak_transcripts: dict[str, str],
+):
+    """Writes the snapshot to config.snapshot_file. Call it after the storage is closed, so the stamps are final."""
+    writer = BinaryWriter(
+        SNAPSHOT_KIND,
+        {
+            "version": SNAPSHOT_VERSION,
+            "written_at": datetime.datetime.now().isoformat(),
+            "config_hash": _config_hash(config),
+            "sources": _source_stamps(config),
+            "questions_hash": question_index.questions_hash,
+            "history_size": len(history.history),
+        },
+    )
+    entries = question_index.indexed_entries()
+    writer.add_strings("sentences", [entry.sentence for entry in entries])
+    writer.add_strings("letters", [entry.letters for entry in entries])
+    writer.add_ragged(
+        "char_ranges",
+        [
+            np.array(entry.char_ranges, dtype=np.int32).reshape(-1, 2)
+            for entry in entries
+        ],
+        np.int32,
+    )
+    writer.add_array("timeouts", np.array([entry.timeout for entry in entries]))
+    writer.add_array("efforts", np.array([entry.effort for entry in entries]))
+    writer.add_array(
+        "answer_counts",
+        np.array(
+            [len(history.scores_by_sentence(entry.sentence)) for entry in entries],
+            dtype=np.int32,
+        ),
+    )
+    if arcade_scores is not None:
+        writer.add_array(
+            "arcade_scores", np.array([score for score, _ in arcade_scores])
+        )
+        writer.add_strings(
+            "arcade_sentences", [sentence for _, sentence in arcade_scores]
+        )
+    writer.add_strings("respeak_sentences", list(respeak_transcripts))
+    writer.add_strings("respeak_transcripts", list(respeak_transcripts.values()))
+    writer.write(config.snapshot_file)
+
+
+def load_client_snapshot(config: ConfigDataDO) -> ClientSnapshot | None:
+    """The snapshot of config.snapshot_file, or None if there is none or it is not valid any more."""
+    if not config.snapshot_file.exists():
+        return None
+    try:
+        container = BinaryContainer(config.snapshot_file, SNAPSHOT_KIND)
+    except ValueError as e:
+        print(f"Ignoring the snapshot: {e}")
+        return None
+    metadata = container.metadata
+    if (
+        metadata.get("version") != SNAPSHOT_VERSION
+        or metadata.get("config_hash") != _config_hash(config)
+        or metadata.get("sources") != _source_stamps(config)
+    ):
+        return None
+    return ClientSnapshot(container)
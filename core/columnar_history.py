@@ -0,0 +1,285 @@
+"""Columnar in-memory representation of the answer history.
+
+A ScoreDO is a pydantic model with two lists of bools, a Path, a datetime and a few strings, so a long history takes
+far more memory than its data. ColumnarScoreHistory keeps the same data as NumPy columns: the numbers and the
+timestamps as arrays, the word results as packed bits (each answer's bits start at a byte boundary, found through an
+offsets array) and all the strings interned into one table. ScoreDOs are made on access, and the aggregate queries
+work on the whole columns at once."""
+
+import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from .arcade_scheduler import decayed_means, timestamp_seconds
+from .scoring_serialization import ScoreDO, ScoreHistoryDO
+
+_FLOAT_FIELDS = (
+    "respeak_accuracy",
+    "correct_accuracy",
+    "effort_done",
+    "thinking_time",
+    "speaking_time",
+    "time_penalty",
+)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(
+    axis=1, dtype=np.int64
+)
+_STRING_FIELDS = ("correct_sentence", "respeak_sentence", "user_answer", "saved_audio")
+
+
+class _GrowableArray:
+    """A NumPy array with amortized O(1) appends."""
+
+    _data: np.ndarray
+    _size: int
+
+    def __init__(self, dtype, capacity: int = 16):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size: int):
+        if size > len(self._data):
+            data = np.empty(max(size, 2 * len(self._data)), dtype=self._data.dtype)
+            data[: self._size] = self._data[: self._size]
+            self._data = data
+
+    def append(self, value):
+        self._reserve(self._size + 1)
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values: np.ndarray):
+        self._reserve(self._size + len(values))
+        self._data[self._size : self._size + len(values)] = values
+        self._size += len(values)
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+
+class _PackedBits:
+    """Lists of bools, each packed into whole bytes of one buffer."""
+
+    _bits: _GrowableArray  # uint8
+    # Byte offset of each list in _bits, and the end of the last one.
+    _starts: _GrowableArray
+    _lengths: _GrowableArray  # Number of bools of each list
+
+    def __init__(self):
+        self._bits = _GrowableArray(np.uint8)
+        self._starts = _GrowableArray(np.int64)
+        self._starts.append(0)
+        self._lengths = _GrowableArray(np.int32)
+
+    def append(self, flags: list[bool]):
+        packed = np.packbits(np.asarray(flags, dtype=bool))
+        self._bits.extend(packed)
+        self._starts.append(len(self._bits))
+        self._lengths.append(len(flags))
+
+    def __getitem__(self, index: int) -> list[bool]:
+        starts = self._starts.values
+        packed = self._bits.values[starts[index] : starts[index + 1]]
+        return (
+            np.unpackbits(packed, count=int(self._lengths.values[index]))
+            .astype(bool)
+            .tolist()
+        )
+
+    def counts(self) -> tuple[np.ndarray, np.ndarray]:
+        """(number of True, number of bools) of each list."""
+        # Padding bits are 0, so counting the bits of whole bytes counts just the flags.
+        ones = np.concatenate([[0], np.cumsum(_POPCOUNT[self._bits.values])])
+        starts = self._starts.values
+        return ones[starts[1:]] - ones[starts[:-1]], self._lengths.values.astype(
+            np.int64
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self._bits.nbytes + self._starts.nbytes + self._lengths.nbytes
+
+
+class ColumnarScoreHistory:
+    """The answer history in columns, see the module docstring. Indexing gives ScoreDOs, in the order of appending."""
+
+    _floats: dict[str, _GrowableArray]
+    _timestamps: _GrowableArray  # datetime64[us]
+    _flag_correct: _GrowableArray  # bool
+    _string_ids: dict[str, _GrowableArray]  # Index into _strings, per string field
+    _correct_words: _PackedBits
+    _respeak_words: _PackedBits
+    _strings: list[str]
+    _string_index: dict[str, int]
+
+    def __init__(self, scores: Iterable[ScoreDO] = ()):
+        self._floats = {name: _GrowableArray(np.float64) for name in _FLOAT_FIELDS}
+        self._timestamps = _GrowableArray("datetime64[us]")
+        self._flag_correct = _GrowableArray(bool)
+        self._string_ids = {name: _GrowableArray(np.int32) for name in _STRING_FIELDS}
+        self._correct_words = _PackedBits()
+        self._respeak_words = _PackedBits()
+        self._strings = []
+        self._string_index = {}
+        for score in scores:
+            self.append(score)
+
+    @staticmethod
+    def from_history(history: ScoreHistoryDO) -> "ColumnarScoreHistory":
+        return ColumnarScoreHistory(history.history)
+
+    def to_history(self) -> ScoreHistoryDO:
+        ans = ScoreHistoryDO()
+        for score in self:
+            ans.add_score(score, score.correct_sentence)
+        return ans
+
+    def _intern(self, text: str) -> int:
+        ans = self._string_index.get(text)
+        if ans is None:
+            ans = len(self._strings)
+            self._strings.append(text)
+            self._string_index[text] = ans
+        return ans
+
+    def append(self, score: ScoreDO):
+        for name, column in self._floats.items():
+            column.append(getattr(score, name))
+        self._timestamps.append(np.datetime64(score.timestamp, "us"))
+        self._flag_correct.append(score.flag_correct)
+        for name, column in self._string_ids.items():
+            column.append(self._intern(str(getattr(score, name))))
+        self._correct_words.append(score.correct_words)
+        self._respeak_words.append(score.respeak_words)
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def __getitem__(self, index: int) -> ScoreDO:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        strings = {
+            name: self._strings[column.values[index]]
+            for name, column in self._string_ids.items()
+        }
+        return ScoreDO.model_construct(
+            **{
+                name: float(column.values[index])
+                for name, column in self._floats.items()
+            },
+            timestamp=self._timestamps.values[index].astype(datetime.datetime),
+            flag_correct=bool(self._flag_correct.values[index]),
+            correct_sentence=strings["correct_sentence"],
+            respeak_sentence=strings["respeak_sentence"],
+            user_answer=strings["user_answer"],
+            saved_audio=Path(strings["saved_audio"]),
+            correct_words=self._correct_words[index],
+            respeak_words=self._respeak_words[index],
+        )
+
+    def __iter__(self) -> Iterator[ScoreDO]:
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the columns, without the interned strings."""
+        return (
+            sum(column.nbytes for column in self._floats.values())
+            + self._timestamps.nbytes
+            + self._flag_correct.nbytes
+            + sum(column.nbytes for column in self._string_ids.values())
+            + self._correct_words.nbytes
+            + self._respeak_words.nbytes
+        )
+
+    # Vectorized queries
+
+    def column(self, name: str) -> np.ndarray:
+        """One of the float columns (e.g. "time_penalty"), "timestamp" or "flag_correct", as a read-only view."""
+        if name == "timestamp":
+            ans = self._timestamps.values
+        elif name == "flag_correct":
+            ans = self._flag_correct.values
+        else:
+            ans = self._floats[name].values
+        ans = ans.view()
+        ans.flags.writeable = False
+        return ans
+
+    def accuracies(self) -> np.ndarray:
+        """ScoreDO.accuracy of every answer."""
+        return np.where(
+            self._flag_correct.values,
+            self._floats["correct_accuracy"].values,
+            self._floats["respeak_accuracy"].values,
+        )
+
+    def overall_scores(self) -> np.ndarray:
+        """ScoreDO.overall_score of every answer."""
+        return self.accuracies() * self._floats["time_penalty"].values
+
+    def sentence_ids(self) -> tuple[np.ndarray, list[str]]:
+        """Dense id of the correct sentence of every answer, and the sentences by their id."""
+        unique, inverse = np.unique(
+            self._string_ids["correct_sentence"].values, return_inverse=True
+        )
+        return inverse, [self._strings[i] for i in unique.tolist()]
+
+    def mean_by_sentence(self, values: np.ndarray) -> dict[str, float]:
+        """Mean of the per-answer values over the answers of each sentence."""
+        ids, sentences = self.sentence_ids()
+        sums = np.bincount(ids, weights=values, minlength=len(sentences))
+        counts = np.bincount(ids, minlength=len(sentences))
+        return dict(zip(sentences, (sums / counts).tolist()))
+
+    def mean_overall_score_by_sentence(self) -> dict[str, float]:
+        return self.mean_by_sentence(self.overall_scores())
+
+    def decayed_mean_by_sentence(
+        self,
+        slope: float,
+        window: float,
+        min_age: float,
+        now: datetime.datetime,
+    ) -> dict[str, float]:
+        """The arcade score of each answered sentence, see arcade_scheduler.decayed_means."""
+        ids, sentences = self.sentence_ids()
+        # datetime64[us] counts the microseconds since 1970, as timestamp_seconds does the seconds.
+        seconds = self._timestamps.values.astype(np.int64) / 1e6
+        means = decayed_means(
+            ids,
+            seconds,
+            self.overall_scores(),
+            len(sentences),
+            slope=slope,
+            window=window,
+            min_age=min_age,
+            now=timestamp_seconds(now),
+        )
+        return dict(zip(sentences, means.tolist()))
+
+    def word_accuracies(self) -> np.ndarray:
+        """Fraction of the correctly read words of every answer, from its correct_words or respeak_words."""
+        correct_ok, correct_count = self._correct_words.counts()
+        respeak_ok, respeak_count = self._respeak_words.counts()
+        flag = self._flag_correct.values
+        ok = np.where(flag, correct_ok, respeak_ok)
+        count = np.where(flag, correct_count, respeak_count)
+        return np.divide(ok, count, out=np.zeros(len(ok)), where=count > 0)
+
+    def indices_since(self, since: datetime.datetime) -> np.ndarray:
+        """Indices of the answers given at or after `since`."""
+        return np.flatnonzero(self._timestamps.values >= np.datetime64(since, "us"))
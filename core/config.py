@@ -1,10 +1,23 @@
-import json
+import datetime
 from pathlib import Path
+from typing import Callable, Iterable
 
 from pydantic import AnyUrl, BaseModel, field_serializer
 
 from core import create_and_load_file_str
-from .scoring_serialization import ScoreHistoryDO, TotalScoreDO
+from .client_snapshot import ClientSnapshot, load_client_snapshot
+from .iface_storage import IScoreStorage
+from .recording_archive import RecordingArchive, RecordingWriter
+from .recording_retention import RecordingRetention
+from .question_index import QuestionIndexDO
+from .iface_questions import IQuestionSource
+from .question_store import QuestionStore
+from .scoring_serialization import ScoreDO, ScoreHistoryDO, TotalScoreDO
+from .storage_json import JsonScoreStorage
+from .storage_sqlite import SqliteScoreStorage, import_storage
+from .story_bundle import StoryBundle
+from .util import write_text_atomically
+from .write_behind import WriteBehind
 
 
 class ConfigDataDO(BaseModel):
@@ -17,10 +30,39 @@ class ConfigDataDO(BaseModel):
     max_answers_per_question: int = 2
     whisper_host: AnyUrl = AnyUrl("http://192.168.42.5:8000")
     questions_file: Path = Path("data/sentences.txt")
+    # A compiled questions file, used instead of it; see core.story_bundle.
+    story_bundle_file: Path | None = None
     answers_file: Path = Path("data/answers.json")
     scores_file: Path = Path("data/scores.json")
     recordings_directory: Path = Path("data/audio/user")
-    history_file: Path = Path("data/history.json")
+    recordings_format: str = "flac"  # See core.recording_archive.FORMATS
+    _recording_writer: RecordingWriter | None = None
+    # Retention of the recordings, see core.recording_retention. None disables the limit; with both limits off, as by
+    # default, no recording is ever deleted.
+    recordings_max_bytes: int | None = None
+    recordings_max_age_days: float | None = None
+    recordings_keep_days: float = 14.0
+    recordings_keep_accuracy_below: float = 0.5
+    _recording_retention: RecordingRetention | None = None
+    history_file: Path = Path("data/history.json")  # Before the journal; migrated once
+    history_journal_file: Path = Path("data/history.jsonl")
+    # Answers older than that are read only on demand; None loads all of them.
+    history_window_days: float | None = 14.0
+    storage_backend: str = "json"  # "json" or "sqlite"
+    # Used by the "sqlite" storage_backend
+    database_file: Path = Path("data/scores.sqlite3")
+    _storage: IScoreStorage | None = None
+    # See core.alignment_backends; "tokens" maps the words with the word-level engine of core.token_alignment.
+    alignment_backend: str = "auto"
+    # Above that many dp cells the character alignment does not keep the whole direction matrix; see core.levenshtein.
+    alignment_low_memory_cells: int = 4_000_000
+    snapshot_file: Path = Path("data/client_snapshot.bin")  # See core.client_snapshot
+    _snapshot: ClientSnapshot | None = None
+    # The total scores and the config are written that long after their last change.
+    save_debounce_seconds: float = 1.0
+    _write_behind: WriteBehind | None = None
+    _question_store: IQuestionSource | None = None
+    _question_store_file: Path | None = None
 
     @field_serializer("whisper_host")
     def serialize_whisper_host(self, value: AnyUrl):
@@ -35,33 +77,147 @@ class ConfigDataDO(BaseModel):
     def save(self, config_path: Path = Path("config.json")):
         if config_path is None:
             config_path = Path("config.json")
-        config_path.write_text(self.model_dump_json(indent=4))
+        write_text_atomically(config_path, self.model_dump_json(indent=4))
+
+    def save_later(self, config_path: Path = Path("config.json")):
+        """Like save, but through the write-behind."""
+        text = self.model_dump_json(indent=4)
+        self.write_behind().mark_dirty(
+            ("config", config_path), lambda: write_text_atomically(config_path, text)
+        )
+
+    def write_behind(self) -> WriteBehind:
+        if self._write_behind is None:
+            self._write_behind = WriteBehind(self.save_debounce_seconds)
+        return self._write_behind
+
+    def storage(self) -> IScoreStorage:
+        if self._storage is None:
+            json_storage = JsonScoreStorage(
+                self.history_journal_file, self.history_file, self.scores_file
+            )
+            if self.storage_backend == "json":
+                self._storage = json_storage
+            elif self.storage_backend == "sqlite":
+                new_database = not self.database_file.exists()
+                self._storage = SqliteScoreStorage(self.database_file)
+                if new_database and any(
+                    path.exists()
+                    for path in (
+                        self.history_journal_file,
+                        self.history_file,
+                        self.scores_file,
+                    )
+                ):
+                    import_storage(json_storage, self._storage)
+                    json_storage.close()
+            else:
+                raise ValueError(f"Unknown storage backend {self.storage_backend!r}")
+        return self._storage
+
+    def recording_writer(self) -> RecordingWriter:
+        if self._recording_writer is None:
+            self._recording_writer = RecordingWriter(
+                RecordingArchive(self.recordings_directory, self.recordings_format)
+            )
+        return self._recording_writer
+
+    def start_recording_retention(
+        self, references: Callable[[], Iterable[ScoreDO]] | None = None
+    ):
+        """Starts the retention of the recordings in the background. references gives all the answers, to adopt
+        the recordings from before the archive. Does nothing unless one of the limits is set."""
+        if self.recordings_max_bytes is None and self.recordings_max_age_days is None:
+            return
+        if self._recording_retention is None:
+            self._recording_retention = RecordingRetention(
+                self.recording_writer().archive,
+                max_bytes=self.recordings_max_bytes,
+                max_age_days=self.recordings_max_age_days,
+                keep_days=self.recordings_keep_days,
+                keep_accuracy_below=self.recordings_keep_accuracy_below,
+                references=references,
+            )
+            self._recording_retention.start()
+
+    def close_storage(self):
+        """Writes what the write-behind and the recording writer still have pending and closes the storage."""
+        if self._recording_retention is not None:
+            self._recording_retention.close()
+            self._recording_retention = None
+        if self._recording_writer is not None:
+            self._recording_writer.close()
+            self._recording_writer = None
+        if self._write_behind is not None:
+            self._write_behind.close()
+            self._write_behind = None
+        if self._storage is not None:
+            self._storage.close()
+            self._storage = None
 
     def save_history(self, history_file: ScoreHistoryDO):
-        self.history_file.write_text(history_file.model_dump_json(indent=4), "utf-8")
+        """Writes the whole history."""
+        self.storage().save_history(history_file)
+
+    def append_history(self, score: ScoreDO, history_file: ScoreHistoryDO):
+        """Stores the score that was just added to the history."""
+        self.storage().append_score(score, history_file)
 
-    def load_history(self) -> ScoreHistoryDO:
-        if not self.history_file.exists():
-            return ScoreHistoryDO()
-        json_text = self.history_file.read_text()
-        return ScoreHistoryDO(**json.loads(json_text))
+    def load_history(self, complete: bool = False) -> ScoreHistoryDO:
+        """Loads the answers of the last history_window_days (see ScoreHistoryDO.older_scores), or all of them."""
+        since = None
+        if not complete and self.history_window_days is not None:
+            since = datetime.datetime.now() - datetime.timedelta(
+                days=self.history_window_days
+            )
+        return self.storage().load_history(since)
 
     def load_questions(self) -> list[str]:
-        if not self.questions_file.exists():
-            return []
-        return self.questions_file.read_text().split("\n")
+        return list(self.question_store())
 
-    def load_total_scores(self) -> TotalScoreDO:
-        if not self.scores_file.exists():
-            ans = TotalScoreDO()
+    def question_store(self) -> IQuestionSource:
+        """The lines of the story bundle or of the questions file, read on demand. Shared by everything that uses the
+        same file."""
+        source_file = self.story_bundle_file or self.questions_file
+        if self._question_store is None or self._question_store_file != source_file:
+            if self.story_bundle_file is not None:
+                self._question_store = StoryBundle(self.story_bundle_file)
+            else:
+                self._question_store = QuestionStore(self.questions_file)
+            self._question_store_file = source_file
+        return self._question_store
+
+    def load_snapshot(self) -> ClientSnapshot | None:
+        """Maps the snapshot of the client state, if it is valid. The loading methods then use it."""
+        self._snapshot = load_client_snapshot(self)
+        return self._snapshot
+
+    @property
+    def snapshot(self) -> ClientSnapshot | None:
+        return self._snapshot
+
+    def load_question_index(self) -> QuestionIndexDO:
+        """The index of the questions, filled from the question store as the sentences are asked, so the questions
+        file is not read as a whole. Starts with the entries of the snapshot, if there is one."""
+        store = self.question_store()
+        if self.story_bundle_file is not None:
+            assert isinstance(store, StoryBundle)
+            ans = QuestionIndexDO(questions_hash=store.questions_hash)
+        elif self._snapshot is not None:
+            ans = self._snapshot.question_index()
         else:
-            json_text = self.scores_file.read_text()
-            ans = TotalScoreDO(**json.loads(json_text))
-        ans.set_scores_file(self.scores_file)
+            ans = QuestionIndexDO()
+        ans.set_lookup(store.entry)
+        return ans
+
+    def load_total_scores(self) -> TotalScoreDO:
+        """The total scores, saved through the write-behind."""
+        ans = self.storage().load_total_scores()
+        ans.set_write_behind(self.write_behind())
         return ans
 
     def save_total_scores(self, total_score: TotalScoreDO):
-        self.scores_file.write_text(total_score.model_dump_json(indent=4))
+        self.storage().save_total_scores(total_score)
 
 
 def load_config(config_path: Path = Path("config.json")) -> ConfigDataDO:
@@ -0,0 +1,302 @@
+"""Streaming export of the whole answer history, for analysing it elsewhere.
+
+The answers are read from the storage one by one (see stream_history) and written out as they come, so the memory
+use does not depend on the length of the history. The formats are CSV, NDJSON (one ScoreDO per line) and a NumPy
+.npz with one array per column. The .npz columns are spooled to temporary files in chunks and copied into the archive
+at the end; strings and word results are stored as in core.binary_container, as `<column>.data` and
+`<column>.offsets`.
+
+The script can also rebuild the daily and per-sentence rollups of the total scores from the history, for the answers
+given before the rollups existed."""
+
+import argparse
+import csv
+import datetime
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import IO, Callable, Iterable, Iterator
+
+import numpy as np
+
+from .config import ConfigDataDO, load_config
+from .scoring_serialization import RollupDO, ScoreDO, TotalScoreDO
+
+FORMATS = ("csv", "ndjson", "npz")
+
+CSV_COLUMNS = [
+    "timestamp",
+    "correct_sentence",
+    "respeak_sentence",
+    "user_answer",
+    "saved_audio",
+    "flag_correct",
+    "accuracy",
+    "respeak_accuracy",
+    "correct_accuracy",
+    "time_penalty",
+    "overall_score",
+    "effort_done",
+    "effort",
+    "thinking_time",
+    "speaking_time",
+    "correct_words",
+    "respeak_words",
+]
+
+_NPZ_FLOATS = (
+    "respeak_accuracy",
+    "correct_accuracy",
+    "effort_done",
+    "thinking_time",
+    "speaking_time",
+    "time_penalty",
+)
+_NPZ_STRINGS = ("correct_sentence", "respeak_sentence", "user_answer", "saved_audio")
+_NPZ_WORDS = ("correct_words", "respeak_words")
+
+
+def stream_history(config: ConfigDataDO) -> Iterator[ScoreDO]:
+    """All the answers in the configured storage, the oldest first, read lazily."""
+    # With the window starting at the end of time, nothing is loaded up front and everything is an older score.
+    history = config.storage().load_history(datetime.datetime.max)
+    return history.all_scores()
+
+
+def _words_text(words: list[bool]) -> str:
+    return "".join("1" if ok else "0" for ok in words)
+
+
+def export_csv(scores: Iterable[ScoreDO], f: IO[str]) -> int:
+    """Writes the scores as CSV with CSV_COLUMNS. Returns the number of the rows."""
+    writer = csv.writer(f)
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for score in scores:
+        writer.writerow(
+            [
+                score.timestamp.isoformat(),
+                score.correct_sentence,
+                score.respeak_sentence,
+                score.user_answer,
+                str(score.saved_audio),
+                int(score.flag_correct),
+                score.accuracy,
+                score.respeak_accuracy,
+                score.correct_accuracy,
+                score.time_penalty,
+                score.overall_score,
+                score.effort_done,
+                score.effort,
+                score.thinking_time,
+                score.speaking_time,
+                _words_text(score.correct_words),
+                _words_text(score.respeak_words),
+            ]
+        )
+        count += 1
+    return count
+
+
+def export_ndjson(scores: Iterable[ScoreDO], f: IO[str]) -> int:
+    count = 0
+    for score in scores:
+        f.write(score.model_dump_json())
+        f.write("\n")
+        count += 1
+    return count
+
+
+class _Spool:
+    """A 1-D array written to a temporary file in chunks."""
+
+    _file: IO[bytes]
+    _dtype: np.dtype
+    _count: int
+
+    def __init__(self, dtype):
+        self._file = tempfile.TemporaryFile()
+        self._dtype = np.dtype(dtype)
+        self._count = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._dtype
+
+    def write(self, values):
+        array = np.asarray(values, dtype=self._dtype)
+        self._file.write(array.tobytes())
+        self._count += len(array)
+
+    def copy_to_npy(self, f: IO[bytes]):
+        np.lib.format.write_array_header_1_0(
+            f,
+            {
+                "descr": np.lib.format.dtype_to_descr(self._dtype),
+                "fortran_order": False,
+                "shape": (self._count,),
+            },
+        )
+        self._file.seek(0)
+        shutil.copyfileobj(self._file, f)
+
+    def close(self):
+        self._file.close()
+
+
+class _RaggedSpool:
+    """Variable-length items as a data spool and an offsets spool."""
+
+    _data: _Spool
+    _offsets: _Spool
+
+    def __init__(self, dtype):
+        self._data = _Spool(dtype)
+        self._offsets = _Spool(np.uint64)
+        self._offsets.write([0])
+
+    def write(self, items: list):
+        lengths = np.array([len(item) for item in items], dtype=np.uint64)
+        self._offsets.write(self._data.count + np.cumsum(lengths, dtype=np.uint64))
+        if len(items) > 0:
+            self._data.write(
+                np.concatenate(
+                    [np.asarray(item, dtype=self._data.dtype) for item in items]
+                )
+            )
+
+    def spools(self, name: str) -> dict[str, _Spool]:
+        return {f"{name}.data": self._data, f"{name}.offsets": self._offsets}
+
+
+def export_npz(scores: Iterable[ScoreDO], path: Path, chunk_size: int = 10_000) -> int:
+    """Writes the scores as .npz columns, holding at most chunk_size of them in memory."""
+    floats = {name: _Spool(np.float64) for name in _NPZ_FLOATS}
+    timestamps = _Spool("datetime64[us]")
+    flags = _Spool(bool)
+    strings = {name: _RaggedSpool(np.uint8) for name in _NPZ_STRINGS}
+    words = {name: _RaggedSpool(bool) for name in _NPZ_WORDS}
+
+    def write_chunk(chunk: list[ScoreDO]):
+        for name, spool in floats.items():
+            spool.write([getattr(score, name) for score in chunk])
+        timestamps.write([np.datetime64(score.timestamp, "us") for score in chunk])
+        flags.write([score.flag_correct for score in chunk])
+        for name, spool in strings.items():
+            spool.write(
+                [
+                    np.frombuffer(
+                        str(getattr(score, name)).encode("utf-8"), dtype=np.uint8
+                    )
+                    for score in chunk
+                ]
+            )
+        for name, spool in words.items():
+            spool.write([getattr(score, name) for score in chunk])
+
+    count = 0
+    chunk = []
+    for score in scores:
+        chunk.append(score)
+        if len(chunk) == chunk_size:
+            write_chunk(chunk)
+            count += len(chunk)
+            chunk = []
+    write_chunk(chunk)
+    count += len(chunk)
+
+    columns: dict[str, _Spool] = {
+        **floats,
+        "timestamp": timestamps,
+        "flag_correct": flags,
+    }
+    for name, spool in {**strings, **words}.items():
+        columns.update(spool.spools(name))
+    try:
+        with zipfile.ZipFile(
+            path, "w", zipfile.ZIP_DEFLATED, allowZip64=True
+        ) as archive:
+            for name, spool in columns.items():
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as f:
+                    spool.copy_to_npy(f)
+    finally:
+        for spool in columns.values():
+            spool.close()
+    return count
+
+
+def export_history(scores: Iterable[ScoreDO], path: Path, export_format: str) -> int:
+    """Writes the scores to the file in one of FORMATS. Returns the number of the scores."""
+    exporters: dict[str, Callable[[Iterable[ScoreDO], IO[str]], int]] = {
+        "csv": export_csv,
+        "ndjson": export_ndjson,
+    }
+    if export_format == "npz":
+        return export_npz(scores, path)
+    if export_format not in exporters:
+        raise ValueError(
+            f"Unknown export format {export_format!r}, expected one of {FORMATS}"
+        )
+    with path.open("w", encoding="utf-8", newline="") as f:
+        return exporters[export_format](scores, f)
+
+
+def rebuild_rollups(total_score: TotalScoreDO, scores: Iterable[ScoreDO]):
+    """Replaces the daily and per-sentence rollups of the total scores with the ones of the scores."""
+    daily: dict[str, RollupDO] = {}
+    by_sentence: dict[str, RollupDO] = {}
+    for score in scores:
+        if score.correct_sentence == "":
+            continue  # Skipped questions are not in the rollups, see TotalScoreDO.add_to_rollups
+        day = score.timestamp.date().isoformat()
+        daily[day] = daily.get(day, RollupDO()).added(score)
+        by_sentence[score.correct_sentence] = by_sentence.get(
+            score.correct_sentence, RollupDO()
+        ).added(score)
+    total_score.set_rollups(daily, by_sentence)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exports the answer history")
+    parser.add_argument("output", type=Path, nargs="?", default=None)
+    parser.add_argument("--config-path", type=Path, default=Path("config.json"))
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default=None,
+        help="Defaults to the suffix of the output",
+    )
+    parser.add_argument(
+        "--rebuild-rollups",
+        action="store_true",
+        help="Recompute the daily and per-sentence rollups of the total scores from the history",
+    )
+    args = parser.parse_args()
+    if args.output is None and not args.rebuild_rollups:
+        parser.error("Give the output file, --rebuild-rollups or both")
+
+    if args.config_path.exists():
+        config = load_config(args.config_path)
+    else:
+        config = ConfigDataDO()
+    if args.output is not None:
+        export_format = args.format or args.output.suffix.lstrip(".")
+        count = export_history(stream_history(config), args.output, export_format)
+        print(f"Exported {count} answers to {args.output}")
+    if args.rebuild_rollups:
+        total_score = config.load_total_scores()
+        rebuild_rollups(total_score, stream_history(config))
+        total_score.save()
+        print(
+            f"Rebuilt the rollups of {len(total_score.daily)} days and {len(total_score.by_sentence)} sentences"
+        )
+    config.close_storage()
+
+
+if __name__ == "__main__":
+    main()
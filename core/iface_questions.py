@@ -0,0 +1,45 @@
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+from .question_index import QuestionEntryDO
+
+
+class IQuestionSource(ABC):
+    """The lines of the questions, in order, read on demand: the questions file itself or a compiled story bundle.
+
+    Lines with the same text share a sentence id, the number of the first of them. A source may also have the
+    question entries and the respeak results computed in advance."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def __getitem__(self, line: int) -> str:
+        pass
+
+    def __iter__(self) -> Iterator[str]:
+        for line in range(len(self)):
+            yield self[line]
+
+    @abstractmethod
+    def sentence_id(self, line: int) -> int:
+        """The id of the sentence on the line: the first line with the same text."""
+        pass
+
+    @abstractmethod
+    def unique_sentences(self) -> list[str]:
+        """The distinct sentences, in the order of the file."""
+        pass
+
+    def entry(self, sentence: str) -> QuestionEntryDO | None:
+        """The entry of the sentence, if it is computed in advance."""
+        return None
+
+    def respeak_transcripts(self) -> dict[str, str]:
+        """The respeak transcripts of the sentences, if they are computed in advance."""
+        return {}
+
+    def respeak_map(self, sentence: str, respeak_sentence: str) -> list[int] | None:
+        """make_respeak_map(sentence, respeak_sentence), if it is computed in advance."""
+        return None
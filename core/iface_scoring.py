@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
 
-from .scoring_serialization import ScoreDO
+from .question_index import QuestionIndexDO
+from .scoring_serialization import ScoreDO, ScoreHistoryDO
+from .util import just_letters_mapping
 
 
 class IRespeak(ABC):
@@ -25,6 +27,22 @@ class IScoring(ABC):
         """Sets the next sentence to be presented to the user."""
         pass
 
+    @property
+    @abstractmethod
+    def score_history(self) -> ScoreHistoryDO:
+        """The history of the answers, as loaded by the scoring."""
+        pass
+
+    @property
+    @abstractmethod
+    def question_index(self) -> QuestionIndexDO:
+        """The index of the questions file."""
+        pass
+
+    def get_char_ranges(self, sentence: str) -> list[tuple[int, int]]:
+        """Returns the (start, end) of each word of the sentence, see just_letters_mapping."""
+        return just_letters_mapping(sentence)
+
     @abstractmethod
     def set_sentence_answer(
         self,
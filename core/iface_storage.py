@@ -0,0 +1,40 @@
+import datetime
+from abc import ABC, abstractmethod
+
+from .scoring_serialization import ScoreDO, ScoreHistoryDO, TotalScoreDO
+
+
+class IScoreStorage(ABC):
+    """Where the history of the answers and the total scores are kept between the sessions.
+
+    Writes may be batched; flush makes them durable and close is called at the end of the session."""
+
+    @abstractmethod
+    def load_history(self, since: datetime.datetime | None = None) -> ScoreHistoryDO:
+        """Loads the history; with `since`, only the answers from that time on, the rest as its older_scores."""
+        pass
+
+    @abstractmethod
+    def append_score(self, score: ScoreDO, history: ScoreHistoryDO):
+        """Stores the score that was just added to the history."""
+        pass
+
+    @abstractmethod
+    def save_history(self, history: ScoreHistoryDO):
+        """Replaces the stored history with the given one (from its window_start on, if it has one)."""
+        pass
+
+    @abstractmethod
+    def load_total_scores(self) -> TotalScoreDO:
+        """Returns the total scores, set up to save themselves into this storage."""
+        pass
+
+    @abstractmethod
+    def save_total_scores(self, total_score: TotalScoreDO):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
@@ -84,69 +84,383 @@ class MatchingSubstring:
         self._original_text = original_text
 
     def __repr__(self):
-        return f"Excerpt «{self._original_text[self._original_index:(self._original_index + self._length)]}» matches between original position {self._original_index} and user position {self._user_index}"
+        return f"Excerpt «{self._original_text[self._original_index : (self._original_index + self._length)]}» matches between original position {self._original_index} and user position {self._user_index}"
 
     def __iter__(self):  # Allows for 'a, b, size = matching_substring'
         return iter([self._original_index, self._user_index, self._length])
 
+    # The same attribute names as in difflib.Match, so both can be consumed by the same code.
+    @property
+    def a(self) -> int:
+        return self._original_index
 
-def str_levenshtein_distance(
-    s1: str, s2: str
-) -> tuple[int, list[SingleCharacterOperation]]:
-    m, n = len(s1), len(s2)
-    dp = np.zeros((m + 1, n + 1), dtype=int)
-    operations = np.empty(
-        (m + 1, n + 1), dtype=str
-    )  # "D" for deletion, "I" for insertion, "S" for substitution
-
-    for i in range(m + 1):
-        for j in range(n + 1):
-            if i == 0:
-                dp[i][j] = j
-            elif j == 0:
-                dp[i][j] = i
-            elif s1[i - 1] == s2[j - 1]:
-                dp[i][j] = dp[i - 1][j - 1]
-            else:
-                dp[i][j] = 1 + min(
-                    dp[i - 1][j],  # Deletion
-                    dp[i][j - 1],  # Insertion
-                    dp[i - 1][j - 1],
-                )  # Substitution
-                if dp[i][j] == dp[i - 1][j] + 1:
-                    operations[i][j] = "D"
-                elif dp[i][j] == dp[i][j - 1] + 1:
-                    operations[i][j] = "I"
-                else:
-                    operations[i][j] = "S"
-
-    # Traceback to get the sequence of operations
-    sequence_of_operations = []
-    i, j = m, n
-    while i > 0 or j > 0:
-        if operations[i][j] == "D":
-            sequence_of_operations.append(
-                SingleCharacterOperation(DiffenenceType.MissingPart, i, s1[i - 1])
-            )
-            i -= 1
-        elif operations[i][j] == "I":
-            sequence_of_operations.append(
-                SingleCharacterOperation(DiffenenceType.ExtraPart, i, s2[j - 1])
-            )
-            j -= 1
-        elif operations[i][j] == "S":
-            sequence_of_operations.append(
-                SingleCharacterOperation(DiffenenceType.ErrorInWord, i, s2[j - 1])
-            )
+    @property
+    def b(self) -> int:
+        return self._user_index
+
+    @property
+    def size(self) -> int:
+        return self._length
+
+
+# Operation codes of the edit script. They share the values of DiffenenceType, so the uint8 direction matrix
+# and the run-length-encoded script can be converted back to the enum with DiffenenceType(code).
+OP_MATCH = DiffenenceType.NoError.value
+OP_SUBSTITUTE = DiffenenceType.ErrorInWord.value
+OP_DELETE = DiffenenceType.MissingPart.value
+OP_INSERT = DiffenenceType.ExtraPart.value
+
+
+def _as_code_points(s: str) -> np.ndarray:
+    return np.frombuffer(s.encode("utf-32-le"), dtype=np.uint32)
+
+
+def _next_row_values(
+    prev_row: np.ndarray, char: int, s2_codes: np.ndarray
+) -> np.ndarray:
+    """Computes the next row of the dp matrix as array operations."""
+    row = np.empty_like(prev_row)
+    row[0] = prev_row[0] + 1
+    # Without the insertions the cell is either a deletion (up + 1), or a match/substitution (diag + cost).
+    # Since diag <= up + 1, the matching cells always take the diagonal.
+    np.minimum(prev_row[1:] + 1, prev_row[:-1] + (s2_codes != char), out=row[1:])
+    # Insertions propagate along the row: row[j] = min_k(row[k] + j - k), which is a running minimum.
+    offsets = np.arange(len(row), dtype=row.dtype)
+    return np.minimum.accumulate(row - offsets) + offsets
+
+
+def _next_row(
+    prev_row: np.ndarray, char: int, s2_codes: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Computes the next row of the dp matrix. Returns the row and the uint8 directions of its cells."""
+    row = _next_row_values(prev_row, char, s2_codes)
+    directions = np.where(
+        s2_codes == char,
+        OP_MATCH,
+        np.where(
+            row[1:] == prev_row[1:] + 1,
+            OP_DELETE,
+            np.where(row[1:] == row[:-1] + 1, OP_INSERT, OP_SUBSTITUTE),
+        ),
+    ).astype(np.uint8)
+    return row, directions
+
+
+def _band_directions(
+    top_row: np.ndarray, s1_codes: np.ndarray, s2_codes: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Fills the rows below top_row, one for each character of s1_codes. Returns the last row and the directions
+    of the band, whose row 0 stands for the top_row (and is filled with insertions, like the first row of the matrix).
+    """
+    directions = np.empty((len(s1_codes) + 1, len(top_row)), dtype=np.uint8)
+    directions[0, :] = OP_INSERT
+    directions[:, 0] = OP_DELETE
+    directions[0, 0] = OP_MATCH
+
+    row = top_row
+    for i in range(1, len(s1_codes) + 1):
+        row, directions[i, 1:] = _next_row(row, s1_codes[i - 1], s2_codes)
+    return row, directions
+
+
+def levenshtein_directions(s1: str, s2: str) -> tuple[int, np.ndarray]:
+    """Fills the dp matrix one row at a time and returns the distance with the (m+1)x(n+1) uint8 direction matrix.
+
+    The tie-breaking is the same as in the classic double loop: a matching character always takes the diagonal,
+    otherwise deletion is preferred over insertion, and insertion over substitution."""
+    row, directions = _band_directions(
+        np.arange(len(s2) + 1, dtype=np.int64), _as_code_points(s1), _as_code_points(s2)
+    )
+    return int(row[-1]), directions
+
+
+def _traceback(
+    directions: np.ndarray, i: int, j: int, to_origin: bool = True
+) -> tuple[list[int], int]:
+    """Walks the direction matrix from (i, j) back to the origin, or only up to the row 0 if not to_origin.
+    Returns the operation codes in the reverse order and the column where the walk stopped."""
+    ops = []
+    while i > 0 or (to_origin and j > 0):
+        op = directions[i, j]
+        ops.append(op)
+        if op == OP_DELETE:
             i -= 1
+        elif op == OP_INSERT:
             j -= 1
         else:
             i -= 1
             j -= 1
+    return ops, j
+
+
+def run_length_encode(ops: np.ndarray) -> np.ndarray:
+    """Turns a sequence of operation codes into an (k, 2) array of (operation code, run length) rows."""
+    if len(ops) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    starts = np.flatnonzero(np.diff(ops, prepend=-1))
+    lengths = np.diff(starts, append=len(ops))
+    return np.stack([ops[starts].astype(np.int64), lengths], axis=1)
+
+
+def levenshtein_edit_script(
+    s1: str, s2: str, low_memory_threshold: int | None = None
+) -> tuple[int, np.ndarray]:
+    """Returns the Levenshtein distance and the run-length-encoded edit script that turns s1 into s2.
+
+    Each row of the script is (operation code, run length), with the codes OP_MATCH, OP_SUBSTITUTE, OP_DELETE
+    and OP_INSERT.
+
+    Above low_memory_threshold dp cells (the one of set_low_memory_threshold by default) the script is computed by
+    hirschberg_edit_script, which gives the same result without the full direction matrix."""
+    if low_memory_threshold is None:
+        low_memory_threshold = _low_memory_threshold
+    if (len(s1) + 1) * (len(s2) + 1) > low_memory_threshold:
+        return hirschberg_edit_script(s1, s2)
+
+    distance, directions = levenshtein_directions(s1, s2)
+    ops, _ = _traceback(directions, len(s1), len(s2))
+    ops.reverse()
+    return distance, run_length_encode(np.asarray(ops, dtype=np.uint8))
+
+
+# Above this number of dp cells levenshtein_edit_script switches to the low-memory engine, by default.
+# 4M cells are 4 MB of directions, i.e. a 2000-character paragraph read as 2000 characters.
+LOW_MEMORY_THRESHOLD = 4_000_000
+# The low-memory engine solves bands up to this number of cells directly, with a direction matrix.
+LOW_MEMORY_BLOCK = 65_536
+
+_low_memory_threshold = LOW_MEMORY_THRESHOLD
 
-    sequence_of_operations.reverse()
 
-    return dp[m][n], sequence_of_operations
+def set_low_memory_threshold(cells: int):
+    """Sets the number of dp cells above which levenshtein_edit_script switches to hirschberg_edit_script."""
+    global _low_memory_threshold
+    if cells < 0:
+        raise ValueError(f"The threshold must not be negative, got {cells}")
+    _low_memory_threshold = cells
+
+
+def _low_memory_walk(
+    top_row: np.ndarray, s1_codes: np.ndarray, s2_codes: np.ndarray, block: int
+) -> tuple[list[int], int]:
+    """Traces back the band below top_row (one row for each of s1_codes), starting from its bottom-right corner.
+    Returns the operation codes in the reverse order and the column where the path enters the band."""
+    rows = len(s1_codes)
+    if rows * len(top_row) <= block or rows == 1:
+        _, directions = _band_directions(top_row, s1_codes, s2_codes)
+        return _traceback(directions, rows, len(s2_codes), to_origin=False)
+
+    # The path through the lower half depends only on the row in the middle, and the path through the upper half
+    # only on where the path leaves the lower half. Only the rows on the recursion stack are kept in memory.
+    half = rows // 2
+    middle_row = top_row
+    for char in s1_codes[:half]:
+        middle_row = _next_row_values(middle_row, char, s2_codes)
+    lower_ops, column = _low_memory_walk(middle_row, s1_codes[half:], s2_codes, block)
+    del middle_row
+    upper_ops, column = _low_memory_walk(
+        top_row[: column + 1], s1_codes[:half], s2_codes[:column], block
+    )
+    return lower_ops + upper_ops, column
+
+
+def hirschberg_edit_script(
+    s1: str, s2: str, block: int | None = None
+) -> tuple[int, np.ndarray]:
+    """The same as levenshtein_edit_script, but in Hirschberg's divide-and-conquer fashion.
+
+    The rows are split in halves recursively and only bands of up to `block` cells (LOW_MEMORY_BLOCK by default)
+    get a direction matrix. Unlike the textbook Hirschberg, the split follows the traceback path itself, so the edit
+    script is identical; the price is one dp row kept for each level of the recursion, so the memory is
+    O(n log m + block) rather than O(m + n), and the upper half of each band is computed twice, so it is slower than
+    the full matrix. It is meant for the alignments whose direction matrix would not fit into memory."""
+    if block is None:
+        block = LOW_MEMORY_BLOCK
+    ops, column = _low_memory_walk(
+        np.arange(len(s2) + 1, dtype=np.int64),
+        _as_code_points(s1),
+        _as_code_points(s2),
+        block,
+    )
+    ops.extend([OP_INSERT] * column)
+    ops.reverse()
+    ops = np.asarray(ops, dtype=np.uint8)
+    return int(np.count_nonzero(ops != OP_MATCH)), run_length_encode(ops)
+
+
+def _pattern_masks(s: str) -> dict[str, int]:
+    """For each character of s returns the bit mask of its positions (bit i set if s[i] is the character)."""
+    masks = {}
+    for i, char in enumerate(s):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def _delta(plus: int, minus: int, bit: int) -> int:
+    if plus & bit:
+        return 1
+    if minus & bit:
+        return -1
+    return 0
+
+
+def levenshtein_distance(s1: str, s2: str) -> int:
+    """Just the Levenshtein distance, with the bit-vector algorithm of bitparallel_edit_script and O(1) extra memory."""
+    m = len(s1)
+    if m == 0 or len(s2) == 0:
+        return m + len(s2)
+    full = (1 << m) - 1
+    masks = _pattern_masks(s1)
+    vp, vn = full, 0
+    distance = m
+    for char in s2:
+        eq = masks.get(char, 0)
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        hp = vn | (~(xh | vp) & full)
+        hn = vp & xh
+        if hp >> (m - 1):
+            distance += 1
+        elif hn >> (m - 1):
+            distance -= 1
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(xv | hp) & full)
+        vn = hp & xv
+    return distance
+
+
+def bitparallel_edit_script(s1: str, s2: str) -> tuple[int, np.ndarray]:
+    """The same as levenshtein_edit_script, but computed with Myers' bit-vector algorithm (in Hyyrö's formulation).
+
+    Each column of the dp matrix is a pair of bit vectors of vertical deltas (+1/-1) stored in Python big ints, so a single
+    integer operation advances len(s1) cells at once, 64 of them per machine word. The deltas of all columns are
+    kept, which is enough to recover any cell along the traceback path in O(1) bit tests."""
+    m, n = len(s1), len(s2)
+    if m == 0 or n == 0:
+        op = OP_INSERT if m == 0 else OP_DELETE
+        return m + n, run_length_encode(np.full(m + n, op, dtype=np.uint8))
+
+    full = (1 << m) - 1
+    masks = _pattern_masks(s1)
+    vp, vn = full, 0  # Column 0: D[i][0] = i, so all vertical deltas are +1.
+    # Bit i-1 of the vectors of the column j describes the cell (i, j).
+    vertical_plus, vertical_minus = [vp], [vn]
+    horizontal_plus, horizontal_minus = [0], [0]
+    distance = m
+    for char in s2:
+        eq = masks.get(char, 0)
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        hp = vn | (~(xh | vp) & full)
+        hn = vp & xh
+        if hp >> (m - 1):
+            distance += 1
+        elif hn >> (m - 1):
+            distance -= 1
+        horizontal_plus.append(hp)
+        horizontal_minus.append(hn)
+        # The first row of the matrix grows by 1 in each column, hence the 1 shifted in.
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(xv | hp) & full)
+        vn = hp & xv
+        vertical_plus.append(vp)
+        vertical_minus.append(vn)
+
+    ops = []
+    i, j, d = m, n, distance
+    while i > 0 and j > 0:
+        bit = 1 << (i - 1)
+        up = d - _delta(vertical_plus[j], vertical_minus[j], bit)
+        if s1[i - 1] != s2[j - 1]:
+            if d == up + 1:
+                ops.append(OP_DELETE)
+                i -= 1
+                d = up
+                continue
+            left = d - _delta(horizontal_plus[j], horizontal_minus[j], bit)
+            if d == left + 1:
+                ops.append(OP_INSERT)
+                j -= 1
+                d = left
+                continue
+            ops.append(OP_SUBSTITUTE)
+        else:
+            ops.append(OP_MATCH)
+        if i == 1:
+            d = up - 1  # D[0][j-1] = j-1
+        else:
+            d = up - _delta(horizontal_plus[j], horizontal_minus[j], bit >> 1)
+        i -= 1
+        j -= 1
+    ops.extend([OP_DELETE] * i + [OP_INSERT] * j)
+    ops.reverse()
+    return distance, run_length_encode(np.asarray(ops, dtype=np.uint8))
+
+
+# Engines that compute the run-length-encoded edit script. All of them return exactly the same script.
+EDIT_SCRIPT_ENGINES = {
+    "numpy": levenshtein_edit_script,
+    "bitparallel": bitparallel_edit_script,
+    "hirschberg": hirschberg_edit_script,
+}
+
+
+def edit_script_to_operations(
+    s1: str, s2: str, edit_script: np.ndarray
+) -> list[SingleCharacterOperation]:
+    """Expands the run-length-encoded edit script into the (error-only) list of SingleCharacterOperation objects."""
+    sequence_of_operations = []
+    i, j = 0, 0
+    for op, length in edit_script.tolist():
+        for _ in range(length):
+            if op == OP_MATCH:
+                i += 1
+                j += 1
+                continue
+            if op == OP_DELETE:
+                i += 1
+                sequence_of_operations.append(
+                    SingleCharacterOperation(DiffenenceType.MissingPart, i, s1[i - 1])
+                )
+            elif op == OP_INSERT:
+                j += 1
+                sequence_of_operations.append(
+                    SingleCharacterOperation(DiffenenceType.ExtraPart, i, s2[j - 1])
+                )
+            else:
+                i += 1
+                j += 1
+                sequence_of_operations.append(
+                    SingleCharacterOperation(DiffenenceType.ErrorInWord, i, s2[j - 1])
+                )
+    return sequence_of_operations
+
+
+def edit_script_to_matching_blocks(
+    s1: str, edit_script: np.ndarray
+) -> list[MatchingSubstring]:
+    """Returns the runs of matching characters of the edit script, in the same form as difflib's matching blocks."""
+    matching_substrings = []
+    i, j = 0, 0
+    for op, length in edit_script.tolist():
+        if op == OP_MATCH:
+            matching_substrings.append(
+                MatchingSubstring(s1, original_index=i, user_index=j, length=length)
+            )
+        if op != OP_INSERT:
+            i += length
+        if op != OP_DELETE:
+            j += length
+    return matching_substrings
+
+
+def str_levenshtein_distance(
+    s1: str, s2: str
+) -> tuple[int, list[SingleCharacterOperation]]:
+    distance, edit_script = levenshtein_edit_script(s1, s2)
+    return distance, edit_script_to_operations(s1, s2, edit_script)
 
 
 def make_list_of_matched_substrings(
@@ -212,11 +526,11 @@ def make_list_of_matched_substrings(
 
 
 class SequenceMatcher:
-    def __init__(self, s1: str, s2: str):
+    def __init__(self, s1: str, s2: str, engine: str = "numpy"):
         self._s1 = s1
         self._s2 = s2
-        _, operations = str_levenshtein_distance(s1, s2)
-        self._matching_substrings = make_list_of_matched_substrings(s1, operations)
+        self.distance, edit_script = EDIT_SCRIPT_ENGINES[engine](s1, s2)
+        self._matching_substrings = edit_script_to_matching_blocks(s1, edit_script)
 
     def get_matching_blocks(self):
         return self._matching_substrings
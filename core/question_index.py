@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Callable
+
+from pydantic import BaseModel
+
+from .sentence_accuracy import PreparedSentence
+from .util import just_letters, just_letters_mapping
+
+
+def calculate_timeout_from_sentence(correct_sentence: str) -> float:
+    return calculate_timeout_from_letters(just_letters(correct_sentence))
+
+
+def calculate_timeout_from_letters(letters: str) -> float:
+    return len(letters) / 6 + 4
+
+
+def letters_for_timeout(timeout: float) -> int:
+    """The inverse of calculate_timeout_from_letters: the length of the letters that are read within the timeout."""
+    return int((timeout - 4) * 6)
+
+
+def calculate_effort(letters: str, word_count: int) -> float:
+    """Effort of reading the sentence with `word_count` words, whose just_letters form is `letters`."""
+    effort = len(letters) - word_count * 2
+    # Add quadratic component to the effort, normalized such that 90-letter effort will be double-scored
+    effort += effort * (effort / 140) ** 2 * 0.3
+    return effort
+
+
+class QuestionEntryDO(BaseModel):
+    """Everything about a single question that does not depend on the answer."""
+
+    sentence: str
+    letters: str  # just_letters(sentence)
+    char_ranges: list[tuple[int, int]]  # just_letters_mapping(sentence)
+    timeout: float  # calculate_timeout_from_sentence(sentence)
+    effort: float  # Effort of reading the whole sentence, see calculate_effort
+
+    @staticmethod
+    def from_sentence(sentence: str) -> QuestionEntryDO:
+        letters = just_letters(sentence)
+        return QuestionEntryDO(
+            sentence=sentence,
+            letters=letters,
+            char_ranges=just_letters_mapping(sentence),
+            timeout=calculate_timeout_from_letters(letters),
+            effort=calculate_effort(letters, len(letters.split())),
+        )
+
+    @property
+    def tokens(self) -> list[str]:
+        return self.letters.split()
+
+    def prepared(self) -> PreparedSentence:
+        return PreparedSentence(
+            self.sentence, letters=self.letters, char_ranges=self.char_ranges
+        )
+
+
+class QuestionIndexDO(BaseModel):
+    """Index of the questions file.
+
+    load_question_index builds it for all the lines of the file at once and persists it next to the questions file
+    (see index_path) together with the hash of the file it was built from, so it is rebuilt only when the questions
+    change. Lines of the file are kept in order, including the empty ones, because the story mode addresses the
+    sentences by their line number. The modes instead start with an empty index, filled from a lookup (see set_lookup)
+    as the sentences are asked."""
+
+    version: int = 1
+    questions_hash: str = ""
+    entries: list[QuestionEntryDO] = []
+    _by_sentence: dict[str, QuestionEntryDO]
+    # Where the entries not in `entries` are looked up before indexing them, e.g. StoryBundle.entry.
+    _lookup: Callable[[str], QuestionEntryDO | None] | None = None
+
+    def model_post_init(self, __context):
+        # Also runs after model_construct, which the client snapshot uses to skip the validation.
+        self._by_sentence = {entry.sentence: entry for entry in self.entries}
+
+    def set_lookup(self, lookup: Callable[[str], QuestionEntryDO | None] | None):
+        self._lookup = lookup
+
+    @property
+    def sentences(self) -> list[str]:
+        return [entry.sentence for entry in self.entries]
+
+    def indexed_entries(self) -> list[QuestionEntryDO]:
+        """The entries known so far: the ones of `entries` and the ones indexed since."""
+        return list(self._by_sentence.values())
+
+    def entry(self, sentence: str) -> QuestionEntryDO:
+        """Returns the entry of the sentence. Sentences that are not in the questions file are indexed on the fly."""
+        ans = self._by_sentence.get(sentence)
+        if ans is None:
+            if self._lookup is not None:
+                ans = self._lookup(sentence)
+            if ans is None:
+                ans = QuestionEntryDO.from_sentence(sentence)
+            self._by_sentence[sentence] = ans
+        return ans
+
+    def prepared(self, sentence: str) -> PreparedSentence:
+        return self.entry(sentence).prepared()
+
+
+def index_path(questions_file: Path) -> Path:
+    return questions_file.with_name(questions_file.name + ".index.json")
+
+
+def hash_questions(questions_text: bytes) -> str:
+    return hashlib.sha256(questions_text).hexdigest()
+
+
+def build_question_index(questions: list[str], questions_hash: str) -> QuestionIndexDO:
+    return QuestionIndexDO(
+        questions_hash=questions_hash,
+        entries=[QuestionEntryDO.from_sentence(sentence) for sentence in questions],
+    )
+
+
+def load_question_index(questions_file: Path) -> QuestionIndexDO:
+    """Returns the index of the questions file, from the persisted copy if it is up to date."""
+    if not questions_file.exists():
+        return QuestionIndexDO()
+    questions_text = questions_file.read_bytes()
+    questions_hash = hash_questions(questions_text)
+
+    index_file = index_path(questions_file)
+    if index_file.exists():
+        try:
+            index = QuestionIndexDO.model_validate_json(index_file.read_text("utf-8"))
+            if (
+                index.questions_hash == questions_hash
+                and index.version == QuestionIndexDO().version
+            ):
+                return index
+        except ValueError:
+            pass  # Corrupted or from an incompatible version; rebuilt below.
+
+    index = build_question_index(
+        questions_text.decode("utf-8").split("\n"), questions_hash
+    )
+    try:
+        index_file.write_text(index.model_dump_json(), "utf-8")
+    except OSError:
+        pass  # E.g. a read-only directory. The index just will not be reused.
+    return index
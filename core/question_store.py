@@ -0,0 +1,153 @@
+"""The lines of the questions file, read on demand.
+
+A book read in the story mode can have tens of thousands of lines, and only one of them is needed at a time. The
+store maps the file into memory and keeps only the offsets of the lines, so any line is decoded in O(1) when it is
+asked for. The offsets are found once, with NumPy, and persisted next to the file as a binary container (see
+core.binary_container), valid while the file has the same size and mtime.
+
+The same index gives every distinct sentence an id (the first line it is on), for the arcade mode, which asks each
+sentence regardless of how many times it is in the file. Like QuestionIndexDO and load_questions, the lines are the
+ones of split("\\n"), including the empty ones."""
+
+import mmap
+from pathlib import Path
+
+import numpy as np
+from overrides import overrides
+
+from .binary_container import BinaryContainer, BinaryWriter
+from .iface_questions import IQuestionSource
+from .question_index import QuestionEntryDO
+
+LINES_KIND = "question-lines"
+LINES_VERSION = 1
+
+
+def lines_index_path(questions_file: Path) -> Path:
+    return questions_file.with_name(questions_file.name + ".lines.bin")
+
+
+def _file_stamp(path: Path) -> list[int]:
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _map_file(path: Path) -> mmap.mmap | bytes:
+    with path.open("rb") as f:
+        if path.stat().st_size == 0:
+            return b""  # An empty file cannot be mapped
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _build_lines_index(text: mmap.mmap | bytes) -> tuple[np.ndarray, np.ndarray]:
+    # Line i is text[starts[i] : starts[i + 1] - 1]; the last "start" is one past the end, as if after a newline.
+    newlines = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == ord("\n"))
+    starts = np.empty(len(newlines) + 2, dtype=np.uint64)
+    starts[0] = 0
+    starts[1:-1] = newlines + 1
+    starts[-1] = len(text) + 1
+    first_lines = {}
+    ids = np.empty(len(starts) - 1, dtype=np.int64)
+    for i in range(len(ids)):
+        line = bytes(text[int(starts[i]) : int(starts[i + 1]) - 1])
+        ids[i] = first_lines.setdefault(line, i)
+    return starts, ids
+
+
+class QuestionStore(IQuestionSource):
+    """The lines of one questions file. Indexing gives the line (without the newline) as a str."""
+
+    _questions_file: Path
+    _text: mmap.mmap | bytes
+    _starts: np.ndarray  # uint64, one more than the lines
+    _sentence_ids: np.ndarray  # For each line, the first line with the same text
+    _unique_lines: np.ndarray  # The distinct sentence ids, in order
+    _ids: (
+        dict[str, int] | None
+    )  # The id of each distinct sentence, built on the first lookup
+    _entries: dict[
+        int, QuestionEntryDO
+    ]  # By the sentence id, computed as they are asked
+
+    def __init__(self, questions_file: Path):
+        self._questions_file = questions_file
+        if not questions_file.exists():
+            self._text = b""
+            self._starts = np.zeros(1, dtype=np.uint64)
+            self._sentence_ids = np.empty(0, dtype=np.int64)
+        else:
+            self._text = _map_file(questions_file)
+            self._load_or_build()
+        self._unique_lines = np.flatnonzero(
+            self._sentence_ids == np.arange(len(self._sentence_ids))
+        )
+        self._ids = None
+        self._entries = {}
+
+    def _load_or_build(self):
+        index_file = lines_index_path(self._questions_file)
+        stamp = _file_stamp(self._questions_file)
+        if index_file.exists():
+            try:
+                container = BinaryContainer(index_file, LINES_KIND)
+                if (
+                    container.metadata.get("version") == LINES_VERSION
+                    and container.metadata.get("source") == stamp
+                ):
+                    self._starts = container.array("starts")
+                    self._sentence_ids = container.array("sentence_ids")
+                    return
+            except ValueError:
+                pass  # Damaged; rebuilt below.
+
+        self._starts, self._sentence_ids = _build_lines_index(self._text)
+        writer = BinaryWriter(LINES_KIND, {"version": LINES_VERSION, "source": stamp})
+        writer.add_array("starts", self._starts)
+        writer.add_array("sentence_ids", self._sentence_ids)
+        try:
+            writer.write(index_file)
+        except OSError:
+            pass  # E.g. a read-only directory. The index just will not be reused.
+
+    @property
+    def questions_file(self) -> Path:
+        return self._questions_file
+
+    @overrides
+    def __len__(self) -> int:
+        return len(self._starts) - 1
+
+    @overrides
+    def __getitem__(self, line: int) -> str:
+        if line < 0:
+            line += len(self)
+        if not 0 <= line < len(self):
+            raise IndexError(line)
+        start, end = int(self._starts[line]), int(self._starts[line + 1]) - 1
+        return self._text[start:end].decode("utf-8")
+
+    @overrides
+    def sentence_id(self, line: int) -> int:
+        return int(self._sentence_ids[line])
+
+    @property
+    def sentence_ids(self) -> np.ndarray:
+        """The ids of all the distinct sentences, in the order of the file."""
+        return self._unique_lines
+
+    @overrides
+    def unique_sentences(self) -> list[str]:
+        return [self[line] for line in self._unique_lines.tolist()]
+
+    @overrides
+    def entry(self, sentence: str) -> QuestionEntryDO | None:
+        if self._ids is None:
+            self._ids = {self[line]: line for line in self._unique_lines.tolist()}
+        sentence_id = self._ids.get(sentence)
+        if sentence_id is None:
+            return None
+        ans = self._entries.get(sentence_id)
+        if ans is None:
+            ans = QuestionEntryDO.from_sentence(sentence)
+            self._entries[sentence_id] = ans
+        return ans
@@ -0,0 +1,335 @@
+"""Compressed archive of the recorded answers.
+
+ScoreDO.saved_audio keeps naming the recording as before (recordings_directory/<time>.wav), but the file on disk is
+written by a background thread and compressed to FLAC (lossless) or Opus with pydub/ffmpeg. The index file maps each
+saved_audio to its archive entry. Recordings are decoded only when they are loaded, e.g. for a replay. The index also
+keeps the size of each file, so the disk usage is known without walking the directory (see core.recording_retention).
+
+If the encoding fails (e.g. ffmpeg is missing), the recording is kept as WAV, so nothing is lost."""
+
+import datetime
+import os
+import queue
+import threading
+import traceback
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+from pydub import AudioSegment
+from pydub.exceptions import CouldntEncodeError
+
+from .util import write_text_atomically
+from .voice_sample import VoiceSample, voice_sample_from_wav
+
+# File suffix and the pydub export arguments of each format.
+FORMATS: dict[str, tuple[str, dict]] = {
+    "flac": (".flac", {"format": "flac"}),
+    "opus": (".opus", {"format": "opus", "bitrate": "24k"}),
+    "wav": (".wav", {"format": "wav"}),
+}
+
+
+class RecordingEntryDO(BaseModel):
+    archive_file: str  # Relative to the archive directory
+    format: str  # A key of FORMATS
+    frame_rate: int
+    sample_width: int = 2
+    channels: int = 1
+    duration: float  # Seconds
+    size: int  # Bytes of the archive file
+    timestamp: datetime.datetime = Field(default_factory=datetime.datetime.now)
+    accuracy: float | None = None  # Of the answer, if known
+    downsampled: bool = False
+    # The file was deleted by the retention; the entry stays, so that the saved_audio still resolves.
+    evicted: bool = False
+
+
+def _entry_size(entry: RecordingEntryDO) -> int:
+    return 0 if entry.evicted else entry.size
+
+
+class RecordingIndexDO(BaseModel):
+    version: int = 1
+    # By str(ScoreDO.saved_audio), the oldest first
+    entries: dict[str, RecordingEntryDO] = {}
+    # Whether the WAVs from before the archive were adopted, see RecordingArchive.adopt.
+    references_adopted: bool = False
+
+
+class RecordingArchive:
+    """The archive directory with its index. Safe to use from several threads."""
+
+    _directory: Path
+    _index_file: Path
+    _audio_format: str
+    _index: RecordingIndexDO
+    _total_size: int  # Bytes of all the files of the index
+    _lock: threading.Lock
+    _save_lock: threading.Lock  # The writer and the retention both save the index
+
+    def __init__(
+        self,
+        directory: Path,
+        audio_format: str = "flac",
+        index_file: Path | None = None,
+    ):
+        if audio_format not in FORMATS:
+            raise ValueError(
+                f"Unknown recording format {audio_format!r}, expected one of {list(FORMATS)}"
+            )
+        self._directory = directory
+        self._index_file = index_file or directory / "index.json"
+        self._audio_format = audio_format
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if self._index_file.exists():
+            self._index = RecordingIndexDO.model_validate_json(
+                self._index_file.read_text("utf-8")
+            )
+        else:
+            self._index = RecordingIndexDO()
+        self._total_size = sum(
+            _entry_size(entry) for entry in self._index.entries.values()
+        )
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def total_size(self) -> int:
+        with self._lock:
+            return self._total_size
+
+    @property
+    def references_adopted(self) -> bool:
+        with self._lock:
+            return self._index.references_adopted
+
+    def entry(self, saved_audio: Path) -> RecordingEntryDO | None:
+        with self._lock:
+            return self._index.entries.get(str(saved_audio))
+
+    def entries(self) -> dict[str, RecordingEntryDO]:
+        with self._lock:
+            return dict(self._index.entries)
+
+    def _export(self, segment: AudioSegment, path: Path, audio_format: str):
+        # Through a temporary file, so that a crash never leaves a cut recording behind.
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            with tmp_path.open("wb") as f:
+                segment.export(f, **FORMATS[audio_format][1])
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _set_entry(self, saved_audio: Path, entry: RecordingEntryDO):
+        with self._lock:
+            old = self._index.entries.get(str(saved_audio))
+            if old is not None:
+                self._total_size -= _entry_size(old)
+            self._index.entries[str(saved_audio)] = entry
+            self._total_size += _entry_size(entry)
+
+    def add(
+        self,
+        sample: VoiceSample,
+        saved_audio: Path,
+        accuracy: float | None = None,
+    ) -> RecordingEntryDO:
+        """Compresses the sample into the archive and records it in the index (in memory, see save_index)."""
+        entry = self._encode(sample, saved_audio.stem)
+        entry.accuracy = accuracy
+        self._set_entry(saved_audio, entry)
+        return entry
+
+    def _encode(self, sample: VoiceSample, stem: str) -> RecordingEntryDO:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        segment = AudioSegment(
+            sample.data,
+            frame_rate=sample.frame_rate,
+            sample_width=sample.sample_width,
+            channels=sample.channels,
+        )
+        audio_format = self._audio_format
+        path = self._directory / (stem + FORMATS[audio_format][0])
+        try:
+            self._export(segment, path, audio_format)
+        except (CouldntEncodeError, OSError):
+            if audio_format == "wav":
+                raise
+            traceback.print_exc()
+            print(f"Could not encode {stem} as {audio_format}, keeping it as wav")
+            audio_format = "wav"
+            path = path.with_suffix(FORMATS[audio_format][0])
+            self._export(segment, path, audio_format)
+        return RecordingEntryDO(
+            archive_file=path.name,
+            format=audio_format,
+            frame_rate=sample.frame_rate,
+            sample_width=sample.sample_width,
+            channels=sample.channels,
+            duration=sample.length(),
+            size=path.stat().st_size,
+        )
+
+    def adopt(
+        self,
+        saved_audio: Path,
+        timestamp: datetime.datetime,
+        accuracy: float | None,
+    ) -> bool:
+        """Adds the WAV saved before the archive to the index, as it is. Returns False if it is gone.
+
+        The timestamp is the one of the answer, or the mtime of the file if that is older, e.g. for an answer that
+        was stored again later."""
+        if not saved_audio.is_file():
+            return False
+        sample = voice_sample_from_wav(saved_audio)
+        timestamp = min(
+            timestamp,
+            datetime.datetime.fromtimestamp(saved_audio.stat().st_mtime),
+        )
+        self._set_entry(
+            saved_audio,
+            RecordingEntryDO(
+                archive_file=str(os.path.relpath(saved_audio, self._directory)),
+                format="wav",
+                frame_rate=sample.frame_rate,
+                sample_width=sample.sample_width,
+                channels=sample.channels,
+                duration=sample.length(),
+                size=saved_audio.stat().st_size,
+                timestamp=timestamp,
+                accuracy=accuracy,
+            ),
+        )
+        return True
+
+    def set_accuracy(self, saved_audio: Path, accuracy: float):
+        with self._lock:
+            entry = self._index.entries.get(str(saved_audio))
+            if entry is not None:
+                entry.accuracy = accuracy
+
+    def set_references_adopted(self):
+        with self._lock:
+            self._index.references_adopted = True
+
+    def downsample(self, saved_audio: Path, frame_rate: int) -> RecordingEntryDO:
+        """Re-encodes the recording at the lower frame rate, in the format of the archive."""
+        old = self.entry(saved_audio)
+        sample = self.load(saved_audio).ResampledClone(frame_rate)
+        entry = self._encode(sample, saved_audio.stem)
+        entry.timestamp = old.timestamp
+        entry.accuracy = old.accuracy
+        entry.downsampled = True
+        self._set_entry(saved_audio, entry)
+        old_file = self._directory / old.archive_file
+        if old_file.resolve() != (self._directory / entry.archive_file).resolve():
+            old_file.unlink(missing_ok=True)
+        return entry
+
+    def evict(self, saved_audio: Path):
+        """Deletes the file of the recording, leaving its entry marked as evicted."""
+        old = self.entry(saved_audio)
+        (self._directory / old.archive_file).unlink(missing_ok=True)
+        self._set_entry(saved_audio, old.model_copy(update={"evicted": True}))
+
+    def save_index(self):
+        with self._save_lock:
+            with self._lock:
+                text = self._index.model_dump_json(indent=1)
+            self._directory.mkdir(parents=True, exist_ok=True)
+            write_text_atomically(self._index_file, text)
+
+    def load(self, saved_audio: Path) -> VoiceSample | None:
+        """Decodes the recording, or reads it from its WAV if it was saved before the archive. None if it is gone."""
+        entry = self.entry(saved_audio)
+        if entry is None:
+            if saved_audio.is_file():
+                return voice_sample_from_wav(saved_audio)
+            return None
+        if entry.evicted:
+            return None
+        segment = AudioSegment.from_file(
+            self._directory / entry.archive_file, format=entry.format
+        )
+        return VoiceSample(
+            data=segment.raw_data,
+            frame_rate=segment.frame_rate,
+            sample_width=segment.sample_width,
+            channels=segment.channels,
+        )
+
+
+class RecordingWriter:
+    """Adds the recordings to the archive on a background thread.
+
+    The queue is bounded, so if the disk cannot keep up, submit blocks instead of piling up the raw audio in memory.
+    The index is saved whenever the queue runs empty."""
+
+    _archive: RecordingArchive
+    _queue: queue.Queue  # Of (VoiceSample, saved_audio, accuracy), or None to stop
+    # The recordings not written yet, so that they can be loaded in the meantime.
+    _pending: dict[str, VoiceSample]
+    _pending_lock: threading.Lock
+    _thread: threading.Thread
+
+    def __init__(self, archive: RecordingArchive, max_queue: int = 8):
+        self._archive = archive
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="recording-writer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def archive(self) -> RecordingArchive:
+        return self._archive
+
+    def submit(
+        self, sample: VoiceSample, saved_audio: Path, accuracy: float | None = None
+    ):
+        with self._pending_lock:
+            self._pending[str(saved_audio)] = sample
+        self._queue.put((sample, saved_audio, accuracy))
+
+    def load(self, saved_audio: Path) -> VoiceSample | None:
+        with self._pending_lock:
+            sample = self._pending.get(str(saved_audio))
+        if sample is not None:
+            return sample
+        return self._archive.load(saved_audio)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                sample, saved_audio, accuracy = item
+                try:
+                    self._archive.add(sample, saved_audio, accuracy)
+                except Exception:
+                    traceback.print_exc()
+                with self._pending_lock:
+                    self._pending.pop(str(saved_audio), None)
+                if self._queue.empty():
+                    self._archive.save_index()
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Waits until all the submitted recordings are written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._archive.save_index()
@@ -0,0 +1,145 @@
+"""Retention of the recordings within a size and an age budget.
+
+Both limits are off by default, so nothing is deleted unless the user sets one. The recordings of the recent answers
+(the last keep_days) and of the answers with a low accuracy are always kept, as those are the ones worth replaying.
+The others, the oldest first by their timestamp, are evicted once they are older than max_age_days, and downsampled
+(and, if that is not enough, evicted) while the archive is larger than max_bytes.
+
+Each step works from the archive index, which knows the size of every file, and touches only a few files, so the
+retention runs in the background next to the app. An evicted recording keeps its index entry, so its
+ScoreDO.saved_audio still resolves (to nothing); a downsampled one gets a new entry under the same saved_audio.
+
+The WAVs saved before the archive are adopted into the index once, from the answers that reference them, with the
+time they were recorded; they end up after the newer archived recordings in the index, hence the sorting."""
+
+import datetime
+import threading
+import traceback
+from pathlib import Path
+from typing import Callable, Iterable
+
+from .recording_archive import RecordingArchive, RecordingEntryDO
+from .scoring_serialization import ScoreDO
+
+
+class RecordingRetention:
+    """See the module docstring."""
+
+    _archive: RecordingArchive
+    _max_bytes: int | None
+    _max_age: datetime.timedelta | None
+    _keep: datetime.timedelta
+    _keep_accuracy_below: float
+    _downsample_rate: int
+    # All the answers, to adopt the recordings from before the archive.
+    _references: Callable[[], Iterable[ScoreDO]] | None
+    _stop: threading.Event
+    _thread: threading.Thread | None
+
+    def __init__(
+        self,
+        archive: RecordingArchive,
+        max_bytes: int | None = None,
+        max_age_days: float | None = None,
+        keep_days: float = 14.0,
+        keep_accuracy_below: float = 0.5,
+        downsample_rate: int = 16000,
+        references: Callable[[], Iterable[ScoreDO]] | None = None,
+    ):
+        self._archive = archive
+        self._max_bytes = max_bytes
+        self._max_age = (
+            None if max_age_days is None else datetime.timedelta(days=max_age_days)
+        )
+        self._keep = datetime.timedelta(days=keep_days)
+        self._keep_accuracy_below = keep_accuracy_below
+        self._downsample_rate = downsample_rate
+        self._references = references
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_protected(self, entry: RecordingEntryDO, now: datetime.datetime) -> bool:
+        return entry.timestamp >= now - self._keep or (
+            entry.accuracy is not None and entry.accuracy < self._keep_accuracy_below
+        )
+
+    def _over_budget(self) -> bool:
+        return (
+            self._max_bytes is not None and self._archive.total_size > self._max_bytes
+        )
+
+    def adopt_references(self):
+        """Adds the recordings of the answers that are not in the index yet. Done once per archive."""
+        if self._references is not None:
+            for score in self._references():
+                if score.saved_audio == Path(""):
+                    continue
+                entry = self._archive.entry(score.saved_audio)
+                if entry is None:
+                    self._archive.adopt(
+                        score.saved_audio, score.timestamp, score.accuracy
+                    )
+                elif entry.accuracy is None:
+                    self._archive.set_accuracy(score.saved_audio, score.accuracy)
+        self._archive.set_references_adopted()
+        self._archive.save_index()
+
+    def step(self, max_files: int = 16) -> int:
+        """Downsamples or evicts up to max_files recordings. Returns how many it changed; 0 means all is in budget."""
+        if not self._archive.references_adopted:
+            self.adopt_references()
+        now = datetime.datetime.now()
+        candidates = sorted(
+            (
+                (Path(saved_audio), entry)
+                for saved_audio, entry in self._archive.entries().items()
+                if not entry.evicted and not self.is_protected(entry, now)
+            ),
+            key=lambda candidate: candidate[1].timestamp,
+        )
+        changed = 0
+        for saved_audio, entry in candidates:
+            if changed >= max_files:
+                break
+            if self._max_age is not None and entry.timestamp < now - self._max_age:
+                self._archive.evict(saved_audio)
+                changed += 1
+            elif (
+                self._over_budget()
+                and not entry.downsampled
+                and entry.frame_rate > self._downsample_rate
+            ):
+                self._archive.downsample(saved_audio, self._downsample_rate)
+                changed += 1
+        if changed == 0 and self._over_budget():
+            # Everything that could be downsampled already is.
+            for saved_audio, entry in candidates:
+                if changed >= max_files or not self._over_budget():
+                    break
+                self._archive.evict(saved_audio)
+                changed += 1
+        if changed > 0:
+            self._archive.save_index()
+        return changed
+
+    def _run(self, interval: float):
+        idle = False
+        while not self._stop.wait(interval if idle else 0.1):
+            try:
+                idle = self.step() == 0
+            except Exception:
+                traceback.print_exc()
+                idle = True
+
+    def start(self, interval: float = 600.0):
+        """Runs the steps on a background thread: one after another while there is work, then every interval seconds."""
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="recording-retention", daemon=True
+        )
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
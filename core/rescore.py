@@ -0,0 +1,229 @@
+"""Re-scores the whole answer history with the current scorer, e.g. after tuning it.
+
+The history is scored in chunks with score_sentences_batch. After each chunk the re-scored entries are appended to a
+checkpoint file, so an interrupted run continues where it stopped. At the end the new history is written next to the
+old one (or into the configured storage, with --in-place) together with a report of the entries whose correct_words or respeak_words
+changed."""
+
+import argparse
+import os
+from pathlib import Path
+from typing import Callable
+
+from pydantic import BaseModel
+
+from .config import ConfigDataDO, load_config
+from .scoring_serialization import ScoreDO, ScoreHistoryDO
+from .sentence_accuracy import PreparedSentence, score_sentences_batch
+
+
+class RescoredEntryDO(BaseModel):
+    """A line of the checkpoint file."""
+
+    index: int  # Index into ScoreHistoryDO.history
+    score: ScoreDO
+
+
+def can_rescore(score: ScoreDO) -> bool:
+    # The arcade answers did not store the sentences before, so there is nothing to score them against.
+    return score.correct_sentence.strip() != "" and score.respeak_sentence != ""
+
+
+def rescored(
+    score: ScoreDO, result: tuple[float, float, bool, list[bool], list[int], list[bool]]
+) -> ScoreDO:
+    """The copy of the score with the result of score_sentence."""
+    (
+        respeak_accuracy,
+        correct_accuracy,
+        flag_correct,
+        correct_words,
+        _,
+        respeak_words,
+    ) = result
+    return score.model_copy(
+        update={
+            "respeak_accuracy": respeak_accuracy,
+            "correct_accuracy": correct_accuracy,
+            "flag_correct": flag_correct,
+            "correct_words": correct_words,
+            "respeak_words": respeak_words,
+        }
+    )
+
+
+def load_checkpoint(checkpoint_file: Path) -> dict[int, ScoreDO]:
+    if not checkpoint_file.exists():
+        return {}
+    ans = {}
+    for line in checkpoint_file.read_text("utf-8").splitlines():
+        if line.strip() == "":
+            continue
+        try:
+            entry = RescoredEntryDO.model_validate_json(line)
+        except ValueError:
+            break  # The last line may be cut short by the interruption.
+        ans[entry.index] = entry.score
+    return ans
+
+
+def rescore_history(
+    history: ScoreHistoryDO,
+    checkpoint_file: Path,
+    chunk_size: int = 1000,
+    max_workers: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> dict[int, ScoreDO]:
+    """Re-scores all the entries of the history that can be re-scored. Returns the new scores by their index.
+
+    The entries already in the checkpoint file are not scored again."""
+    done = load_checkpoint(checkpoint_file)
+    todo = [
+        i
+        for i, score in enumerate(history.history)
+        if i not in done and can_rescore(score)
+    ]
+    total = len(done) + len(todo)
+    with checkpoint_file.open("a", encoding="utf-8") as checkpoint:
+        for start in range(0, len(todo), chunk_size):
+            chunk = todo[start : start + chunk_size]
+            results = score_sentences_batch(
+                [
+                    (
+                        history.history[i].correct_sentence,
+                        history.history[i].respeak_sentence,
+                        history.history[i].user_answer,
+                    )
+                    for i in chunk
+                ],
+                max_workers=max_workers,
+            )
+            for i, result in zip(chunk, results):
+                done[i] = rescored(history.history[i], result)
+                checkpoint.write(
+                    RescoredEntryDO(index=i, score=done[i]).model_dump_json() + "\n"
+                )
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+            if progress is not None:
+                progress(len(done), total)
+    return done
+
+
+def _format_words_diff(words: list[str], old: list[bool], new: list[bool]) -> str:
+    changes = []
+    for i in range(max(len(old), len(new))):
+        old_flag = old[i] if i < len(old) else None
+        new_flag = new[i] if i < len(new) else None
+        if old_flag != new_flag:
+            word = words[i] if i < len(words) else f"#{i}"
+            changes.append(f"{word} {_mark(old_flag)}→{_mark(new_flag)}")
+    return ", ".join(changes)
+
+
+def _mark(flag: bool | None) -> str:
+    if flag is None:
+        return "-"
+    return "✓" if flag else "✗"
+
+
+def make_report(history: ScoreHistoryDO, rescored_scores: dict[int, ScoreDO]) -> str:
+    """A human-readable list of the entries whose correct_words or respeak_words changed."""
+    lines = []
+    changed = 0
+    for i, new in sorted(rescored_scores.items()):
+        old = history.history[i]
+        if (
+            old.correct_words == new.correct_words
+            and old.respeak_words == new.respeak_words
+        ):
+            continue
+        changed += 1
+        words = PreparedSentence(new.correct_sentence).tokens
+        lines.append(f"#{i} {old.timestamp:%Y-%m-%d %H:%M:%S} «{new.correct_sentence}»")
+        lines.append(f"  user answer: «{new.user_answer}»")
+        if old.correct_words != new.correct_words:
+            lines.append(
+                f"  correct_words: {_format_words_diff(words, old.correct_words, new.correct_words)}"
+            )
+        if old.respeak_words != new.respeak_words:
+            lines.append(
+                f"  respeak_words: {_format_words_diff(words, old.respeak_words, new.respeak_words)}"
+            )
+        lines.append(f"  accuracy: {old.accuracy:.3f} → {new.accuracy:.3f}")
+    header = [
+        f"Entries: {len(history.history)}, re-scored: {len(rescored_scores)}, "
+        f"skipped: {len(history.history) - len(rescored_scores)}, changed: {changed}",
+        "",
+    ]
+    return "\n".join(header + lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-scores the answer history")
+    parser.add_argument("--config-path", type=Path, default=Path("config.json"))
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Where to write the re-scored history as json. Defaults to <history journal file>.rescored.json",
+    )
+    parser.add_argument(
+        "--in-place",
+        action="store_true",
+        help="Store the re-scored history in the configured storage instead",
+    )
+    parser.add_argument("--report", type=Path, default=Path("rescore_report.txt"))
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help="Defaults to <output>.checkpoint.jsonl",
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.config_path.exists():
+        config = load_config(args.config_path)
+    else:
+        config = ConfigDataDO()
+    history = config.load_history(complete=True)
+
+    if args.output is not None:
+        output = args.output
+    else:
+        output = config.history_journal_file.with_suffix(".rescored.json")
+    checkpoint_file = args.checkpoint or output.with_name(
+        output.name + ".checkpoint.jsonl"
+    )
+
+    def progress(done: int, total: int):
+        print(f"Re-scored {done}/{total}")
+
+    rescored_scores = rescore_history(
+        history,
+        checkpoint_file,
+        chunk_size=args.chunk_size,
+        max_workers=args.workers,
+        progress=progress,
+    )
+
+    args.report.write_text(make_report(history, rescored_scores), "utf-8")
+    new_history = ScoreHistoryDO(
+        history=[
+            rescored_scores.get(i, score) for i, score in enumerate(history.history)
+        ]
+    )
+    if args.in_place:
+        config.save_history(new_history)
+        config.close_storage()
+        output = f"the {config.storage_backend} storage"
+    else:
+        output.write_text(new_history.model_dump_json(indent=4), "utf-8")
+    checkpoint_file.unlink()
+    print(f"Written {output} and {args.report}")
+
+
+if __name__ == "__main__":
+    main()
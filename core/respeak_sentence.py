@@ -1,3 +1,5 @@
+from typing import Callable
+
 from client.iface import ISpeech2Text, IText2Speech
 from .iface_scoring import IRespeak
 from .text2speech_gtts import getText2Speech
@@ -45,6 +47,38 @@ def get_fake_respeak_server() -> IRespeak:
     return FakeRespeakServer()
 
 
+class CachedRespeak(IRespeak):
+    """Remembers the respeak transcript of each sentence. The server is started on the first sentence that is not
+    in the cache, so a start with the transcripts from the snapshot of the client state does not wait for it."""
+
+    _make_server: Callable[[], IRespeak]
+    _server: IRespeak | None
+    _transcripts: dict[str, str]
+
+    def __init__(
+        self,
+        make_server: Callable[[], IRespeak],
+        transcripts: dict[str, str] | None = None,
+    ):
+        self._make_server = make_server
+        self._server = None
+        self._transcripts = dict(transcripts or {})
+
+    @property
+    def transcripts(self) -> dict[str, str]:
+        return self._transcripts
+
+    def respeak(self, text: str) -> tuple[bool, str]:
+        if text in self._transcripts:
+            return True, self._transcripts[text]
+        if self._server is None:
+            self._server = self._make_server()
+        success, transcript = self._server.respeak(text)
+        if success:
+            self._transcripts[text] = transcript
+        return success, transcript
+
+
 def get_respeak_server(s2t: ISpeech2Text) -> IRespeak:
     try:
         return get_real_respeak_server(s2t)
@@ -0,0 +1,322 @@
+"""Append-only storage of the answer history.
+
+The history lives in two JSONL files: the snapshot, with all the scores up to the last compaction, and the journal,
+with the scores appended since then. Both start with a JournalHeaderDO line, followed by one ScoreDO per line.
+Appending an answer writes one line; the fsync is batched. Every so often the whole history is compacted into a new
+snapshot and the journal starts over.
+
+The compaction replaces the snapshot first and the journal second, each with a new generation number. If it is
+interrupted in between, the journal has an older generation than the snapshot, and its scores (already in the
+snapshot) are not replayed."""
+
+import datetime
+import os
+import re
+import time
+from pathlib import Path
+from typing import Iterator, TextIO
+
+from pydantic import BaseModel, ValidationError
+
+from .scoring_serialization import ScoreDO, ScoreHistoryDO
+
+
+class JournalHeaderDO(BaseModel):
+    """The first line of the snapshot and of the journal."""
+
+    format: str = "score-journal"
+    version: int = 1
+    generation: int = 0
+
+
+def _write_lines_atomically(path: Path, lines: list[str]):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line)
+            f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_header(path: Path) -> JournalHeaderDO | None:
+    if not path.exists():
+        return None
+    with path.open("rb") as f:
+        try:
+            return JournalHeaderDO.model_validate_json(f.readline())
+        except ValidationError:
+            return None
+
+
+_TIMESTAMP = re.compile(rb'"timestamp":"([^"]*)"')
+_SCAN_BLOCK = 1 << 16
+
+
+def _line_timestamp(line: bytes) -> datetime.datetime:
+    # The strings of the other fields have their quotes escaped, so the first match is the timestamp field.
+    match = _TIMESTAMP.search(line)
+    if match is not None:
+        try:
+            return datetime.datetime.fromisoformat(match.group(1).decode())
+        except ValueError:
+            pass
+    return ScoreDO.model_validate_json(line).timestamp
+
+
+def _find_window_offset(path: Path, data_start: int, since: datetime.datetime) -> int:
+    """Offset of the first line of the run of lines at the end of the file with the timestamp at or after since.
+
+    Reads the file backwards, so it costs only as much as the window. The lines are expected in the time order."""
+    with path.open("rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        # The bytes from pos to the start of the last line found in the window.
+        buffer = b""
+        while True:
+            split = buffer.rfind(b"\n", 0, len(buffer) - 1)
+            if split == -1 and pos > data_start:
+                read_size = min(_SCAN_BLOCK, pos - data_start)
+                pos -= read_size
+                f.seek(pos)
+                buffer = f.read(read_size) + buffer
+                continue
+            line = buffer[split + 1 :]
+            if line == b"":
+                return pos
+            if _line_timestamp(line) < since:
+                return pos + split + 1 + len(line)
+            buffer = buffer[: split + 1]
+
+
+def _iter_lines(path: Path, start: int, end: int) -> Iterator[ScoreDO]:
+    if start >= end:
+        return  # Also when there is no snapshot yet
+    with path.open("rb") as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            line = f.readline()
+            pos += len(line)
+            yield ScoreDO.model_validate_json(line)
+
+
+def _read_lines(path: Path) -> tuple[JournalHeaderDO | None, list[ScoreDO], int]:
+    # Returns the header, the scores and the size of the valid prefix of the file in bytes. Reading stops at
+    # the first line that does not parse, which can only be the last one, cut short by a crash.
+    if not path.exists():
+        return None, [], 0
+    data = path.read_bytes()
+    header = None
+    scores = []
+    valid_size = 0
+    pos = 0
+    while pos < len(data):
+        end = data.find(b"\n", pos)
+        if end == -1:
+            break  # An unterminated line was not written completely.
+        line = data[pos:end]
+        try:
+            if header is None:
+                header = JournalHeaderDO.model_validate_json(line)
+            else:
+                scores.append(ScoreDO.model_validate_json(line))
+        except ValidationError:
+            break
+        pos = end + 1
+        valid_size = pos
+    return header, scores, valid_size
+
+
+class ScoreJournal:
+    """The snapshot and the journal of the answer history. See the module docstring."""
+
+    _journal_file: Path
+    _snapshot_file: Path
+    _fsync_every: int  # Number of appended scores after which the journal is fsynced
+    _fsync_interval: float  # Seconds after which the journal is fsynced
+    # Number of scores in the journal after which it should be compacted
+    _compact_every: int
+    _generation: int
+    _tail_count: int  # Number of scores in the journal
+    _unsynced: int  # Number of scores written since the last fsync
+    _last_sync: float
+    _file: TextIO | None  # The journal opened for appending
+    # Set by load(since), None if everything was loaded
+    _window_start: datetime.datetime | None
+    _window_offset: int  # Where the loaded lines of the snapshot start
+    _data_start: int  # Where the lines after the header of the snapshot start
+
+    def __init__(
+        self,
+        journal_file: Path,
+        snapshot_file: Path | None = None,
+        fsync_every: int = 16,
+        fsync_interval: float = 5.0,
+        compact_every: int = 1000,
+    ):
+        self._journal_file = journal_file
+        if snapshot_file is None:
+            snapshot_file = journal_file.with_suffix(".snapshot.jsonl")
+        self._snapshot_file = snapshot_file
+        self._fsync_every = fsync_every
+        self._fsync_interval = fsync_interval
+        self._compact_every = compact_every
+        self._generation = 0
+        self._tail_count = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._file = None
+        self._window_start = None
+        self._window_offset = 0
+        self._data_start = 0
+
+    @property
+    def journal_file(self) -> Path:
+        return self._journal_file
+
+    @property
+    def snapshot_file(self) -> Path:
+        return self._snapshot_file
+
+    def exists(self) -> bool:
+        return self._snapshot_file.exists() or self._journal_file.exists()
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self._tail_count >= self._compact_every
+
+    def load(self, since: datetime.datetime | None = None) -> ScoreHistoryDO:
+        """Replays the snapshot and the journal. Must be called before the first append.
+
+        With `since`, only the answers of the snapshot from that time on are read; the history gets the older ones
+        as its older_scores. The journal is always read whole."""
+        self.close()
+        snapshot_header = _read_header(self._snapshot_file)
+        journal_header, tail, valid_size = _read_lines(self._journal_file)
+        self._generation = snapshot_header.generation if snapshot_header else 0
+        if journal_header is None or journal_header.generation != self._generation:
+            # Missing, or left behind by an interrupted compaction.
+            _write_lines_atomically(
+                self._journal_file,
+                [JournalHeaderDO(generation=self._generation).model_dump_json()],
+            )
+            tail = []
+        elif valid_size < self._journal_file.stat().st_size:
+            with self._journal_file.open("r+b") as f:
+                f.truncate(valid_size)
+        self._tail_count = len(tail)
+
+        self._window_start = since
+        if snapshot_header is None:
+            self._data_start = self._window_offset = 0
+            scores = []
+        else:
+            with self._snapshot_file.open("rb") as f:
+                self._data_start = len(f.readline())
+            end = self._snapshot_file.stat().st_size
+            if since is None:
+                self._window_offset = self._data_start
+            else:
+                self._window_offset = _find_window_offset(
+                    self._snapshot_file, self._data_start, since
+                )
+            scores = list(_iter_lines(self._snapshot_file, self._window_offset, end))
+
+        history = ScoreHistoryDO()
+        for score in scores + tail:
+            history.add_score(score, score.correct_sentence)
+        if since is not None:
+            history.set_window(since, self._older_scores)
+        return history
+
+    def _older_scores(self) -> Iterator[ScoreDO]:
+        # The lines of the snapshot before the window; valid also after a compaction, which keeps them first.
+        return _iter_lines(self._snapshot_file, self._data_start, self._window_offset)
+
+    def _open(self):
+        if self._file is None:
+            if not self._journal_file.exists():
+                self.load()
+            self._file = self._journal_file.open("a", encoding="utf-8")
+        return self._file
+
+    def append(self, score: ScoreDO):
+        """Appends the score to the journal. The line reaches the OS right away, the disk at the next fsync."""
+        f = self._open()
+        f.write(score.model_dump_json())
+        f.write("\n")
+        f.flush()
+        self._tail_count += 1
+        self._unsynced += 1
+        if (
+            self._unsynced >= self._fsync_every
+            or time.monotonic() - self._last_sync >= self._fsync_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        if self._file is not None and self._unsynced > 0:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def compact(self, history: ScoreHistoryDO):
+        """Writes the history as the new snapshot and empties the journal.
+
+        If the history was loaded from this journal with a window, the answers before the window are copied over
+        from the old snapshot."""
+        self.close()
+        snapshot_header = _read_header(self._snapshot_file)
+        if snapshot_header is not None:
+            # Not necessarily loaded by this instance.
+            self._generation = max(self._generation, snapshot_header.generation)
+        self._generation += 1
+        header = JournalHeaderDO(generation=self._generation).model_dump_json()
+
+        tmp_path = self._snapshot_file.with_name(self._snapshot_file.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            f.write(header.encode() + b"\n")
+            data_start = f.tell()
+            if not history.is_complete and self._window_offset > self._data_start:
+                assert history.window_start == self._window_start, (
+                    "The history was not loaded from this journal"
+                )
+                with self._snapshot_file.open("rb") as old:
+                    old.seek(self._data_start)
+                    left = self._window_offset - self._data_start
+                    while left > 0:
+                        block = old.read(min(_SCAN_BLOCK, left))
+                        f.write(block)
+                        left -= len(block)
+            window_offset = f.tell()
+            for score in history.history:
+                f.write(score.model_dump_json().encode() + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_file)
+        self._data_start = data_start
+        self._window_offset = data_start if history.is_complete else window_offset
+        _write_lines_atomically(self._journal_file, [header])
+        self._tail_count = 0
+
+
+def migrate_history_json(history_file: Path, journal: ScoreJournal) -> bool:
+    """One-time import of the old history.json into the empty journal. The json file is left as it was.
+
+    Returns whether anything was migrated."""
+    if journal.exists() or not history_file.exists():
+        return False
+    old = ScoreHistoryDO.model_validate_json(history_file.read_text("utf-8"))
+    history = ScoreHistoryDO()
+    for score in old.history:
+        history.add_score(score, score.correct_sentence)
+    journal.compact(history)
+    return True
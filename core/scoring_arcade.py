@@ -7,28 +7,48 @@ from typing import Callable
 from pathlib import Path
 from overrides import overrides
 
+from .alignment_backends import set_default_backend
+from .levenshtein import set_low_memory_threshold
+from .arcade_scheduler import (
+    ArcadeScheduler,
+    decayed_means,
+    score_arrays,
+    timestamp_seconds,
+)
+from .question_index import QuestionIndexDO, calculate_timeout_from_sentence
 from .sentence_accuracy import score_sentence
-from .util import just_letters
+
+
+# The weight of an answer 1 minute old (or younger) is 100, and of one 14 days old is 0.01. Older ones are not counted.
+WEIGHT_POINTS = (60, 100, 14 * 24 * 60 * 60, 0.01)
+SCORE_WINDOW = datetime.timedelta(days=14)
+MIN_SCORE_AGE = datetime.timedelta(minutes=1)
+
+
+def weighting_slope(x0: float, weight0: float, x1: float, weight1: float) -> float:
+    """The slope of the exponential through the two points (x0, weight0) and (x1, weight1)."""
+    return float(np.log(weight1 / weight0) / (x1 - x0))
 
 
 def weighting_function(
     x0: float, weight0: float, x1: float, weight1: float
 ) -> Callable[[float], float]:
     """Returns a function that gives a weight to a given value x, based on the two points (x0, weight0) and (x1, weight1)."""
-    slope = -np.log(weight0 / weight1) / (x0 - x1)
-    amplitude = weight0 * np.exp(slope * x0)
+    slope = weighting_slope(x0, weight0, x1, weight1)
+    amplitude = weight0 * np.exp(-slope * x0)
 
     return lambda x: amplitude * np.exp(slope * x)
 
 
-def calculate_timeout_from_sentence(correct_sentence: str) -> float:
-    return len(just_letters(correct_sentence)) / 6 + 4
-
-
 def calc_time_penalty(
-    thinking_time: float, speaking_time: float, correct_sentence: str
+    thinking_time: float,
+    speaking_time: float,
+    correct_sentence: str,
+    timeout: float | None = None,
 ) -> float:
-    timeout = calculate_timeout_from_sentence(correct_sentence)
+    """:param timeout: calculate_timeout_from_sentence(correct_sentence), if already known."""
+    if timeout is None:
+        timeout = calculate_timeout_from_sentence(correct_sentence)
     if thinking_time < timeout:
         return 1
     if thinking_time > timeout * 10:
@@ -53,14 +73,17 @@ class Scoring_Arcade(IScoring):
     _config: ConfigDataDO
 
     _score_history: ScoreHistoryDO
-    _weight_function: Callable[[float], float] = weighting_function(
-        60, 100, 14 * 24 * 60 * 60, 0.01
-    )
+    _scheduler: ArcadeScheduler | None  # Built on the first get_next_sentence
 
     _questions: set[str]
+    _question_index: QuestionIndexDO
+    # The sentence_scores from the snapshot of the client state, used only for the first sentence.
+    _snapshot_scores: list[tuple[float, str]] | None
 
     def __init__(self, config: ConfigDataDO):
         self._config = config
+        set_default_backend(config.alignment_backend)
+        set_low_memory_threshold(config.alignment_low_memory_cells)
 
         self._score_history = config.load_history()
 
@@ -68,15 +91,32 @@ class Scoring_Arcade(IScoring):
 
         self._load_questions()
 
+        self._scheduler = None
+        self._snapshot_scores = None
+        if config.snapshot is not None:
+            scores = config.snapshot.arcade_scores()
+            if scores is not None and {s for _, s in scores} == self._questions:
+                self._snapshot_scores = scores
+
     @property
     def config(self):
         return self._config
 
+    @property
+    @overrides
+    def score_history(self) -> ScoreHistoryDO:
+        return self._score_history
+
+    @property
+    @overrides
+    def question_index(self) -> QuestionIndexDO:
+        return self._question_index
+
     def _load_questions(self):
         """Loads questions from the questions file."""
-        for sentence in self.config.load_questions():
-            if sentence not in self._questions:
-                self._questions.add(sentence)
+        self._question_index = self.config.load_question_index()
+        # The distinct sentences, from the line index shared with the story mode.
+        self._questions.update(self.config.question_store().unique_sentences())
 
     @property
     def _all_sentence_scores(self) -> dict[str, list[ScoreDO]]:
@@ -87,43 +127,63 @@ class Scoring_Arcade(IScoring):
 
         return ans
 
+    def _decayed_scores(
+        self, sentences: list[str], scores: list[ScoreDO], now: datetime.datetime
+    ) -> list[float]:
+        arrays = score_arrays(
+            scores, {sentence: i for i, sentence in enumerate(sentences)}
+        )
+        return decayed_means(
+            *arrays,
+            len(sentences),
+            slope=weighting_slope(*WEIGHT_POINTS),
+            window=SCORE_WINDOW.total_seconds(),
+            min_age=MIN_SCORE_AGE.total_seconds(),
+            now=timestamp_seconds(now),
+        ).tolist()
+
     def sentence_score(self, sentence: str) -> float:
         """Returns the score of a sentence."""
-        scores = [
-            score
-            for score in self._score_history.scores_by_sentence(sentence)
-            if score.timestamp - datetime.datetime.now() < datetime.timedelta(days=14)
-        ]  # We only care for the last 14 days
-        # exponential-weights. We want to give more weight to the most recent scores, and have a exponential decay for the older ones as a function of time delta to now.
-        # We will use decay factor such that the weight for a sentece done 1 minute ago is 100, and weight of sentence done 14 days ago is 0.01.
-        if len(scores) == 0:
-            return 0.0
-
-        weights = [
-            self._weight_function(
-                max(
-                    datetime.timedelta(minutes=1).seconds,
-                    (datetime.datetime.now() - score.timestamp).seconds,
-                )
-            )
-            for score in scores
-        ]
-
-        return sum(
-            [score.overall_score * weight for score, weight in zip(scores, weights)]
-        ) / sum(weights)
+        # Exponential weights: more weight to the most recent scores, decaying with the time to now. The weight of
+        # an answer 1 minute ago is 100, and of one 14 days ago is 0.01; only the last 14 days count.
+        now = datetime.datetime.now()
+        scores = self._score_history.scores_since(now - SCORE_WINDOW, sentence)
+        return self._decayed_scores([sentence], scores, now)[0]
 
     def sentence_scores(self) -> list[tuple[float, str]]:
         """Returns a list of tuples with the sentence and its score. The list is sorted by score."""
-        scores = [
-            (self.sentence_score(sentence), sentence) for sentence in self._questions
-        ]
-        return sorted(scores)
+        now = datetime.datetime.now()
+        sentences = list(self._questions)
+        scores = self._decayed_scores(
+            sentences, self._score_history.scores_since(now - SCORE_WINDOW), now
+        )
+        return sorted(zip(scores, sentences))
+
+    def scheduler(self) -> ArcadeScheduler:
+        """The incremental equivalent of sentence_scores(), built from the history on the first call."""
+        if self._scheduler is None:
+            now = datetime.datetime.now()
+            self._scheduler = ArcadeScheduler(
+                self._questions,
+                self._score_history.scores_since(now - SCORE_WINDOW),
+                slope=weighting_slope(*WEIGHT_POINTS),
+                window=SCORE_WINDOW.total_seconds(),
+                min_age=MIN_SCORE_AGE.total_seconds(),
+                now=now,
+            )
+        return self._scheduler
 
     @overrides
     def get_next_sentence(self) -> str:
         """Returns the sentence that the user should be asked next."""
-        return self.sentence_scores()[0][1]
+        if self._snapshot_scores is not None:
+            scores, self._snapshot_scores = self._snapshot_scores, None
+            return scores[0][1]
+        return self.scheduler().next_sentence()
+
+    @overrides
+    def get_char_ranges(self, sentence: str) -> list[tuple[int, int]]:
+        return self._question_index.entry(sentence).char_ranges
 
     @overrides
     def set_next_sentence(self, new_index: int):
@@ -145,6 +205,7 @@ class Scoring_Arcade(IScoring):
         :param respeak_sentence:
         """
         assert sentence in self._questions, f"Unknown sentence: {sentence}"
+        question = self._question_index.entry(sentence)
 
         (
             accuracy_respeak,
@@ -154,14 +215,18 @@ class Scoring_Arcade(IScoring):
             _,
             words_respeak,
         ) = score_sentence(
-            correct_sentence=sentence,
+            correct_sentence=question.prepared(),
             respeak_sentence=respeak_sentence,
             user_sentence=user_answer,
+            correct2respeak_map=self.config.question_store().respeak_map(
+                sentence, respeak_sentence
+            ),
         )
         time_penalty = calc_time_penalty(
             thinking_time=thinking_time,
             speaking_time=speaking_time,
             correct_sentence=sentence,
+            timeout=question.timeout,
         )
 
         score = ScoreDO(
@@ -174,16 +239,20 @@ class Scoring_Arcade(IScoring):
             timestamp=datetime.datetime.now(),
             saved_audio=saved_audio_path,
             time_penalty=time_penalty,
+            correct_sentence=sentence,
+            respeak_sentence=respeak_sentence,
             respeak_words=words_respeak,
             correct_words=words_correct,
         )
 
         self._score_history.add_score(score, sentence)
+        if self._scheduler is not None:
+            self._scheduler.add_score(score)
 
-        self.save()
+        self.config.append_history(score, self._score_history)
 
         return score
 
     def save(self):
-        """Saves the history of the scores. This function is called automatically after storing each answer."""
+        """Saves the whole history of the scores. Each answer is already appended to the journal when it is stored."""
         self.config.save_history(self._score_history)
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import bisect
 import datetime
 import json
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator
 
 from pydantic import BaseModel, Field
 
+from .util import write_text_atomically
+
+if TYPE_CHECKING:
+    from .iface_storage import IScoreStorage
+    from .write_behind import WriteBehind
+
 
 class ScoreDO(BaseModel):
     respeak_accuracy: float = 0.0
@@ -45,6 +53,30 @@ class ScoreDO(BaseModel):
         return self.effort_done * self.accuracy
 
 
+class RollupDO(BaseModel):
+    """Sums over a group of answers, e.g. the answers of one day or of one sentence."""
+
+    answers: int = 0
+    accuracy: float = 0.0
+    effort_done: float = 0.0
+    thinking_time: float = 0.0
+    speaking_time: float = 0.0
+
+    def added(self, score: ScoreDO) -> RollupDO:
+        """A new rollup with the score added."""
+        return RollupDO(
+            answers=self.answers + 1,
+            accuracy=self.accuracy + score.accuracy,
+            effort_done=self.effort_done + score.effort,
+            thinking_time=self.thinking_time + score.thinking_time,
+            speaking_time=self.speaking_time + score.speaking_time,
+        )
+
+    @property
+    def mean_accuracy(self) -> float:
+        return self.accuracy / self.answers if self.answers > 0 else 0.0
+
+
 class TotalScoreDO(BaseModel):
     accuracy: float = 0.0
     effort_done: float = 0.0
@@ -52,7 +84,17 @@ class TotalScoreDO(BaseModel):
     speaking_time: float = 0.0
     total_questions: int = 0
     story_index: int = 0
+    # Rollups by the day (ISO date) and by the correct sentence. add_score replaces their entries (a RollupDO is never
+    # modified), so a write reads each entry either as it was or as it is now.
+    daily: dict[str, RollupDO] = {}
+    by_sentence: dict[str, RollupDO] = {}
     _scores_file: Path
+    _storage: IScoreStorage | None = None  # Takes precedence over _scores_file
+    _write_behind: WriteBehind | None = None  # If set, save() only schedules the write
+    # The (field, key) of the rollups changed since the last save, None if any of them may have changed.
+    _changed_rollups: set[tuple[str, str]] | None = None
+    _last_copy: TotalScoreDO | None = None  # The last copy given to the write-behind
+    _saved: bool = False
 
     @staticmethod
     def LoadScores(scores_file: Path) -> TotalScoreDO:
@@ -64,6 +106,12 @@ class TotalScoreDO(BaseModel):
     def set_scores_file(self, scores_file: Path):
         self._scores_file = scores_file
 
+    def set_storage(self, storage: IScoreStorage):
+        self._storage = storage
+
+    def set_write_behind(self, write_behind: WriteBehind | None):
+        self._write_behind = write_behind
+
     def add_score(self, score: ScoreDO, increase_story_index: bool = False):
         self.accuracy += score.accuracy
         self.effort_done += score.effort
@@ -72,10 +120,67 @@ class TotalScoreDO(BaseModel):
         self.total_questions += 1
         if increase_story_index:
             self.story_index += 1
+        self.add_to_rollups(score)
         self.save()
 
+    def add_to_rollups(self, score: ScoreDO):
+        if score.correct_sentence == "":
+            return  # A skipped question, not an answer
+        self._add_rollup("daily", score.timestamp.date().isoformat(), score)
+        self._add_rollup("by_sentence", score.correct_sentence, score)
+
+    def _add_rollup(self, field: str, key: str, score: ScoreDO):
+        rollups: dict[str, RollupDO] = getattr(self, field)
+        rollups[key] = rollups.get(key, RollupDO()).added(score)
+        if self._changed_rollups is not None:
+            self._changed_rollups.add((field, key))
+
+    def set_rollups(self, daily: dict[str, RollupDO], by_sentence: dict[str, RollupDO]):
+        self.daily = daily
+        self.by_sentence = by_sentence
+        self._changed_rollups = None
+
+    def changed_rollups(self) -> set[tuple[str, str]] | None:
+        """The (field, key) of the rollups changed since the last save, None if all of them have to be written."""
+        return self._changed_rollups
+
+    def mark_rollups_saved(self):
+        """For the storage that loaded the scores: the rollups are the ones it holds."""
+        self._changed_rollups = set()
+
     def save(self):
-        self._scores_file.write_text(self.model_dump_json(indent=4))
+        if self._write_behind is None:
+            self.save_now()
+        else:
+            # A copy, so that the background write sees the totals as they are now.
+            self._write_behind.mark_dirty(
+                ("total_scores", id(self)), self._copy_for_write().save_now
+            )
+
+    def _copy_for_write(self) -> TotalScoreDO:
+        changed = self._changed_rollups
+        previous = self._last_copy
+        if changed is not None and previous is not None and not previous._saved:
+            # The new copy replaces the pending one, so it also writes the rollups that one would have.
+            if previous._changed_rollups is None:
+                changed = None
+            else:
+                changed |= previous._changed_rollups
+        ans = self.model_copy()
+        ans._changed_rollups = changed
+        ans._last_copy = None
+        ans._saved = False
+        self._last_copy = ans
+        self._changed_rollups = set()
+        return ans
+
+    def save_now(self):
+        if self._storage is not None:
+            self._storage.save_total_scores(self)
+        else:
+            write_text_atomically(self._scores_file, self.model_dump_json(indent=4))
+        self._saved = True
+        self._changed_rollups = set()
 
     def clear(self):
         self.accuracy = 0.0
@@ -88,18 +193,123 @@ class TotalScoreDO(BaseModel):
 
 
 class ScoreHistoryDO(BaseModel):
+    """All the answers, in the order they were given.
+
+    The scores are indexed by their sentence and by time. The index is built on the first query (so loading the
+    history costs nothing extra) and then kept up to date by add_score.
+
+    The history may be loaded only from window_start on. The older answers are then left in the storage, and
+    older_scores reads them on demand."""
+
     history: list[ScoreDO] = []
-    _sentences: dict[str, list[ScoreDO]]  # A dictionary of sentences and their scores
+    _sentences: (
+        dict[str, list[ScoreDO]] | None
+    )  # Scores of each sentence, ordered by the timestamp
+    _sentence_timestamps: (
+        dict[str, list[datetime.datetime]] | None
+    )  # Timestamps of _sentences, for bisect
+    _by_time: list[ScoreDO] | None  # All the scores, ordered by the timestamp
+    _timestamps: list[datetime.datetime] | None  # Timestamps of _by_time
+    _window_start: datetime.datetime | None  # None if the whole history is loaded
+    _older_scores: Callable[[], Iterator[ScoreDO]] | None
 
     def __init__(self, **data):
         super().__init__(**data)
+        self._sentences = None
+        self._sentence_timestamps = None
+        self._by_time = None
+        self._timestamps = None
+        self._window_start = None
+        self._older_scores = None
+
+    def set_window(
+        self,
+        window_start: datetime.datetime,
+        older_scores: Callable[[], Iterator[ScoreDO]],
+    ):
+        """Marks the history as loaded from window_start on, with older_scores reading the answers before it."""
+        self._window_start = window_start
+        self._older_scores = older_scores
+
+    @property
+    def window_start(self) -> datetime.datetime | None:
+        return self._window_start
+
+    @property
+    def is_complete(self) -> bool:
+        return self._window_start is None
+
+    def older_scores(self) -> Iterator[ScoreDO]:
+        """The answers before window_start that were not loaded, in their order."""
+        if self._older_scores is None:
+            return iter(())
+        return self._older_scores()
+
+    def all_scores(self) -> Iterator[ScoreDO]:
+        """All the answers, including the ones that were not loaded."""
+        yield from self.older_scores()
+        yield from self.history
+
+    def _build_index(self):
+        self._by_time = sorted(self.history, key=lambda score: score.timestamp)
+        self._timestamps = [score.timestamp for score in self._by_time]
         self._sentences = {}
+        for score in self._by_time:
+            self._sentences.setdefault(score.correct_sentence, []).append(score)
+        self._sentence_timestamps = {
+            sentence: [score.timestamp for score in scores]
+            for sentence, scores in self._sentences.items()
+        }
+
+    def _index(
+        self,
+    ) -> tuple[dict[str, list[ScoreDO]], dict[str, list[datetime.datetime]]]:
+        if self._sentences is None:
+            self._build_index()
+        return self._sentences, self._sentence_timestamps
 
     def scores_by_sentence(self, sentence: str) -> list[ScoreDO]:
-        return self._sentences.get(sentence, [])
+        """All the scores of the sentence, the oldest first."""
+        sentences, _ = self._index()
+        return sentences.get(sentence, [])
+
+    def scores_since(
+        self, since: datetime.datetime, sentence: str | None = None
+    ) -> list[ScoreDO]:
+        """The scores (of the sentence, or of all the sentences) given at or after `since`, the oldest first."""
+        sentences, sentence_timestamps = self._index()
+        if sentence is None:
+            scores, timestamps = self._by_time, self._timestamps
+        elif sentence in sentences:
+            scores, timestamps = sentences[sentence], sentence_timestamps[sentence]
+        else:
+            return []
+        return scores[bisect.bisect_left(timestamps, since) :]
 
     def add_score(self, score: ScoreDO, correct_answer: str):
+        if score.correct_sentence == "":
+            score.correct_sentence = correct_answer  # So that the index can be rebuilt from the history alone
         self.history.append(score)
-        if correct_answer not in self._sentences:
-            self._sentences[correct_answer] = []
-        self._sentences[correct_answer].append(score)
+        if self._sentences is None:
+            return
+        _insert_by_time(self._by_time, self._timestamps, score)
+        sentence = score.correct_sentence
+        if sentence not in self._sentences:
+            self._sentences[sentence] = []
+            self._sentence_timestamps[sentence] = []
+        _insert_by_time(
+            self._sentences[sentence], self._sentence_timestamps[sentence], score
+        )
+
+
+def _insert_by_time(
+    scores: list[ScoreDO], timestamps: list[datetime.datetime], score: ScoreDO
+):
+    # The answers come in the time order, so this is almost always an append.
+    if len(timestamps) == 0 or timestamps[-1] <= score.timestamp:
+        scores.append(score)
+        timestamps.append(score.timestamp)
+    else:
+        pos = bisect.bisect_right(timestamps, score.timestamp)
+        scores.insert(pos, score)
+        timestamps.insert(pos, score.timestamp)
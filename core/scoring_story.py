@@ -4,11 +4,14 @@ from pathlib import Path
 from overrides import overrides
 
 from core import ConfigDataDO
+from .alignment_backends import set_default_backend
+from .levenshtein import set_low_memory_threshold
 from .iface_scoring import IScoring
+from .question_index import QuestionIndexDO, calculate_effort
+from .iface_questions import IQuestionSource
 from .scoring_arcade import calc_time_penalty
 from .scoring_serialization import ScoreHistoryDO, ScoreDO
 from .sentence_accuracy import score_sentence
-from .util import just_letters
 
 
 class Scoring_Story(IScoring):
@@ -27,19 +30,37 @@ class Scoring_Story(IScoring):
     _score_history: ScoreHistoryDO
     _last_index: int = 0
 
-    _story: list[str]  # List of all the sentences in the story, in order.
+    # All the sentences in the story, in order, read on demand.
+    _story: IQuestionSource
+    # Indexes the sentences as they are asked (or takes them from the story bundle), so a long story is never indexed
+    # as a whole.
+    _question_index: QuestionIndexDO
 
     def __init__(self, config: ConfigDataDO, last_index: int = 0):
         self._config = config
+        set_default_backend(config.alignment_backend)
+        set_low_memory_threshold(config.alignment_low_memory_cells)
         self._score_history = config.load_history()
         self._last_index = last_index
 
-        self._story = self.config.load_questions()
+        self._story = config.question_store()
+        self._question_index = QuestionIndexDO()
+        self._question_index.set_lookup(self._story.entry)
 
     @property
     def config(self):
         return self._config
 
+    @property
+    @overrides
+    def score_history(self) -> ScoreHistoryDO:
+        return self._score_history
+
+    @property
+    @overrides
+    def question_index(self) -> QuestionIndexDO:
+        return self._question_index
+
     @overrides
     def get_next_sentence(self) -> str:
         """Returns the sentence that the user should be asked next."""
@@ -50,6 +71,10 @@ class Scoring_Story(IScoring):
     def set_next_sentence(self, new_index: int):
         self._last_index = new_index
 
+    @overrides
+    def get_char_ranges(self, sentence: str) -> list[tuple[int, int]]:
+        return self._question_index.entry(sentence).char_ranges
+
     @overrides
     def set_sentence_answer(
         self,
@@ -60,6 +85,7 @@ class Scoring_Story(IScoring):
         speaking_time: float,
         saved_audio_path: Path,
     ) -> ScoreDO:
+        question = self._question_index.entry(sentence)
         (
             accuracy_respeak,
             accuracy_correct,
@@ -68,20 +94,22 @@ class Scoring_Story(IScoring):
             respeak_map,
             respeak_words,
         ) = score_sentence(
-            correct_sentence=sentence,
+            correct_sentence=question.prepared(),
             respeak_sentence=respeak_sentence,
             user_sentence=user_answer,
+            correct2respeak_map=self._story.respeak_map(sentence, respeak_sentence),
         )
         words = correct_words if flag_correct else respeak_words
         time_penalty = calc_time_penalty(
             thinking_time=thinking_time,
             speaking_time=speaking_time,
             correct_sentence=sentence,
+            timeout=question.timeout,
         )
-        stripped_sentence = just_letters(sentence)
-        effort = len(stripped_sentence) - len(words) * 2
-        # Add quadratic component to the effort, normalized such that 90-letter effort will be double-scored
-        effort += effort * (effort / 140) ** 2 * 0.3
+        if len(words) == len(question.tokens):
+            effort = question.effort
+        else:  # The respeak map can have a different length, if nothing in the respeak matched the sentence.
+            effort = calculate_effort(question.letters, len(words))
 
         print(f"Effort: {effort}")
 
@@ -104,10 +132,10 @@ class Scoring_Story(IScoring):
 
         self._score_history.add_score(score, sentence)
 
-        self.save()
+        self.config.append_history(score, self._score_history)
 
         return score
 
     def save(self):
-        """Saves the history of the scores. This function is called automatically after storing each answer."""
+        """Saves the whole history of the scores. Each answer is already appended to the journal when it is stored."""
         self.config.save_history(self._score_history)
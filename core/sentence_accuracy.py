@@ -1,83 +1,46 @@
+import atexit
 import difflib
 import bisect
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Iterable
 
+import numpy as np
 
-from .util import just_letters
-
-
-class TokenMatchedContent:
-    _matched_content: list[int, int]  # index, size
-    _token_size: int  # Equals -1 after calling the add_unknown method
-
-    def __init__(self, token_size: int):
-        self._matched_content = []
-        self._token_size = token_size
-
-    def add_match(self, index: int, size: int):
-        self._matched_content.append((index, size))
-        assert self.matched_size() <= self._token_size
-
-    def matched_size(self) -> int:
-        ans = sum(
-            [size for _, size in self._matched_content]
-        )  # Should be equal or less than token_size
-        return ans
-
-    @property
-    def token_size(self) -> int:
-        if self._token_size >= 0:
-            return self._token_size
-        return self.matched_size()
-
-    def add_unknown(self):
-        """Adds unknown index to all the non-identified characters. Must be called only after all the matches have been added."""
-        assert self._token_size >= 0
-        ms = self.matched_size()
-        if ms < self._token_size:
-            self._matched_content.append((-1, self._token_size - ms))
-        self._token_size = -1
-
-    @property
-    def uniform_match(self) -> bool:
-        assert self._token_size == -1
-        assert len(self._matched_content) > 0
-        return len(self._matched_content) == 1
-
-    @property
-    def dominant_match(self) -> int:
-        assert self._token_size == -1
-        assert len(self._matched_content) > 0
-        return max(self._matched_content, key=lambda x: x[1])[0]
-
-    @property
-    def uniform_match_ignore_unknown(self) -> bool:
-        # Returns True if there is exactly one match, and it is not an unknown.
-        # Returns False if the majority match is unknown.
-        assert self._token_size == -1
-        assert len(self._matched_content) > 0
-        dominant_match = self.dominant_match
-        if dominant_match == -1:
-            return False
-        dominant_size = sum(
-            [size for idx, size in self._matched_content if idx == dominant_match]
-        )
-        return (
-            dominant_size >= self.token_size * 0.99
-        )  # 80% of the token must be the dominant match
+from . import alignment_backends
+from .alignment_backends import AUTO_BACKEND
+from .token_alignment import word_mapper_tokens
+from .util import just_letters, just_letters_mapping
 
 
 class MatchingContext:
-    _correct_matched_content: list[TokenMatchedContent]
+    """Maps the character matches between the correct and the user text onto their tokens.
+
+    Every match is split at the token boundaries into (correct token, user token, size) triples, kept in a NumPy
+    array in the order they were added, together with a running total of the matched characters of each correct token.
+    After add_unknowns the characters of each correct token that did not match are accounted to the user token -1."""
+
+    _correct_token_sizes: np.ndarray
+    _matched_sizes: (
+        np.ndarray
+    )  # Number of matched characters of each correct token, so far
+    _matches: (
+        np.ndarray
+    )  # (capacity, 3) array of (correct token, user token, size) triples
+    _match_count: int  # Number of used rows of _matches
     _user_tokens_sizes: list[int]  # Just sizes of each user token
     _user_token_by_pos: list[
         int
     ]  # Index->Pos for user token. Effectively, this is a list of token starts.
     _correct_token_by_pos: list[int]  # Index->Pos for correct token.
+    _dominant_matches: np.ndarray | None  # Set by add_unknowns
+    _cleanly_matched_tokens: np.ndarray | None  # Set by add_unknowns
 
     def __init__(self, correct_token_sizes: list[int], user_token_sizes: list[int]):
-        self._correct_matched_content = [
-            TokenMatchedContent(token_size) for token_size in correct_token_sizes
-        ]
+        self._correct_token_sizes = np.asarray(correct_token_sizes, dtype=np.int64)
+        self._matched_sizes = np.zeros(len(correct_token_sizes), dtype=np.int64)
+        self._matches = np.empty((2 * len(correct_token_sizes) + 16, 3), dtype=np.int64)
+        self._match_count = 0
         self._user_tokens_sizes = user_token_sizes
         self._user_token_by_pos = [0]
         for size in user_token_sizes:
@@ -85,6 +48,8 @@ class MatchingContext:
         self._correct_token_by_pos = [0]
         for size in correct_token_sizes:
             self._correct_token_by_pos.append(self._correct_token_by_pos[-1] + size)
+        self._dominant_matches = None
+        self._cleanly_matched_tokens = None
 
     def find_user_token_by_pos(self, pos: int) -> int:
         return bisect.bisect_left(self._user_token_by_pos, pos)
@@ -92,17 +57,31 @@ class MatchingContext:
     def find_correct_token_by_pos(self, pos: int) -> int:
         return bisect.bisect_right(self._correct_token_by_pos, pos) - 1
 
+    def _add_token_match(self, correct_index: int, user_index: int, size: int):
+        if self._match_count == len(self._matches):
+            self._matches = np.concatenate(
+                [self._matches, np.empty_like(self._matches)]
+            )
+        self._matches[self._match_count] = (correct_index, user_index, size)
+        self._match_count += 1
+        self._matched_sizes[correct_index] += size
+        assert (
+            self._matched_sizes[correct_index]
+            <= self._correct_token_sizes[correct_index]
+        )
+
     def add_match(self, correct_pos: int, user_pos: int, size: int):
         assert size > 0
+        assert self._dominant_matches is None, "add_unknowns was already called"
         correct_index_start = self.find_correct_token_by_pos(correct_pos)
         correct_index_end = self.find_correct_token_by_pos(correct_pos + size - 1)
 
         for correct_idx in range(correct_index_start, correct_index_end + 1):
-            correct_token = self._correct_matched_content[correct_idx]
+            correct_token_size = int(self._correct_token_sizes[correct_idx])
             correct_relpos = correct_pos - self._correct_token_by_pos[correct_idx]
-            assert correct_token.token_size >= correct_relpos >= 0
-            correct_size_left = correct_token.token_size - correct_relpos
-            assert correct_token.token_size >= correct_size_left > 0
+            assert correct_token_size >= correct_relpos >= 0
+            correct_size_left = correct_token_size - correct_relpos
+            assert correct_token_size >= correct_size_left > 0
 
             user_index = self.find_user_token_by_pos(user_pos)
             while (
@@ -114,7 +93,7 @@ class MatchingContext:
                 user_size_left = user_token_size - user_relpos
 
                 common_size = min(correct_size_left, user_size_left, size)
-                correct_token.add_match(user_index, common_size)
+                self._add_token_match(correct_idx, user_index, common_size)
                 correct_pos += common_size
                 user_pos += common_size
                 correct_size_left -= common_size
@@ -130,23 +109,270 @@ class MatchingContext:
                 break
 
     def add_unknowns(self):
-        for token in self._correct_matched_content:
-            token.add_unknown()
+        """Adds unknown index to all the non-identified characters and computes the dominant matches.
+        Must be called only after all the matches have been added."""
+        assert self._dominant_matches is None
+        missing = self._correct_token_sizes - self._matched_sizes
+        unknown_tokens = np.flatnonzero(missing > 0)
+        unknowns = np.stack(
+            [unknown_tokens, np.full_like(unknown_tokens, -1), missing[unknown_tokens]],
+            axis=1,
+        )
+        matches = np.concatenate([self._matches[: self._match_count], unknowns])
+        self._matches = matches
+        self._match_count = len(matches)
+        correct, user, size = matches[:, 0], matches[:, 1], matches[:, 2]
+
+        # The dominant match of a token is its largest triple; the earliest one if there is a tie.
+        order = np.lexsort((np.arange(len(matches)), -size, correct))
+        first = order[np.flatnonzero(np.diff(correct[order], prepend=-1))]
+        dominant = np.full(len(self._correct_token_sizes), -1, dtype=np.int64)
+        dominant[correct[first]] = user[first]
+
+        # A token is matched cleanly if (almost) all of it matched the dominant user token, which is not an unknown.
+        dominant_size = np.bincount(
+            correct,
+            weights=np.where(user == dominant[correct], size, 0),
+            minlength=len(dominant),
+        )
+        token_size = np.bincount(correct, weights=size, minlength=len(dominant))
+        self._cleanly_matched_tokens = (dominant != -1) & (
+            dominant_size >= token_size * 0.99
+        )
+        self._dominant_matches = dominant
 
     @property
     def cleanly_matched_tokens(self) -> list[bool]:
-        return [
-            token.uniform_match_ignore_unknown
-            for token in self._correct_matched_content
-        ]
+        assert self._cleanly_matched_tokens is not None
+        return self._cleanly_matched_tokens.tolist()
 
     @property
     def dominant_matches(self) -> list[int]:
-        return [token.dominant_match for token in self._correct_matched_content]
+        assert self._dominant_matches is not None
+        return self._dominant_matches.tolist()
 
 
-def word_mapper(
+def get_matching_blocks(a: str, b: str, matcher: str = AUTO_BACKEND) -> list:
+    """Returns the matching blocks of the two strings (objects with the a, b and size attributes).
+
+    The matcher is the name of one of the alignment_backends, or AUTO_BACKEND to let the dispatcher pick one.
+    (The TOKEN_MATCHER aligns whole words, so it has no character matching blocks.)"""
+    return alignment_backends.matching_blocks(a, b, matcher)
+
+
+TOKEN_MATCHER = (
+    alignment_backends.TOKEN_BACKEND
+)  # The word-level engine of token_alignment
+
+
+def _word_matcher(matcher: str) -> str:
+    # The word-level engine, if it is the configured default (see alignment_backends.set_default_backend).
+    if (
+        matcher == AUTO_BACKEND
+        and alignment_backends.default_backend() == TOKEN_MATCHER
+    ):
+        return TOKEN_MATCHER
+    return matcher
+
+
+# Alignments of at least that many tokens (spaces included) are split at the anchor words first.
+ANCHORING_MIN_TOKENS = 100
+# The gaps between the anchors are aligned in the process pool only above that many dp cells in total; below it,
+# sending them to the workers costs more than it saves.
+PARALLEL_GAP_CELLS = 4_000_000
+
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def process_pool() -> ProcessPoolExecutor:
+    """The process pool shared by score_sentences_batch and anchored_matching_blocks. It is started on the first use,
+    with a worker per CPU, and kept for the next ones, as starting the workers costs more than scoring a small batch.
+    The callers limit how much of it they use, see _pool_map.
+
+    The workers are started with forkserver (spawn where it is not available) rather than fork, so they do not
+    inherit the threads and the state of the client."""
+    global _process_pool
+    if _process_pool is None:
+        method = (
+            "forkserver"
+            if "forkserver" in multiprocessing.get_all_start_methods()
+            else "spawn"
+        )
+        _process_pool = ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context(method)
+        )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """Stops the workers of process_pool, if they were started. Called at exit."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+
+
+atexit.register(shutdown_process_pool)
+
+
+def _in_worker() -> bool:
+    # The workers of the pool do not start pools of their own.
+    return multiprocessing.parent_process() is not None
+
+
+def _pool_map(function: Callable, items: list, max_workers: int | None = None) -> list:
+    """[function(item) for item in items] in the process pool, with at most max_workers of them running at once (all
+    the workers of the pool if None)."""
+    pool = process_pool()
+    if max_workers is None:
+        return list(pool.map(function, items))
+    ans = [None] * len(items)
+    running: dict[Future, int] = {}
+    for index, item in enumerate(items):
+        if len(running) >= max_workers:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                ans[running.pop(future)] = future.result()
+        running[pool.submit(function, item)] = index
+    for future, index in running.items():
+        ans[index] = future.result()
+    return ans
+
+
+def find_anchors(
     correct_tokens: list[str], user_tokens: list[str]
+) -> list[tuple[int, int]]:
+    """Patience-diff anchors: (correct index, user index) of the words that occur exactly once in both token lists,
+    restricted to the longest subsequence in which they appear in the same order."""
+    correct_counts: dict[str, int] = {}
+    for token in correct_tokens:
+        correct_counts[token] = correct_counts.get(token, 0) + 1
+    user_counts: dict[str, int] = {}
+    user_index: dict[str, int] = {}
+    for j, token in enumerate(user_tokens):
+        user_counts[token] = user_counts.get(token, 0) + 1
+        user_index[token] = j
+    pairs = [
+        (i, user_index[token])
+        for i, token in enumerate(correct_tokens)
+        if token.strip() != ""
+        and correct_counts[token] == 1
+        and user_counts.get(token) == 1
+    ]
+
+    # Longest increasing subsequence of the user indices, by patience sorting.
+    pile_tops: list[int] = []  # User index on top of each pile
+    pile_top_pairs: list[int] = []  # Index into pairs of the top of each pile
+    back: list[
+        int
+    ] = []  # Index into pairs of the top of the previous pile, when the pair was placed
+    for k, (_, j) in enumerate(pairs):
+        pile = bisect.bisect_left(pile_tops, j)
+        back.append(pile_top_pairs[pile - 1] if pile > 0 else -1)
+        if pile == len(pile_tops):
+            pile_tops.append(j)
+            pile_top_pairs.append(k)
+        else:
+            pile_tops[pile] = j
+            pile_top_pairs[pile] = k
+    anchors = []
+    k = pile_top_pairs[-1] if pile_top_pairs else -1
+    while k != -1:
+        anchors.append(pairs[k])
+        k = back[k]
+    anchors.reverse()
+    return anchors
+
+
+def _gap_matching_blocks(args: tuple[str, str, str]) -> list:
+    correct_text, user_text, matcher = args
+    if correct_text == "" or user_text == "":
+        return []
+    return get_matching_blocks(correct_text, user_text, matcher)
+
+
+def anchored_matching_blocks(
+    correct_tokens: list[str],
+    user_tokens: list[str],
+    matcher: str = AUTO_BACKEND,
+    parallel_cells: int | None = None,
+) -> list[difflib.Match]:
+    """Matching blocks of the joined tokens, with the anchor words (see find_anchors) matched up front and only the gaps
+    between them aligned by the matcher. The gaps are independent, so above parallel_cells dp cells in total
+    (PARALLEL_GAP_CELLS by default) they are aligned in the process pool.
+
+    Returns the blocks in increasing order, the adjacent ones merged, with the (len(a), len(b), 0) sentinel at the end,
+    like difflib."""
+    correct_starts = [0]
+    for token in correct_tokens:
+        correct_starts.append(correct_starts[-1] + len(token))
+    user_starts = [0]
+    for token in user_tokens:
+        user_starts.append(user_starts[-1] + len(token))
+    correct_text = "".join(correct_tokens)
+    user_text = "".join(user_tokens)
+
+    # The gaps are the text between the consecutive anchors, and before the first and after the last one.
+    gaps = []
+    anchors = []
+    correct_pos = user_pos = 0
+    for i, j in find_anchors(correct_tokens, user_tokens):
+        gaps.append((correct_pos, user_pos))
+        anchors.append((correct_starts[i], user_starts[j], len(correct_tokens[i])))
+        correct_pos, user_pos = correct_starts[i + 1], user_starts[j + 1]
+    gaps.append((correct_pos, user_pos))
+    gap_ends = [(a, b) for a, b, _ in anchors] + [(len(correct_text), len(user_text))]
+    gap_texts = [
+        (correct_text[a:a_end], user_text[b:b_end], matcher)
+        for (a, b), (a_end, b_end) in zip(gaps, gap_ends)
+    ]
+    if parallel_cells is None:
+        parallel_cells = PARALLEL_GAP_CELLS
+    cells = sum(len(a) * len(b) for a, b, _ in gap_texts)
+    if len(gap_texts) > 1 and cells > parallel_cells and not _in_worker():
+        gap_blocks = _pool_map(_gap_matching_blocks, gap_texts)
+    else:
+        gap_blocks = list(map(_gap_matching_blocks, gap_texts))
+
+    blocks: list[list[int]] = []
+
+    def add_block(a: int, b: int, size: int):
+        if size == 0:
+            return
+        if (
+            blocks
+            and blocks[-1][0] + blocks[-1][2] == a
+            and blocks[-1][1] + blocks[-1][2] == b
+        ):
+            blocks[-1][2] += size
+        else:
+            blocks.append([a, b, size])
+
+    for k, ((a, b), gap) in enumerate(zip(gaps, gap_blocks)):
+        for block_a, block_b, size in gap:
+            add_block(a + block_a, b + block_b, size)
+        if k < len(anchors):
+            add_block(*anchors[k])
+    return [difflib.Match(a, b, size) for a, b, size in blocks] + [
+        difflib.Match(len(correct_text), len(user_text), 0)
+    ]
+
+
+def _matching_blocks(
+    correct_tokens: list[str],
+    user_tokens: list[str],
+    correct_text: str,
+    user_text: str,
+    matcher: str,
+) -> list:
+    # Anchored matching blocks for the long alignments, plain ones for the rest.
+    if max(len(correct_tokens), len(user_tokens)) >= ANCHORING_MIN_TOKENS:
+        return anchored_matching_blocks(correct_tokens, user_tokens, matcher)
+    return get_matching_blocks(correct_text, user_text, matcher)
+
+
+def word_mapper(
+    correct_tokens: list[str], user_tokens: list[str], matcher: str = AUTO_BACKEND
 ) -> tuple[list[int], list[bool]]:
     # Returns a best-effort list of correct word indices for each consecutive user word.
     # Each index of the returned list corresponds to the index of the user token.
@@ -155,19 +381,42 @@ def word_mapper(
     # Obviously, the non-zero values in the list are in non-decreasing order.
     #
     # For each correct token returns the corresponding user token, and bool indicating whether there was a clean match.
-
-    sequence_matcher = difflib.SequenceMatcher(
-        None, "".join(correct_tokens), "".join(user_tokens), autojunk=False
+    matcher = _word_matcher(matcher)
+    if matcher == TOKEN_MATCHER:
+        with alignment_backends.count_call(
+            TOKEN_MATCHER, len(correct_tokens) + len(user_tokens)
+        ):
+            return word_mapper_tokens(correct_tokens, user_tokens)
+    return _map_words(
+        correct_tokens,
+        "".join(correct_tokens),
+        [len(token) for token in correct_tokens],
+        user_tokens,
+        "".join(user_tokens),
+        [len(token) for token in user_tokens],
+        matcher,
     )
-    mb = sequence_matcher.get_matching_blocks()
+
+
+def _map_words(
+    correct_tokens: list[str],
+    correct_text: str,
+    correct_token_sizes: list[int],
+    user_tokens: list[str],
+    user_text: str,
+    user_token_sizes: list[int],
+    matcher: str = AUTO_BACKEND,
+) -> tuple[list[int], list[bool]]:
+    # word_mapper on the already joined tokens.
+    mb = _matching_blocks(correct_tokens, user_tokens, correct_text, user_text, matcher)
     mb = [mb for mb in mb if mb.size > 0]
 
     if len(mb) == 0:
-        return [-1] * len(user_tokens), [False] * len(correct_tokens)
+        return [-1] * len(user_token_sizes), [False] * len(correct_token_sizes)
 
     matching_context = MatchingContext(
-        correct_token_sizes=[len(token) for token in correct_tokens],
-        user_token_sizes=[len(token) for token in user_tokens],
+        correct_token_sizes=correct_token_sizes,
+        user_token_sizes=user_token_sizes,
     )
 
     for a, b, size in mb:
@@ -177,11 +426,17 @@ def word_mapper(
     return matching_context.dominant_matches, matching_context.cleanly_matched_tokens
 
 
-def _score_internal(correct_tokens: list[str], user_tokens: list[str]) -> list[bool]:
-    sequence_matcher = difflib.SequenceMatcher(
-        None, "".join(correct_tokens), "".join(user_tokens)
+def _score_internal(
+    correct: "PreparedSentence", user: "PreparedSentence"
+) -> list[bool]:
+    correct_tokens = correct.tokens
+    mb = _matching_blocks(
+        correct_tokens,
+        user.tokens,
+        "".join(correct_tokens),
+        "".join(user.tokens),
+        AUTO_BACKEND,
     )
-    mb = sequence_matcher.get_matching_blocks()
     mb = [mb for mb in mb if mb.size > 0]
     if len(mb) == 0:
         return [False] * len(correct_tokens)
@@ -192,9 +447,8 @@ def _score_internal(correct_tokens: list[str], user_tokens: list[str]) -> list[b
         len(correct_tokens)
     )  # Each word will get a True if was correctly read, or False if not
 
-    # token[i] == "".join(correct_tokens[:i])[token_breaks[i]:token_breaks[i+1]]
-    token_lengths = [len(token) for token in correct_tokens]
-    token_breaks = [sum(token_lengths[:i]) for i in range(0, 1 + len(correct_tokens))]
+    # token[i] == "".join(correct_tokens)[token_breaks[i]:token_breaks[i+1]]
+    token_breaks = correct.token_breaks
 
     correct_pos_left = mb[sequence_pos].a
     correct_pos_right = mb[sequence_pos].size
@@ -256,33 +510,134 @@ def add_space_tokens(tokens: list[str]) -> list[str]:
     return token_spaces
 
 
-def make_respeak_map(correct_sentence: str, respeak_sentence: str) -> list[int]:
-    # Returns a list of correct word indices for each consecutive respeak word.
-    # We will use the same logic as in the score_internal function.
-    correct_sentence_letters = just_letters(correct_sentence)
-    respeak_sentence_letters = just_letters(respeak_sentence)
+class PreparedSentence:
+    """A sentence with everything the scoring needs from it computed once: the normalized text (just_letters),
+    its tokens with and without the space tokens, their sizes and offsets and the char ranges of the words in the
+    original text.
+
+    All the scoring functions accept either a PreparedSentence or a plain string."""
+
+    _sentence: str
+    _letters: str
+    _tokens: list[str]
+    _token_sizes: list[int]
+    _token_breaks: (
+        np.ndarray
+    )  # The start of each token in "".join(tokens), and the total length
+    _tokens_spaces: list[str]
+    _tokens_spaces_sizes: list[int]
+    _char_ranges: list[tuple[int, int]] | None
+
+    def __init__(
+        self,
+        sentence: str,
+        letters: str | None = None,
+        char_ranges: list[tuple[int, int]] | None = None,
+    ):
+        """The letters and the char_ranges can be given if they are already known (e.g. from the question index)."""
+        self._sentence = sentence
+        self._letters = just_letters(sentence) if letters is None else letters
+        self._tokens = self._letters.split()
+        self._token_sizes = [len(token) for token in self._tokens]
+        self._token_breaks = np.concatenate(
+            ([0], np.cumsum(self._token_sizes, dtype=np.int64))
+        )
+        self._tokens_spaces = add_space_tokens(self._tokens)
+        self._tokens_spaces_sizes = [len(token) for token in self._tokens_spaces]
+        self._char_ranges = char_ranges
+
+    @property
+    def sentence(self) -> str:
+        return self._sentence
+
+    @property
+    def letters(self) -> str:
+        return self._letters
+
+    @property
+    def tokens(self) -> list[str]:
+        return self._tokens
+
+    @property
+    def token_sizes(self) -> list[int]:
+        return self._token_sizes
+
+    @property
+    def token_breaks(self) -> np.ndarray:
+        return self._token_breaks
+
+    @property
+    def tokens_spaces(self) -> list[str]:
+        return self._tokens_spaces
+
+    @property
+    def tokens_spaces_sizes(self) -> list[int]:
+        return self._tokens_spaces_sizes
+
+    @property
+    def spaced_text(self) -> str:
+        # "".join(tokens_spaces), i.e. the letters with a space at both ends.
+        return f" {self._letters} " if self._tokens else " "
+
+    @property
+    def char_ranges(self) -> list[tuple[int, int]]:
+        # The (start, end) of each token in the original sentence. Only the highlighting needs them.
+        if self._char_ranges is None:
+            self._char_ranges = just_letters_mapping(self._sentence)
+        return self._char_ranges
+
+    def __repr__(self):
+        return f"PreparedSentence({self._sentence!r})"
 
-    correct_tokens = correct_sentence_letters.split()
-    respeak_tokens = respeak_sentence_letters.split()
 
-    correct_tokens_spaces = add_space_tokens(correct_tokens)
-    respeak_tokens_spaces = add_space_tokens(respeak_tokens)
+def prepare_sentence(sentence: str | PreparedSentence) -> PreparedSentence:
+    if isinstance(sentence, PreparedSentence):
+        return sentence
+    return PreparedSentence(sentence)
 
-    mapped_words, _ = word_mapper(correct_tokens_spaces, respeak_tokens_spaces)
+
+def make_respeak_map(
+    correct_sentence: str | PreparedSentence, respeak_sentence: str | PreparedSentence
+) -> list[int]:
+    # Returns a list of correct word indices for each consecutive respeak word.
+    # We will use the same logic as in the score_internal function.
+    correct = prepare_sentence(correct_sentence)
+    respeak = prepare_sentence(respeak_sentence)
+    correct_tokens = correct.tokens
+
+    mapped_words, _ = map_prepared_words(correct, respeak)
     for i, idx in enumerate(mapped_words):
         if idx == -1 and i % 2 == 1 and i >= 3:
             print(
-                f"Warning: correct word «{correct_tokens[i%2 + 1]}» not found in the respeak sentence."
+                f"Warning: correct word «{correct_tokens[i % 2 + 1]}» not found in the respeak sentence."
             )
 
     return mapped_words
 
 
+def map_prepared_words(
+    correct: PreparedSentence, user: PreparedSentence, matcher: str = AUTO_BACKEND
+) -> tuple[list[int], list[bool]]:
+    """word_mapper on the space-separated tokens of the prepared sentences."""
+    matcher = _word_matcher(matcher)
+    if matcher == TOKEN_MATCHER:
+        return word_mapper(correct.tokens_spaces, user.tokens_spaces, matcher)
+    return _map_words(
+        correct.tokens_spaces,
+        correct.spaced_text,
+        correct.tokens_spaces_sizes,
+        user.tokens_spaces,
+        user.spaced_text,
+        user.tokens_spaces_sizes,
+        matcher,
+    )
+
+
 def score_sentence_respeak(
     correct_token_sizes: list[int],
     correct2respeak_map: list[int],
-    respeak_sentence: str,
-    user_sentence: str,
+    respeak_sentence: str | PreparedSentence,
+    user_sentence: str | PreparedSentence,
 ) -> tuple[float, list[bool]]:
     """Scores the user sentence based on the proximity with the respeak sentece. The answer is mapped back
     to the correct tokens"""
@@ -299,15 +654,15 @@ def score_sentence_respeak(
 
 
 def score_sentence_correct(
-    correct_sentence: str, user_sentence: str
+    correct_sentence: str | PreparedSentence, user_sentence: str | PreparedSentence
 ) -> tuple[float, list[bool], list[int]]:
-    _, correct_errors, tokens = make_token_mapping_from_sentences(
-        correct_sentence=correct_sentence, user_sentence=user_sentence
+    correct = prepare_sentence(correct_sentence)
+    _, correct_errors, _ = make_token_mapping_from_sentences(
+        correct_sentence=correct, user_sentence=user_sentence
     )
 
-    correct_token_sizes = [len(token) for token in tokens]
-    ans = calc_score_from_error_list(correct_token_sizes, correct_errors)
-    return ans[0], ans[1], correct_token_sizes
+    ans = calc_score_from_error_list(correct.token_sizes, correct_errors)
+    return ans[0], ans[1], correct.token_sizes
 
 
 def calc_score_from_error_list(
@@ -336,41 +691,59 @@ def calc_score_from_error_list(
 
 
 def make_token_mapping_from_sentences(
-    correct_sentence: str, user_sentence: str
+    correct_sentence: str | PreparedSentence, user_sentence: str | PreparedSentence
 ) -> tuple[list[int], list[bool], list[str]]:
-    correct_sentence_letters = just_letters(correct_sentence)
-    user_sentence_letters = just_letters(user_sentence)
+    correct = prepare_sentence(correct_sentence)
+    user = prepare_sentence(user_sentence)
 
-    correct_tokens = correct_sentence_letters.split()
-    user_tokens = user_sentence_letters.split()
+    words, word_errors = map_prepared_words(correct, user)
 
-    correct_tokens_spaces = add_space_tokens(correct_tokens)
-    user_tokens_spaces = add_space_tokens(user_tokens)
+    return words, word_errors, correct.tokens
 
-    words, word_errors = word_mapper(correct_tokens_spaces, user_tokens_spaces)
 
-    return words, word_errors, correct_tokens
+def score_sentence(
+    correct_sentence: str | PreparedSentence,
+    respeak_sentence: str | PreparedSentence,
+    user_sentence: str | PreparedSentence,
+    correct2respeak_map: list[int] | None = None,
+) -> tuple[float, float, bool, list[bool], list[int], list[bool]]:
+    """Scores the user sentence against both the correct and the respeak sentence.
 
+    Each sentence is normalized and tokenized only once. The correct2respeak_map does not depend on the user
+    sentence, so it can be passed in when the same question is answered more than once."""
+    correct = prepare_sentence(correct_sentence)
+    respeak = prepare_sentence(respeak_sentence)
+    user = prepare_sentence(user_sentence)
 
-def score_sentence(
-    correct_sentence: str, respeak_sentence: str, user_sentence: str
+    ans = _score_prepared(correct, respeak, user, correct2respeak_map)
+
+    print()
+    print(f"Correct sentence: «{correct.sentence}»")
+    print(f"Respeak sentence: «{respeak.sentence}»")
+    print(f"User sentence: «{user.sentence}»")
+    print(f"Correct score: {ans[1]}, Respeak score: {ans[0]}")
+    print()
+
+    return ans
+
+
+def _score_prepared(
+    correct: PreparedSentence,
+    respeak: PreparedSentence,
+    user: PreparedSentence,
+    correct2respeak_map: list[int] | None = None,
 ) -> tuple[float, float, bool, list[bool], list[int], list[bool]]:
+    # score_sentence without the printing.
     score_correct, words_correct, correct_token_sizes = score_sentence_correct(
-        correct_sentence, user_sentence
+        correct, user
     )
 
-    correct2respeak_map = make_respeak_map(correct_sentence, respeak_sentence)
+    if correct2respeak_map is None:
+        correct2respeak_map = make_respeak_map(correct, respeak)
     score_respeak, words_respeak = score_sentence_respeak(
-        correct_token_sizes, correct2respeak_map, respeak_sentence, user_sentence
+        correct_token_sizes, correct2respeak_map, respeak, user
     )
 
-    print()
-    print(f"Correct sentence: «{correct_sentence}»")
-    print(f"Respeak sentence: «{respeak_sentence}»")
-    print(f"User sentence: «{user_sentence}»")
-    print(f"Correct score: {score_correct}, Respeak score: {score_respeak}")
-    print()
-
     return (
         score_respeak,
         score_correct,
@@ -379,3 +752,66 @@ def score_sentence(
         correct2respeak_map,
         words_respeak,
     )
+
+
+def _score_group(
+    items: list[tuple[int, str, str, str]],
+) -> list[tuple[int, tuple[float, float, bool, list[bool], list[int], list[bool]]]]:
+    # Scores (index, correct, respeak, user) items, preparing each correct and respeak sentence and computing each
+    # correct2respeak_map only once. Runs in the worker processes of score_sentences_batch.
+    prepared: dict[str, PreparedSentence] = {}
+    respeak_maps: dict[tuple[str, str], list[int]] = {}
+    ans = []
+    for index, correct_sentence, respeak_sentence, user_sentence in items:
+        for sentence in (correct_sentence, respeak_sentence):
+            if sentence not in prepared:
+                prepared[sentence] = PreparedSentence(sentence)
+        correct = prepared[correct_sentence]
+        respeak = prepared[respeak_sentence]
+        key = (correct_sentence, respeak_sentence)
+        if key not in respeak_maps:
+            respeak_maps[key] = make_respeak_map(correct, respeak)
+        ans.append(
+            (
+                index,
+                _score_prepared(
+                    correct, respeak, PreparedSentence(user_sentence), respeak_maps[key]
+                ),
+            )
+        )
+    return ans
+
+
+def score_sentences_batch(
+    triples: Iterable[tuple[str, str, str]],
+    max_workers: int | None = None,
+    chunk_size: int = 200,
+) -> list[tuple[float, float, bool, list[bool], list[int], list[bool]]]:
+    """score_sentence for many (correct, respeak, user) triples at once, without the printing.
+
+    The triples are grouped by the correct sentence, so the prepared correct and respeak sentences and the
+    correct2respeak_map are computed once per group. The groups are packed into chunks of about chunk_size triples
+    which are scored in the shared process_pool, at most max_workers of them at once; with max_workers=1, or if
+    everything fits into one chunk, they are scored in this process. The results are in the order of the triples."""
+    groups: dict[str, list[tuple[int, str, str, str]]] = {}
+    count = 0
+    for index, (correct, respeak, user) in enumerate(triples):
+        groups.setdefault(correct, []).append((index, correct, respeak, user))
+        count = index + 1
+
+    chunks: list[list[tuple[int, str, str, str]]] = [[]]
+    for group in groups.values():
+        if len(chunks[-1]) >= chunk_size:
+            chunks.append([])
+        chunks[-1].extend(group)
+
+    if max_workers == 1 or len(chunks) == 1 or _in_worker():
+        scored = [_score_group(chunk) for chunk in chunks]
+    else:
+        scored = _pool_map(_score_group, chunks, max_workers)
+
+    ans: list = [None] * count
+    for chunk in scored:
+        for index, result in chunk:
+            ans[index] = result
+    return ans
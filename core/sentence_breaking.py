@@ -4,10 +4,353 @@
 #
 # Analysis is done paragraph-after-paragraph, which is denoted as double newline.
 #
+# The pieces are a generator pipeline, so a book of any size is broken in one pass and in constant memory:
+# * paragraphs() groups the lines of the text into paragraphs, lazily.
+# * tokenize() turns a paragraph into boxes (words, as wide as their just_letters), glue (the spaces between them) and
+#   penalties (the places to break at, cheaper after the end of a sentence or a clause). The paragraph ends with a
+#   forced break.
+# * break_paragraph() chooses the breaks with the least total demerits. Each piece is scored by how far its length is
+#   from target_letters, and no piece is longer than max_letters (unless a single word is), so only the breaks less
+#   than max_letters back stay active. The pieces are emitted as soon as all the active breaks agree on them.
+#
+# The lengths are in the letters of just_letters, the same that calculate_timeout_from_sentence counts, so the pieces
+# can be sized by their timeout (see letters_for_timeout).
+
+import argparse
+import itertools
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .question_index import letters_for_timeout
+from .util import just_letters
+
+SENTENCE_END = -40.0  # After .!?… followed by a capital letter, a quote or a dash
+CLAUSE_END = -15.0  # After ,;:– and the like
+# The end of a line within a paragraph, e.g. of a verse; adds to the above.
+LINE_END = -20.0
+WORD_BREAK = 25.0  # Between two words of the same clause
+LINE_PENALTY = 10.0  # For each piece, so that fewer of them are preferred
+# For a piece longer than max_letters, when there is no other choice.
+OVERFULL = 10_000.0
+
+_SENTENCE_PUNCTUATION = ".!?…"
+_CLAUSE_PUNCTUATION = ",;:–—-"
+_CLOSING = "”\"'»)]"
+_WORD = re.compile(r"\S+")
+_SENTENCE_START = re.compile(r"[\W\d_]*[A-ZĄĆĘŁŃÓŚŹŻ0-9„\"«(–—-]")
+
+
+class Box:
+    """A word, with the punctuation around it."""
+
+    text: str
+    width: int
+
+    def __init__(self, text: str, width: int):
+        self.text = text
+        self.width = width
+
+
+class Glue:
+    """The space between two words. As wide as the space that just_letters puts between them."""
+
+    width: int = 1
+
+
+class Penalty:
+    """A place to break at. Negative costs are bonuses."""
+
+    cost: float
+    forced: bool
+
+    def __init__(self, cost: float, forced: bool = False):
+        self.cost = cost
+        self.forced = forced
+
+
+Token = Box | Glue | Penalty
+
+
+def paragraphs(lines: Iterable[str]) -> Iterator[Iterator[str]]:
+    """The non-empty lines of each paragraph; paragraphs are separated by empty lines."""
+    for non_empty, group in itertools.groupby(
+        lines, key=lambda line: line.strip() != ""
+    ):
+        if non_empty:
+            yield (line.strip() for line in group)
+
+
+def _break_cost(previous: str, following: str, line_end: bool) -> float:
+    previous = previous.rstrip(_CLOSING)
+    if previous[-1:] in _SENTENCE_PUNCTUATION and _SENTENCE_START.match(following):
+        cost = SENTENCE_END
+    elif previous[-1:] in _SENTENCE_PUNCTUATION + _CLAUSE_PUNCTUATION:
+        cost = CLAUSE_END
+    else:
+        cost = WORD_BREAK
+    if line_end:
+        cost = min(cost, 0.0) + LINE_END
+    return cost
+
+
+def tokenize(paragraph: Iterable[str] | str) -> Iterator[Token]:
+    """The boxes, glue and penalties of one paragraph, given as its lines."""
+    if isinstance(paragraph, str):
+        paragraph = paragraph.split("\n")
+    # Waits for the next word, which decides the cost of the break after it.
+    pending: Box | None = None
+    line_end = False
+    for line in paragraph:
+        for match in _WORD.finditer(line):
+            word = match.group()
+            width = len(just_letters(word))
+            if pending is None:
+                pending = Box(word, width)
+            elif width == 0 or pending.width == 0:
+                # A lone dash or quote, kept with the word before it.
+                pending = Box(f"{pending.text} {word}", pending.width + width)
+            else:
+                yield pending
+                yield Penalty(_break_cost(pending.text, word, line_end))
+                yield Glue()
+                pending = Box(word, width)
+            line_end = False
+        line_end = pending is not None
+    if pending is not None:
+        yield pending
+        yield Penalty(0.0, forced=True)
+
+
+class _Breakpoint:
+    """A possible break, with the best way of breaking the paragraph up to it."""
+
+    index: int  # Of the penalty in the token stream; -1 for the start of the paragraph
+    # The total width where the piece after the break starts, once known.
+    start: float | None
+    demerits: float
+    depth: int  # The number of the pieces up to the break
+    prev: "_Breakpoint | None"
+
+    def __init__(
+        self, index: int, demerits: float, depth: int, prev: "_Breakpoint | None"
+    ):
+        self.index = index
+        self.start = None
+        self.demerits = demerits
+        self.depth = depth
+        self.prev = prev
+
+
+def _common_ancestor(a: _Breakpoint, b: _Breakpoint) -> _Breakpoint:
+    while a.depth > b.depth:
+        a = a.prev
+    while b.depth > a.depth:
+        b = b.prev
+    while a is not b:
+        a, b = a.prev, b.prev
+    return a
+
+
+def _ancestor_at(node: _Breakpoint, depth: int) -> _Breakpoint:
+    while node.depth > depth:
+        node = node.prev
+    return node
+
+
+class _ParagraphBreaker:
+    """The state of break_paragraph, see there."""
+
+    _target: float
+    _max: int
+    _tokens: deque[Token]
+    _base: int  # The index of _tokens[0] in the token stream
+    _total: float  # The width of the tokens so far
+    _root: _Breakpoint  # The last break that was emitted
+    _active: list[_Breakpoint]
+    # The active breaks without the start of their next piece yet.
+    _waiting: list[_Breakpoint]
+
+    def __init__(self, target_letters: float, max_letters: int):
+        self._target = target_letters
+        self._max = max_letters
+        self._tokens = deque()
+        self._base = 0
+        self._total = 0.0
+        self._root = _Breakpoint(-1, 0.0, 0, None)
+        self._active = [self._root]
+        self._waiting = [self._root]
+
+    def _demerits(self, width: float, cost: float) -> float:
+        badness = 100 * (abs(width - self._target) / self._target) ** 3
+        demerits = (LINE_PENALTY + badness) ** 2
+        return demerits + cost * abs(cost)
+
+    def add(self, index: int, token: Token):
+        self._tokens.append(token)
+        if isinstance(token, Box):
+            for node in self._waiting:
+                node.start = self._total
+            self._waiting = []
+            self._total += token.width
+        elif isinstance(token, Glue):
+            self._total += token.width
+        else:
+            self._add_penalty(index, token)
+
+    def _add_penalty(self, index: int, penalty: Penalty):
+        best: tuple[float, _Breakpoint] | None = None
+        active, overfull = [], []
+        for node in self._active:
+            if node.start is None:
+                active.append(node)  # Nothing to break off yet
+                continue
+            width = self._total - node.start
+            if width > self._max:
+                overfull.append(node)
+                continue
+            active.append(node)
+            demerits = node.demerits + self._demerits(width, penalty.cost)
+            if best is None or demerits < best[0]:
+                best = (demerits, node)
+        if (
+            best is None
+            and overfull
+            and not any(node.start is not None for node in active)
+        ):
+            # Only a piece longer than max_letters is left, e.g. because of a very long word. The shortest one.
+            node = max(overfull, key=lambda node: node.start)
+            best = (node.demerits + OVERFULL**2, node)
+        if penalty.forced:
+            active = []
+        if best is not None:
+            demerits, prev = best
+            node = _Breakpoint(index, demerits, prev.depth + 1, prev)
+            active.append(node)
+            self._waiting.append(node)
+        self._active = active
+
+    def _pieces(self, until: _Breakpoint) -> Iterator[str]:
+        # The pieces from the root to `until`, which becomes the new root.
+        chain = []
+        node = until
+        while node is not self._root:
+            chain.append(node)
+            node = node.prev
+        start = self._root.index + 1
+        for node in reversed(chain):
+            words = []
+            for token in itertools.islice(
+                self._tokens, start - self._base, node.index - self._base
+            ):
+                if isinstance(token, Box):
+                    words.append(token.text)
+            yield " ".join(words)
+            start = node.index + 1
+        for _ in range(until.index + 1 - self._base):
+            self._tokens.popleft()
+        self._base = until.index + 1
+        until.prev = None  # The breaks before it are not needed any more
+        self._root = until
+
+    def settled(self) -> Iterator[str]:
+        """The pieces that all the active breaks agree on."""
+        ancestor = self._active[0]
+        for node in self._active[1:]:
+            ancestor = _common_ancestor(ancestor, node)
+        if ancestor is not self._root:
+            yield from self._pieces(ancestor)
+
+    def force(self) -> Iterator[str]:
+        """The first piece of the best breaks so far, dropping the breaks that do not agree with it."""
+        best = min(self._active, key=lambda node: node.demerits)
+        if best.depth <= self._root.depth:
+            return
+        first = _ancestor_at(best, self._root.depth + 1)
+        self._active = [
+            node for node in self._active if _ancestor_at(node, first.depth) is first
+        ]
+        self._waiting = [node for node in self._waiting if node in self._active]
+        yield from self._pieces(first)
+
+    @property
+    def buffered(self) -> int:
+        return len(self._tokens)
+
+
+def break_paragraph(
+    tokens: Iterable[Token],
+    target_letters: float,
+    max_letters: int,
+    settle_every: int = 64,
+    max_buffered: int = 4096,
+) -> Iterator[str]:
+    """The pieces of one paragraph (see tokenize), broken optimally.
+
+    The pieces are emitted once all the active breaks agree on them, checked every settle_every tokens. If they do
+    not agree within max_buffered tokens, which needs a very unusual paragraph, the first piece of the best breaks so
+    far is emitted anyway, so the memory stays bounded."""
+    breaker = _ParagraphBreaker(target_letters, max_letters)
+    last_settled = 0
+    for index, token in enumerate(tokens):
+        breaker.add(index, token)
+        if isinstance(token, Penalty) and token.forced:
+            yield from breaker.settled()  # The last break is the only active one
+            return
+        if index - last_settled >= settle_every:
+            last_settled = index
+            yield from breaker.settled()
+            while breaker.buffered > max_buffered:
+                pieces = list(breaker.force())
+                if len(pieces) == 0:
+                    break  # Not a single break yet
+                yield from pieces
+
+
+def break_text(
+    lines: Iterable[str], target_letters: float, max_letters: int
+) -> Iterator[str]:
+    """The pieces of the whole text, given as its lines (e.g. an open file)."""
+    for paragraph in paragraphs(lines):
+        yield from break_paragraph(tokenize(paragraph), target_letters, max_letters)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Breaks a book into the pieces to read aloud, one per line, as a questions file"
+    )
+    parser.add_argument("book", type=Path)
+    parser.add_argument("questions_file", type=Path)
+    parser.add_argument(
+        "--target-seconds",
+        type=float,
+        default=12.0,
+        help="The timeout of a typical piece, see calculate_timeout_from_sentence",
+    )
+    parser.add_argument("--max-seconds", type=float, default=20.0)
+    args = parser.parse_args()
 
+    target_letters = letters_for_timeout(args.target_seconds)
+    max_letters = letters_for_timeout(args.max_seconds)
+    if not 0 < target_letters <= max_letters:
+        parser.error("Expected 4 < --target-seconds <= --max-seconds")
 
-from typing import Iterator
+    tmp_path = args.questions_file.with_name(args.questions_file.name + ".tmp")
+    count = 0
+    with (
+        args.book.open(encoding="utf-8") as book,
+        tmp_path.open("w", encoding="utf-8") as f,
+    ):
+        for piece in break_text(book, target_letters, max_letters):
+            if count > 0:
+                f.write("\n")
+            f.write(piece)
+            count += 1
+    os.replace(tmp_path, args.questions_file)
+    print(f"Wrote {count} pieces to {args.questions_file}")
 
 
-def tokenize(text: str) -> Iterator:
-    pass
+if __name__ == "__main__":
+    main()
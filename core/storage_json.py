@@ -0,0 +1,64 @@
+import datetime
+import json
+from pathlib import Path
+
+from overrides import overrides
+
+from .iface_storage import IScoreStorage
+from .score_journal import ScoreJournal, migrate_history_json
+from .scoring_serialization import ScoreDO, ScoreHistoryDO, TotalScoreDO
+from .util import write_text_atomically
+
+
+class JsonScoreStorage(IScoreStorage):
+    """The default storage: the history in the score journal, the total scores in a json file."""
+
+    _journal: ScoreJournal
+    _history_file: Path  # The history.json from before the journal, migrated once
+    _scores_file: Path
+
+    def __init__(self, journal_file: Path, history_file: Path, scores_file: Path):
+        self._journal = ScoreJournal(journal_file)
+        self._history_file = history_file
+        self._scores_file = scores_file
+
+    @property
+    def journal(self) -> ScoreJournal:
+        return self._journal
+
+    @overrides
+    def load_history(self, since: datetime.datetime | None = None) -> ScoreHistoryDO:
+        migrate_history_json(self._history_file, self._journal)
+        return self._journal.load(since)
+
+    @overrides
+    def append_score(self, score: ScoreDO, history: ScoreHistoryDO):
+        self._journal.append(score)
+        if self._journal.needs_compaction:
+            self._journal.compact(history)
+
+    @overrides
+    def save_history(self, history: ScoreHistoryDO):
+        self._journal.compact(history)
+
+    @overrides
+    def load_total_scores(self) -> TotalScoreDO:
+        if not self._scores_file.exists():
+            ans = TotalScoreDO()
+        else:
+            json_text = self._scores_file.read_text()
+            ans = TotalScoreDO(**json.loads(json_text))
+        ans.set_storage(self)
+        return ans
+
+    @overrides
+    def save_total_scores(self, total_score: TotalScoreDO):
+        write_text_atomically(self._scores_file, total_score.model_dump_json(indent=4))
+
+    @overrides
+    def flush(self):
+        self._journal.flush()
+
+    @overrides
+    def close(self):
+        self._journal.close()
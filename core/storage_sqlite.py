@@ -0,0 +1,402 @@
+"""Optional storage of the history and the total scores in a SQLite database (storage_backend = "sqlite").
+
+Each answer is a row of `scores`, its word results are rows of `word_results` and the total scores are the single
+row of `totals`. The database runs in the WAL mode and the writes are committed in batches, like the fsyncs of the
+score journal. When the database is created, the json storage (if there is any) is imported into it."""
+
+import argparse
+import datetime
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+from overrides import overrides
+
+from .iface_storage import IScoreStorage
+from .scoring_serialization import RollupDO, ScoreDO, ScoreHistoryDO, TotalScoreDO
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,  -- The position in the history
+    sentence TEXT NOT NULL,
+    timestamp TEXT NOT NULL,  -- ISO 8601, so that the text order is the time order
+    respeak_accuracy REAL NOT NULL,
+    correct_accuracy REAL NOT NULL,
+    effort_done REAL NOT NULL,
+    thinking_time REAL NOT NULL,
+    speaking_time REAL NOT NULL,
+    user_answer TEXT NOT NULL,
+    saved_audio TEXT NOT NULL,
+    time_penalty REAL NOT NULL,
+    respeak_sentence TEXT NOT NULL,
+    flag_correct INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_sentence_timestamp ON scores (sentence, timestamp);
+CREATE INDEX IF NOT EXISTS scores_timestamp ON scores (timestamp);
+CREATE TABLE IF NOT EXISTS word_results (
+    score_id INTEGER NOT NULL REFERENCES scores (id),
+    kind INTEGER NOT NULL,  -- WORDS_CORRECT or WORDS_RESPEAK
+    position INTEGER NOT NULL,
+    ok INTEGER NOT NULL,
+    PRIMARY KEY (score_id, kind, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    accuracy REAL NOT NULL,
+    effort_done REAL NOT NULL,
+    thinking_time REAL NOT NULL,
+    speaking_time REAL NOT NULL,
+    total_questions INTEGER NOT NULL,
+    story_index INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    kind INTEGER NOT NULL,  -- ROLLUP_DAILY or ROLLUP_SENTENCE
+    key TEXT NOT NULL,  -- The ISO date or the sentence
+    answers INTEGER NOT NULL,
+    accuracy REAL NOT NULL,
+    effort_done REAL NOT NULL,
+    thinking_time REAL NOT NULL,
+    speaking_time REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+"""
+
+WORDS_CORRECT = 0
+WORDS_RESPEAK = 1
+
+ROLLUP_DAILY = 0
+ROLLUP_SENTENCE = 1
+_ROLLUP_KINDS = {
+    "daily": ROLLUP_DAILY,
+    "by_sentence": ROLLUP_SENTENCE,
+}  # By the field of TotalScoreDO
+
+_SELECT_BATCH = 1000
+
+_SCORE_COLUMNS = (
+    "id, sentence, timestamp, respeak_accuracy, correct_accuracy, effort_done, thinking_time, speaking_time, "
+    "user_answer, saved_audio, time_penalty, respeak_sentence, flag_correct"
+)
+
+
+def _timestamp_text(timestamp: datetime.datetime) -> str:
+    return timestamp.isoformat(timespec="microseconds")
+
+
+def _score_row(score_id: int, score: ScoreDO) -> tuple:
+    return (
+        score_id,
+        score.correct_sentence,
+        _timestamp_text(score.timestamp),
+        score.respeak_accuracy,
+        score.correct_accuracy,
+        score.effort_done,
+        score.thinking_time,
+        score.speaking_time,
+        score.user_answer,
+        str(score.saved_audio),
+        score.time_penalty,
+        score.respeak_sentence,
+        int(score.flag_correct),
+    )
+
+
+def _word_rows(score_id: int, score: ScoreDO) -> list[tuple[int, int, int, int]]:
+    return [
+        (score_id, WORDS_CORRECT, position, int(ok))
+        for position, ok in enumerate(score.correct_words)
+    ] + [
+        (score_id, WORDS_RESPEAK, position, int(ok))
+        for position, ok in enumerate(score.respeak_words)
+    ]
+
+
+class SqliteScoreStorage(IScoreStorage):
+    """See the module docstring."""
+
+    _database_file: Path
+    _connection: sqlite3.Connection
+    # The answers may be stored from another thread than the one that loaded them.
+    _lock: threading.Lock
+    _commit_every: int  # Number of writes after which they are committed
+    _commit_interval: float  # Seconds after which the writes are committed
+    _uncommitted: int
+    _last_commit: float
+    _next_id: int
+
+    def __init__(
+        self,
+        database_file: Path,
+        commit_every: int = 16,
+        commit_interval: float = 5.0,
+    ):
+        self._database_file = database_file
+        database_file.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(database_file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+        self._lock = threading.Lock()
+        self._commit_every = commit_every
+        self._commit_interval = commit_interval
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+        self._next_id = self._connection.execute(
+            "SELECT COALESCE(MAX(id), -1) + 1 FROM scores"
+        ).fetchone()[0]
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return (
+                self._connection.execute(
+                    "SELECT NOT EXISTS (SELECT 1 FROM scores) AND NOT EXISTS (SELECT 1 FROM totals)"
+                ).fetchone()[0]
+                == 1
+            )
+
+    def _written(self):
+        # Called with the lock held, after each write.
+        self._uncommitted += 1
+        if (
+            self._uncommitted >= self._commit_every
+            or time.monotonic() - self._last_commit >= self._commit_interval
+        ):
+            self._commit()
+
+    def _commit(self):
+        self._connection.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def _select_scores(self, where: str, parameters: tuple) -> Iterator[ScoreDO]:
+        # The scores matching the condition, in the history order. They are read in batches of _SELECT_BATCH,
+        # so that reading the whole old history on demand does not hold all of it in memory.
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT {_SCORE_COLUMNS} FROM scores WHERE ({where}) AND id > ? ORDER BY id LIMIT ?",
+                    parameters + (last_id, _SELECT_BATCH),
+                ).fetchall()
+                if len(rows) == 0:
+                    return
+                last_id = rows[-1][0]
+                word_rows = self._connection.execute(
+                    "SELECT score_id, kind, ok FROM word_results WHERE score_id BETWEEN ? AND ? "
+                    "ORDER BY score_id, kind, position",
+                    (rows[0][0], last_id),
+                ).fetchall()
+            words: dict[int, tuple[list[bool], list[bool]]] = {}
+            for score_id, kind, ok in word_rows:
+                words.setdefault(score_id, ([], []))[kind].append(bool(ok))
+            for row in rows:
+                correct_words, respeak_words = words.get(row[0], ([], []))
+                yield ScoreDO(
+                    correct_sentence=row[1],
+                    timestamp=datetime.datetime.fromisoformat(row[2]),
+                    respeak_accuracy=row[3],
+                    correct_accuracy=row[4],
+                    effort_done=row[5],
+                    thinking_time=row[6],
+                    speaking_time=row[7],
+                    user_answer=row[8],
+                    saved_audio=Path(row[9]),
+                    time_penalty=row[10],
+                    respeak_sentence=row[11],
+                    flag_correct=bool(row[12]),
+                    correct_words=correct_words,
+                    respeak_words=respeak_words,
+                )
+
+    @overrides
+    def load_history(self, since: datetime.datetime | None = None) -> ScoreHistoryDO:
+        history = ScoreHistoryDO()
+        if since is None:
+            scores = self._select_scores("1", ())
+        else:
+            scores = self._select_scores("timestamp >= ?", (_timestamp_text(since),))
+        for score in scores:
+            history.add_score(score, score.correct_sentence)
+        if since is not None:
+            history.set_window(
+                since,
+                lambda: self._select_scores("timestamp < ?", (_timestamp_text(since),)),
+            )
+        return history
+
+    def _insert_scores(self, scores: list[ScoreDO]):
+        first_id = self._next_id
+        self._connection.executemany(
+            f"INSERT INTO scores ({_SCORE_COLUMNS}) VALUES ({', '.join(['?'] * 13)})",
+            [_score_row(first_id + i, score) for i, score in enumerate(scores)],
+        )
+        self._connection.executemany(
+            "INSERT INTO word_results (score_id, kind, position, ok) VALUES (?, ?, ?, ?)",
+            [
+                row
+                for i, score in enumerate(scores)
+                for row in _word_rows(first_id + i, score)
+            ],
+        )
+        self._next_id += len(scores)
+
+    @overrides
+    def append_score(self, score: ScoreDO, history: ScoreHistoryDO):
+        with self._lock:
+            self._insert_scores([score])
+            self._written()
+
+    @overrides
+    def save_history(self, history: ScoreHistoryDO):
+        with self._lock:
+            if history.is_complete:
+                self._connection.execute("DELETE FROM word_results")
+                self._connection.execute("DELETE FROM scores")
+                self._next_id = 0
+            else:
+                since = (_timestamp_text(history.window_start),)
+                self._connection.execute(
+                    "DELETE FROM word_results WHERE score_id IN (SELECT id FROM scores WHERE timestamp >= ?)",
+                    since,
+                )
+                self._connection.execute(
+                    "DELETE FROM scores WHERE timestamp >= ?", since
+                )
+            self._insert_scores(history.history)
+            self._commit()
+
+    @overrides
+    def load_total_scores(self) -> TotalScoreDO:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT accuracy, effort_done, thinking_time, speaking_time, total_questions, story_index "
+                "FROM totals WHERE id = 1"
+            ).fetchone()
+            rollup_rows = self._connection.execute(
+                "SELECT kind, key, answers, accuracy, effort_done, thinking_time, speaking_time FROM rollups"
+            ).fetchall()
+        if row is None:
+            ans = TotalScoreDO()
+        else:
+            ans = TotalScoreDO(
+                accuracy=row[0],
+                effort_done=row[1],
+                thinking_time=row[2],
+                speaking_time=row[3],
+                total_questions=row[4],
+                story_index=row[5],
+            )
+        rollups = {ROLLUP_DAILY: {}, ROLLUP_SENTENCE: {}}
+        for kind, key, answers, accuracy, effort, thinking, speaking in rollup_rows:
+            rollups[kind][key] = RollupDO(
+                answers=answers,
+                accuracy=accuracy,
+                effort_done=effort,
+                thinking_time=thinking,
+                speaking_time=speaking,
+            )
+        ans.daily = rollups[ROLLUP_DAILY]
+        ans.by_sentence = rollups[ROLLUP_SENTENCE]
+        ans.mark_rollups_saved()
+        ans.set_storage(self)
+        return ans
+
+    @overrides
+    def save_total_scores(self, total_score: TotalScoreDO):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO totals "
+                "(id, accuracy, effort_done, thinking_time, speaking_time, total_questions, story_index) "
+                "VALUES (1, ?, ?, ?, ?, ?, ?)",
+                (
+                    total_score.accuracy,
+                    total_score.effort_done,
+                    total_score.thinking_time,
+                    total_score.speaking_time,
+                    total_score.total_questions,
+                    total_score.story_index,
+                ),
+            )
+            changed = total_score.changed_rollups()
+            if changed is None:
+                self._connection.execute("DELETE FROM rollups")
+                changed = [("daily", key) for key in list(total_score.daily)] + [
+                    ("by_sentence", key) for key in list(total_score.by_sentence)
+                ]
+            # Usually only the two rollups of the last answer
+            rows = []
+            for field, key in changed:
+                rollup = getattr(total_score, field)[key]
+                rows.append(
+                    (
+                        _ROLLUP_KINDS[field],
+                        key,
+                        rollup.answers,
+                        rollup.accuracy,
+                        rollup.effort_done,
+                        rollup.thinking_time,
+                        rollup.speaking_time,
+                    )
+                )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO rollups "
+                "(kind, key, answers, accuracy, effort_done, thinking_time, speaking_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._written()
+
+    @overrides
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    @overrides
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+def import_storage(source: IScoreStorage, target: IScoreStorage):
+    """Copies the history and the total scores, e.g. from the json storage into the database."""
+    target.save_history(source.load_history())
+    target.save_total_scores(source.load_total_scores())
+    target.flush()
+
+
+def main():
+    # Imported here, because config imports this module.
+    from .config import ConfigDataDO, load_config
+    from .storage_json import JsonScoreStorage
+
+    parser = argparse.ArgumentParser(
+        description="Imports the json history and total scores into the SQLite database"
+    )
+    parser.add_argument("--config-path", type=Path, default=Path("config.json"))
+    parser.add_argument(
+        "--force", action="store_true", help="Replace what is already in the database"
+    )
+    args = parser.parse_args()
+
+    if args.config_path.exists():
+        config = load_config(args.config_path)
+    else:
+        config = ConfigDataDO()
+    target = SqliteScoreStorage(config.database_file)
+    if not target.is_empty() and not args.force:
+        print(f"{config.database_file} is not empty, use --force to replace it.")
+        return
+    source = JsonScoreStorage(
+        config.history_journal_file, config.history_file, config.scores_file
+    )
+    import_storage(source, target)
+    source.close()
+    target.close()
+    print(f"Imported into {config.database_file}")
+
+
+if __name__ == "__main__":
+    main()
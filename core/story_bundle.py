@@ -0,0 +1,240 @@
+"""Precompiled story bundles: a questions file with everything the client computes about it, in one binary container.
+
+A bundle is built once (see build_story_bundle, or the loudreading_bundle script) and then set as the
+story_bundle_file of the config instead of the questions file. It holds, for every distinct sentence, what
+QuestionEntryDO.from_sentence computes (just_letters, the char ranges of the tokens, the timeout and the effort) and,
+optionally, the respeak transcript and its make_respeak_map. The lines of the story are the rows of their sentences,
+so the sentence table itself is stored only once.
+
+The bundle is mapped with mmap and read lazily, like QuestionStore: opening it costs the same whatever the size of the
+book, and an entry is decoded only when its sentence is asked. The payload is not hashed on opening, for the same
+reason; the bundle is a build artifact, rebuilt from the questions file when that changes.
+
+The respeak audio is not stored, only its transcripts. A transcript in the bundle is used as it is (see
+CachedRespeak), so the respeak server is started only for the sentences outside the bundle."""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+from overrides import overrides
+
+from .binary_container import BinaryContainer, BinaryWriter
+from .iface_questions import IQuestionSource
+from .iface_scoring import IRespeak
+from .question_index import QuestionEntryDO, hash_questions
+from .question_store import QuestionStore
+from .sentence_accuracy import make_respeak_map
+
+BUNDLE_KIND = "story-bundle"
+BUNDLE_VERSION = 1
+
+
+def bundle_path(questions_file: Path) -> Path:
+    return questions_file.with_name(questions_file.name + ".bundle.bin")
+
+
+def build_story_bundle(
+    questions_file: Path, bundle_file: Path, respeak: IRespeak | None = None
+) -> int:
+    """Compiles the questions file into a bundle. With respeak, every sentence is respoken once, which is slow.
+
+    Returns the number of the distinct sentences."""
+    store = QuestionStore(questions_file)
+    first_lines = store.sentence_ids
+    sentences = store.unique_sentences()
+    rows = {line: row for row, line in enumerate(first_lines.tolist())}
+    line_rows = np.array(
+        [rows[store.sentence_id(line)] for line in range(len(store))], dtype=np.int32
+    )
+    entries = [QuestionEntryDO.from_sentence(sentence) for sentence in sentences]
+
+    writer = BinaryWriter(
+        BUNDLE_KIND,
+        {
+            "version": BUNDLE_VERSION,
+            "questions_hash": hash_questions(questions_file.read_bytes()),
+            "respoken": respeak is not None,
+        },
+    )
+    writer.add_strings("sentences", sentences)
+    writer.add_strings("letters", [entry.letters for entry in entries])
+    writer.add_ragged(
+        "char_ranges",
+        [
+            np.array(entry.char_ranges, dtype=np.int32).reshape(-1, 2)
+            for entry in entries
+        ],
+        np.int32,
+    )
+    writer.add_array("timeouts", np.array([entry.timeout for entry in entries]))
+    writer.add_array("efforts", np.array([entry.effort for entry in entries]))
+    writer.add_array("line_rows", line_rows)
+    writer.add_array("first_lines", first_lines.astype(np.int64))
+
+    if respeak is not None:
+        transcripts, successes, maps = [], [], []
+        for entry in entries:
+            success, transcript = (
+                respeak.respeak(entry.sentence) if entry.sentence != "" else (False, "")
+            )
+            transcripts.append(transcript if success else "")
+            successes.append(success)
+            maps.append(
+                np.array(
+                    make_respeak_map(entry.prepared(), transcript) if success else [],
+                    dtype=np.int32,
+                )
+            )
+        writer.add_strings("respeak", transcripts)
+        writer.add_array("respeak_ok", np.array(successes, dtype=bool))
+        writer.add_ragged("respeak_maps", maps, np.int32)
+
+    writer.write(bundle_file)
+    return len(sentences)
+
+
+class StoryBundle(IQuestionSource):
+    """A bundle opened for reading. Raises ValueError if the file is not a bundle of this version."""
+
+    _bundle_file: Path
+    _container: BinaryContainer
+    _line_rows: np.ndarray
+    _first_lines: np.ndarray
+    _rows: dict[str, int] | None  # The row of each sentence, built on the first lookup
+
+    def __init__(self, bundle_file: Path):
+        self._bundle_file = bundle_file
+        self._container = BinaryContainer(bundle_file, BUNDLE_KIND, verify=False)
+        if self._container.metadata.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"{bundle_file} is from an incompatible version")
+        self._line_rows = self._container.array("line_rows")
+        self._first_lines = self._container.array("first_lines")
+        self._rows = None
+
+    @property
+    def bundle_file(self) -> Path:
+        return self._bundle_file
+
+    @property
+    def questions_hash(self) -> str:
+        """The hash of the questions file the bundle was built from."""
+        return self._container.metadata["questions_hash"]
+
+    @property
+    def respoken(self) -> bool:
+        return self._container.metadata["respoken"]
+
+    def _row(self, sentence: str) -> int | None:
+        if self._rows is None:
+            self._rows = {
+                sentence: row
+                for row, sentence in enumerate(
+                    self._container.strings("sentences").to_list()
+                )
+            }
+        return self._rows.get(sentence)
+
+    @overrides
+    def __len__(self) -> int:
+        return len(self._line_rows)
+
+    @overrides
+    def __getitem__(self, line: int) -> str:
+        return self._container.strings("sentences")[int(self._line_rows[line])]
+
+    @overrides
+    def sentence_id(self, line: int) -> int:
+        return int(self._first_lines[self._line_rows[line]])
+
+    @overrides
+    def unique_sentences(self) -> list[str]:
+        return self._container.strings("sentences").to_list()
+
+    @overrides
+    def entry(self, sentence: str) -> QuestionEntryDO | None:
+        row = self._row(sentence)
+        if row is None:
+            return None
+        char_ranges = self._container.ragged("char_ranges")[row].reshape(-1).tolist()
+        return QuestionEntryDO.model_construct(
+            sentence=sentence,
+            letters=self._container.strings("letters")[row],
+            char_ranges=list(zip(char_ranges[0::2], char_ranges[1::2])),
+            timeout=float(self._container.array("timeouts")[row]),
+            effort=float(self._container.array("efforts")[row]),
+        )
+
+    @overrides
+    def respeak_transcripts(self) -> dict[str, str]:
+        if not self.respoken:
+            return {}
+        successes = self._container.array("respeak_ok").tolist()
+        return {
+            sentence: transcript
+            for sentence, transcript, success in zip(
+                self._container.strings("sentences").to_list(),
+                self._container.strings("respeak").to_list(),
+                successes,
+            )
+            if success
+        }
+
+    @overrides
+    def respeak_map(self, sentence: str, respeak_sentence: str) -> list[int] | None:
+        if not self.respoken:
+            return None
+        row = self._row(sentence)
+        if (
+            row is None
+            or not self._container.array("respeak_ok")[row]
+            or self._container.strings("respeak")[row] != respeak_sentence
+        ):
+            return None
+        return self._container.ragged("respeak_maps")[row].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compiles a questions file into a story bundle, see core.story_bundle"
+    )
+    parser.add_argument("questions_file", type=Path)
+    parser.add_argument(
+        "bundle_file",
+        type=Path,
+        nargs="?",
+        default=None,
+        help="Defaults to <questions_file>.bundle.bin",
+    )
+    parser.add_argument(
+        "--respeak",
+        action="store_true",
+        help="Respeak every sentence, with the whisper server of the config",
+    )
+    parser.add_argument("--config-path", type=Path, default=Path("config.json"))
+    args = parser.parse_args()
+    bundle_file = args.bundle_file or bundle_path(args.questions_file)
+
+    respeak = None
+    if args.respeak:
+        from client.speech2text import Speech2Text
+
+        from .config import ConfigDataDO, load_config
+        from .respeak_sentence import get_respeak_server
+
+        if args.config_path.exists():
+            config = load_config(args.config_path)
+        else:
+            config = ConfigDataDO()
+        respeak = get_respeak_server(
+            Speech2Text(
+                server_url=config.whisper_host, run_locally=config.run_whisper_locally
+            )
+        )
+
+    count = build_story_bundle(args.questions_file, bundle_file, respeak)
+    print(f"Wrote {count} sentences to {bundle_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# Word-level alignment engine.
+#
+# Instead of aligning the characters of the joined tokens (as word_mapper does), each normalized word is interned
+# into an integer ID and the sequences of IDs are aligned with a token-level dynamic programming, where inserting
+# or deleting a word costs 1 and substituting one word with another costs their normalized character distance
+# (Levenshtein distance divided by the length of the longer word). For Polish text the alignment is about 6 times
+# shorter than the character one, and its rows are plain NumPy array operations.
+#
+# A correct token counts as read cleanly under the same rule as in the character engine (MatchingContext): at least
+# CLEAN_MATCH_FRACTION of its characters match the user token it is aligned with. So "kot" read as "koty" is clean.
+
+import difflib
+
+import numpy as np
+
+from .levenshtein import levenshtein_distance
+
+OP_DIAGONAL = 0  # The correct token is aligned with the user token (the same word, or a substitution)
+OP_DELETE = 1  # The correct token is missing in the user tokens
+OP_INSERT = 2  # The user token is extra
+CLEAN_MATCH_FRACTION = 0.99
+_COST_TOLERANCE = 1e-9
+
+
+class TokenVocabulary:
+    """Corpus-wide mapping of the normalized words into integer IDs, with a cache of the substitution costs."""
+
+    _ids: dict[str, int]
+    _words: list[str]
+    _costs: dict[tuple[int, int], float]  # (smaller id, larger id) -> substitution cost
+    # (correct id, user id) -> the number of the characters of the correct word that match the user word
+    _matched: dict[tuple[int, int], int]
+    _max_cached_costs: int
+
+    def __init__(self, max_cached_costs: int = 1_000_000):
+        self._ids = {}
+        self._words = []
+        self._costs = {}
+        self._matched = {}
+        self._max_cached_costs = max_cached_costs
+
+    def __len__(self):
+        return len(self._words)
+
+    def intern(self, word: str) -> int:
+        ans = self._ids.get(word)
+        if ans is None:
+            ans = len(self._words)
+            self._ids[word] = ans
+            self._words.append(word)
+        return ans
+
+    def intern_tokens(self, tokens: list[str]) -> np.ndarray:
+        return np.fromiter(
+            (self.intern(token) for token in tokens), dtype=np.int64, count=len(tokens)
+        )
+
+    def word(self, word_id: int) -> str:
+        return self._words[word_id]
+
+    def substitution_cost(self, id1: int, id2: int) -> float:
+        """Normalized character distance of the two words: 0 for the same word, 1 for words with nothing in common."""
+        if id1 == id2:
+            return 0.0
+        key = (id1, id2) if id1 < id2 else (id2, id1)
+        ans = self._costs.get(key)
+        if ans is None:
+            word1, word2 = self._words[id1], self._words[id2]
+            ans = levenshtein_distance(word1, word2) / max(len(word1), len(word2))
+            if len(self._costs) >= self._max_cached_costs:
+                self._costs.clear()
+            self._costs[key] = ans
+        return ans
+
+    def matched_characters(self, correct_id: int, user_id: int) -> int:
+        """The number of the characters of the correct word that match the user word, as in its matching blocks."""
+        if correct_id == user_id:
+            return len(self._words[correct_id])
+        key = (correct_id, user_id)
+        ans = self._matched.get(key)
+        if ans is None:
+            blocks = difflib.SequenceMatcher(
+                None, self._words[correct_id], self._words[user_id], autojunk=False
+            ).get_matching_blocks()
+            ans = sum(block.size for block in blocks)
+            if len(self._matched) >= self._max_cached_costs:
+                self._matched.clear()
+            self._matched[key] = ans
+        return ans
+
+    def substitution_costs(self, ids1: np.ndarray, ids2: np.ndarray) -> np.ndarray:
+        """The (len(ids1), len(ids2)) matrix of substitution costs. Each distinct pair of words is computed once."""
+        unique1, inverse1 = np.unique(ids1, return_inverse=True)
+        unique2, inverse2 = np.unique(ids2, return_inverse=True)
+        costs = np.array(
+            [
+                [self.substitution_cost(a, b) for b in unique2.tolist()]
+                for a in unique1.tolist()
+            ],
+            dtype=np.float64,
+        ).reshape(len(unique1), len(unique2))
+        return costs[np.ix_(inverse1, inverse2)]
+
+
+_vocabulary = TokenVocabulary()
+
+
+def get_vocabulary() -> TokenVocabulary:
+    """The vocabulary shared by all the alignments of the process."""
+    return _vocabulary
+
+
+def align_token_ids(
+    correct_ids: np.ndarray, user_ids: np.ndarray, costs: np.ndarray
+) -> list[tuple[int, int]]:
+    """Aligns the two ID sequences. Returns the (correct index, user index) pairs that ended up on the diagonal,
+    in increasing order. `costs` is the substitution cost matrix of the two sequences."""
+    m, n = len(correct_ids), len(user_ids)
+    directions = np.empty((m + 1, n + 1), dtype=np.uint8)
+    directions[0, :] = OP_INSERT
+    directions[:, 0] = OP_DELETE
+
+    offsets = np.arange(n + 1, dtype=np.float64)
+    row = offsets.copy()
+    for i in range(1, m + 1):
+        diagonal = row[:-1] + costs[i - 1]
+        deletion = row[1:] + 1
+        new_row = np.empty_like(row)
+        new_row[0] = i
+        np.minimum(diagonal, deletion, out=new_row[1:])
+        # The move is chosen before the insertions are folded in: comparing the floats after the round trip through
+        # the running minimum would mislabel some cells.
+        diagonal_wins = diagonal <= deletion
+        # Insertions cost 1 per token, so they can be folded in with a running minimum, as in levenshtein. An
+        # insertion wins only where it is cheaper by more than the rounding.
+        accumulated = np.minimum.accumulate(new_row - offsets) + offsets
+        inserted = accumulated[1:] < new_row[1:] - _COST_TOLERANCE
+        new_row[1:] = np.where(inserted, accumulated[1:], new_row[1:])
+        directions[i, 1:] = np.where(
+            inserted,
+            OP_INSERT,
+            np.where(diagonal_wins, OP_DIAGONAL, OP_DELETE),
+        )
+        row = new_row
+
+    pairs = []
+    i, j = m, n
+    while i > 0 and j > 0:
+        op = directions[i, j]
+        if op == OP_DIAGONAL:
+            i -= 1
+            j -= 1
+            pairs.append((i, j))
+        elif op == OP_DELETE:
+            i -= 1
+        else:
+            j -= 1
+    pairs.reverse()
+    return pairs
+
+
+def word_mapper_tokens(
+    correct_tokens: list[str],
+    user_tokens: list[str],
+    vocabulary: TokenVocabulary | None = None,
+) -> tuple[list[int], list[bool]]:
+    """The same contract as sentence_accuracy.word_mapper, computed on the token level.
+
+    For each correct token returns the index of the user token aligned with it (or -1 if there is none, or if the two
+    words have no character in common), and whether it was read cleanly: with at least CLEAN_MATCH_FRACTION of its
+    characters matching, as in the character engine."""
+    if vocabulary is None:
+        vocabulary = get_vocabulary()
+    correct_ids = vocabulary.intern_tokens(correct_tokens)
+    user_ids = vocabulary.intern_tokens(user_tokens)
+    costs = vocabulary.substitution_costs(correct_ids, user_ids)
+
+    dominant_matches = [-1] * len(correct_tokens)
+    cleanly_matched_tokens = [False] * len(correct_tokens)
+    for i, j in align_token_ids(correct_ids, user_ids, costs):
+        if costs[i, j] < 1.0:
+            dominant_matches[i] = j
+            matched = vocabulary.matched_characters(
+                int(correct_ids[i]), int(user_ids[j])
+            )
+            cleanly_matched_tokens[i] = (
+                matched >= len(correct_tokens[i]) * CLEAN_MATCH_FRACTION
+            )
+    return dominant_matches, cleanly_matched_tokens
@@ -1,5 +1,6 @@
 from pathlib import Path
 import json
+import os
 
 
 def create_and_load_file(file_name: Path, default_content):
@@ -28,6 +29,16 @@ def create_and_load_file_str(file_name: Path, default_content: str):
     return default_content
 
 
+def write_text_atomically(file_name: Path, text: str):
+    """Writes the file through a temporary file and os.replace, so a crash leaves either the old or the new content."""
+    tmp_name = file_name.with_name(file_name.name + ".tmp")
+    with open(tmp_name, "w", encoding="utf-8") as fw:
+        fw.write(text)
+        fw.flush()
+        os.fsync(fw.fileno())
+    os.replace(tmp_name, file_name)
+
+
 ignored_letters = '!?".,;:–-„”()[]{}—«»…'
 
 
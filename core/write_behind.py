@@ -0,0 +1,151 @@
+"""Write-behind persistence of small objects, like the total scores and the config.
+
+Saving such an object only marks it dirty, with the function that writes its current state. A background thread runs
+the writes once no object was marked for `debounce` seconds (but at most `max_delay` seconds after the first mark), so
+a burst of changes is written once, and never on the thread that made them. Marking an object that is already dirty
+replaces its pending write. close() writes everything that is still pending."""
+
+import threading
+import time
+import traceback
+from typing import Callable, Hashable
+
+
+class FlushMetrics:
+    """How the writes of a WriteBehind went."""
+
+    flushes: int  # Number of batches of writes
+    writes: int
+    coalesced: int  # Number of writes replaced by a later mark before they ran
+    errors: int
+    total_seconds: float  # Time spent writing
+    max_seconds: float  # The longest batch
+    max_delay: float  # The longest time from a mark to its write
+
+    def __init__(self):
+        self.flushes = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.max_delay = 0.0
+
+    def copy(self) -> "FlushMetrics":
+        ans = FlushMetrics()
+        ans.__dict__.update(self.__dict__)
+        return ans
+
+    def __repr__(self):
+        return (
+            f"FlushMetrics(flushes={self.flushes}, writes={self.writes}, coalesced={self.coalesced}, "
+            f"errors={self.errors}, total_seconds={self.total_seconds:.3f}, max_seconds={self.max_seconds:.3f}, "
+            f"max_delay={self.max_delay:.3f})"
+        )
+
+
+class WriteBehind:
+    """See the module docstring."""
+
+    _debounce: float
+    _max_delay: float
+    # Pending writes by the key of their object, with the time of the first mark.
+    _dirty: dict[Hashable, tuple[Callable[[], None], float]]
+    _last_mark: float
+    _condition: threading.Condition
+    # Held while writing, so that flush() returns only after the writes it waits for are done.
+    _write_lock: threading.Lock
+    _metrics: FlushMetrics
+    _closed: bool
+    _thread: threading.Thread
+
+    def __init__(self, debounce: float = 1.0, max_delay: float = 10.0):
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._dirty = {}
+        self._last_mark = 0.0
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._metrics = FlushMetrics()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def mark_dirty(self, key: Hashable, write: Callable[[], None]):
+        """Schedules the write of the object identified by the key, replacing its pending write if there is one."""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The write-behind is closed")
+            now = time.monotonic()
+            first_mark = now
+            if key in self._dirty:
+                first_mark = self._dirty[key][1]
+                self._metrics.coalesced += 1
+            self._dirty[key] = (write, first_mark)
+            self._last_mark = now
+            self._condition.notify()
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._dirty)
+
+    def metrics(self) -> FlushMetrics:
+        with self._condition:
+            return self._metrics.copy()
+
+    def _due_in(self) -> float | None:
+        # Seconds until the pending writes are due, or None if there are none. Called with the condition held.
+        if len(self._dirty) == 0:
+            return None
+        first_mark = min(first for _, first in self._dirty.values())
+        now = time.monotonic()
+        return min(self._last_mark + self._debounce, first_mark + self._max_delay) - now
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (
+                    (due_in := self._due_in()) is None or due_in > 0
+                ):
+                    self._condition.wait(due_in)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Runs all the pending writes now, on the calling thread."""
+        with self._write_lock:
+            with self._condition:
+                dirty = self._dirty
+                self._dirty = {}
+            if len(dirty) == 0:
+                return
+            start = time.monotonic()
+            errors = 0
+            max_delay = 0.0
+            for write, first_mark in dirty.values():
+                try:
+                    write()
+                except Exception:
+                    errors += 1
+                    traceback.print_exc()
+                max_delay = max(max_delay, time.monotonic() - first_mark)
+            elapsed = time.monotonic() - start
+            with self._condition:
+                self._metrics.flushes += 1
+                self._metrics.writes += len(dirty) - errors
+                self._metrics.errors += errors
+                self._metrics.total_seconds += elapsed
+                self._metrics.max_seconds = max(self._metrics.max_seconds, elapsed)
+                self._metrics.max_delay = max(self._metrics.max_delay, max_delay)
+
+    def close(self):
+        """Stops the background thread and writes what is still pending."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
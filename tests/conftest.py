@@ -0,0 +1,71 @@
+"""Factories shared by the test modules, as fixtures."""
+
+import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from core.config import ConfigDataDO
+from core.scoring_serialization import ScoreDO
+from core.voice_sample import VoiceSample
+
+QUESTIONS = "Ala ma kota.\nKot ma Alę.\nPies je."
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    """make_config(directory=tmp_path, questions=QUESTIONS, **fields): a config with all its files in the directory,
+    and the questions written to its questions file."""
+
+    def make(
+        directory: Path | None = None, questions: str = QUESTIONS, **kwargs
+    ) -> ConfigDataDO:
+        if directory is None:
+            directory = tmp_path
+        directory.mkdir(parents=True, exist_ok=True)
+        questions_file = directory / "sentences.txt"
+        questions_file.write_text(questions, "utf-8")
+        files = {
+            "questions_file": questions_file,
+            "answers_file": directory / "answers.json",
+            "scores_file": directory / "scores.json",
+            "recordings_directory": directory / "audio",
+            "history_file": directory / "history.json",
+            "history_journal_file": directory / "history.jsonl",
+            "database_file": directory / "scores.sqlite3",
+            "snapshot_file": directory / "snapshot.bin",
+        }
+        return ConfigDataDO(**(files | kwargs))
+
+    return make
+
+
+@pytest.fixture
+def make_score():
+    """make_score(i): the i-th answer of a small history, alternating between two sentences."""
+
+    def make(i: int) -> ScoreDO:
+        return ScoreDO(
+            correct_sentence=f"Zdanie {i % 2}.",
+            user_answer=f"zdanie {i}",
+            timestamp=datetime.datetime(2024, 6, 1, 12, 0, i),
+            saved_audio=Path(f"audio/{i}.wav"),
+            correct_words=[True, i % 2 == 0],
+            respeak_words=[False],
+            flag_correct=i % 3 != 0,
+        )
+
+    return make
+
+
+@pytest.fixture
+def make_sample():
+    """make_sample(seconds=0.5): a 440 Hz tone."""
+
+    def make(seconds: float = 0.5) -> VoiceSample:
+        t = np.arange(int(44100 * seconds)) / 44100
+        data = (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16).tobytes()
+        return VoiceSample(data=data, frame_rate=44100, sample_width=2)
+
+    return make
@@ -0,0 +1,40 @@
+import pytest
+
+from core import alignment_backends
+from core.alignment_backends import (
+    AUTO_BACKEND,
+    DIFFLIB_MAX_LENGTH,
+    get_backend_counters,
+    matching_blocks,
+    reset_backend_counters,
+    select_backend,
+    set_default_backend,
+)
+
+
+def test_select_backend(monkeypatch):
+    assert select_backend(10, 10) == "difflib"
+    long = DIFFLIB_MAX_LENGTH + 1
+    monkeypatch.setattr(alignment_backends, "available_memory", lambda: 10**12)
+    assert select_backend(long, long) == "bitparallel"
+    monkeypatch.setattr(alignment_backends, "available_memory", lambda: 1000)
+    assert select_backend(long, long) == "hirschberg"
+
+    set_default_backend("numpy")
+    try:
+        assert select_backend(10, 10) == "numpy"
+    finally:
+        set_default_backend(AUTO_BACKEND)
+    with pytest.raises(ValueError):
+        set_default_backend("nonexistent")
+
+
+def test_counters():
+    reset_backend_counters()
+    blocks = matching_blocks("ala ma kota", "ala ma psa")
+    assert tuple(blocks[0]) == (0, 0, 7)
+    matching_blocks("ala ma kota", "ala ma psa", "hirschberg")
+    counters = get_backend_counters()
+    assert counters["difflib"].calls == 1
+    assert counters["difflib"].characters == 21
+    assert counters["hirschberg"].calls == 1
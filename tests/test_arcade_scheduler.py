@@ -0,0 +1,187 @@
+import datetime
+import math
+import random
+
+from core.arcade_scheduler import (
+    ArcadeScheduler,
+    decayed_means,
+    score_arrays,
+    timestamp_seconds,
+)
+from core.columnar_history import ColumnarScoreHistory
+from core.scoring_arcade import (
+    MIN_SCORE_AGE,
+    SCORE_WINDOW,
+    WEIGHT_POINTS,
+    Scoring_Arcade,
+    weighting_slope,
+)
+from core.scoring_serialization import ScoreDO, ScoreHistoryDO
+
+NOW = datetime.datetime(2024, 6, 15, 12, 0, 0)
+SENTENCES = [f"Zdanie {i}." for i in range(8)]
+
+
+def reference_score(scores: list[ScoreDO], sentence: str, now: datetime.datetime):
+    # The definition of Scoring_Arcade.sentence_score, one answer at a time.
+    slope = weighting_slope(*WEIGHT_POINTS)
+    weighted = weights = 0.0
+    for score in scores:
+        if score.correct_sentence != sentence or score.timestamp < now - SCORE_WINDOW:
+            continue
+        age = max(MIN_SCORE_AGE, now - score.timestamp).total_seconds()
+        weight = math.exp(slope * age)
+        weighted += score.overall_score * weight
+        weights += weight
+    return weighted / weights if weights > 0 else 0.0
+
+
+def make_scheduler(scores: list[ScoreDO], now: datetime.datetime) -> ArcadeScheduler:
+    return ArcadeScheduler(
+        SENTENCES,
+        sorted(scores, key=lambda score: score.timestamp),
+        slope=weighting_slope(*WEIGHT_POINTS),
+        window=SCORE_WINDOW.total_seconds(),
+        min_age=MIN_SCORE_AGE.total_seconds(),
+        now=now,
+    )
+
+
+def random_score(rng: random.Random, timestamp: datetime.datetime) -> ScoreDO:
+    return ScoreDO(
+        correct_sentence=rng.choice(SENTENCES[:-1]),  # The last one is never answered
+        correct_accuracy=rng.random(),
+        time_penalty=rng.choice([1.0, 0.5]),
+        timestamp=timestamp,
+    )
+
+
+def check(scheduler: ArcadeScheduler, scores: list[ScoreDO], now: datetime.datetime):
+    expected = sorted(
+        (reference_score(scores, sentence, now), sentence) for sentence in SENTENCES
+    )
+    for score, sentence in expected:
+        assert math.isclose(scheduler.score(sentence, now), score, abs_tol=1e-9)
+    assert scheduler.next_sentence(now) == expected[0][1]
+
+
+def test_scheduler_matches_the_definition():
+    rng = random.Random(0)
+    scores = [
+        random_score(rng, NOW - datetime.timedelta(seconds=rng.uniform(0, 20 * 86400)))
+        for _ in range(200)
+    ]
+    scheduler = make_scheduler(scores, NOW)
+    check(scheduler, scores, NOW)
+
+    # New answers, some of them younger than a minute when asked, while old ones leave the window.
+    now = NOW
+    for _ in range(100):
+        now += datetime.timedelta(seconds=rng.uniform(0, 3 * 3600))
+        score = random_score(rng, now - datetime.timedelta(seconds=rng.uniform(0, 90)))
+        scores.append(score)
+        scheduler.add_score(score, now)
+        check(scheduler, scores, now)
+        check(scheduler, scores, now + datetime.timedelta(seconds=30))
+    check(scheduler, scores, now + datetime.timedelta(days=13))
+    check(scheduler, scores, now + datetime.timedelta(days=15))
+    assert scheduler.score(SENTENCES[0], now + datetime.timedelta(days=15)) == 0.0
+
+
+def test_unanswered_sentences_come_first():
+    scores = [
+        ScoreDO(
+            correct_sentence=s, correct_accuracy=0.5, time_penalty=1.0, timestamp=NOW
+        )
+        for s in SENTENCES[1:]
+    ]
+    scheduler = make_scheduler(scores, NOW)
+    assert scheduler.next_sentence(NOW) == SENTENCES[0]
+    scheduler.add_score(
+        ScoreDO(correct_sentence=SENTENCES[0], correct_accuracy=1.0, time_penalty=1.0),
+        NOW,
+    )
+    assert scheduler.next_sentence(NOW) == SENTENCES[1]
+
+
+def test_scoring_arcade_uses_the_scheduler(make_config):
+    config = make_config(story_mode=False)
+    scoring = Scoring_Arcade(config)
+    for _ in range(4):
+        sentence = scoring.get_next_sentence()
+        assert sentence == scoring.sentence_scores()[0][1]
+        scoring.set_sentence_answer(
+            sentence,
+            sentence.lower(),
+            sentence.lower(),
+            1.0,
+            2.0,
+            config.recordings_directory / "a.wav",
+        )
+    for score, sentence in scoring.sentence_scores():
+        assert math.isclose(scoring.scheduler().score(sentence), score)
+    config.close_storage()
+
+
+def test_decayed_means():
+    rng = random.Random(1)
+    # Up to 20 days old, and a few from up to an hour in the future.
+    scores = [
+        random_score(
+            rng, NOW - datetime.timedelta(seconds=rng.uniform(-3600, 20 * 86400))
+        )
+        for _ in range(300)
+    ]
+    expected = [reference_score(scores, sentence, NOW) for sentence in SENTENCES]
+    means = decayed_means(
+        *score_arrays(scores, {sentence: i for i, sentence in enumerate(SENTENCES)}),
+        len(SENTENCES),
+        slope=weighting_slope(*WEIGHT_POINTS),
+        window=SCORE_WINDOW.total_seconds(),
+        min_age=MIN_SCORE_AGE.total_seconds(),
+        now=timestamp_seconds(NOW),
+    )
+    assert means[-1] == 0.0
+    assert all(math.isclose(a, b) for a, b in zip(means.tolist(), expected))
+
+    scheduler = make_scheduler(scores, NOW)
+    for sentence, score in zip(SENTENCES, expected):
+        assert math.isclose(scheduler.score(sentence, NOW), score)
+
+    columnar = ColumnarScoreHistory(scores).decayed_mean_by_sentence(
+        slope=weighting_slope(*WEIGHT_POINTS),
+        window=SCORE_WINDOW.total_seconds(),
+        min_age=MIN_SCORE_AGE.total_seconds(),
+        now=NOW,
+    )
+    for sentence, score in zip(SENTENCES, expected):
+        assert math.isclose(columnar.get(sentence, 0.0), score)
+
+
+def test_sentence_score_counts_whole_days(make_config):
+    config = make_config(story_mode=False)
+    scoring = Scoring_Arcade(config)
+    now = datetime.datetime.now()
+    sentence = "Pies je."
+    scores = [
+        ScoreDO(
+            correct_sentence=sentence,
+            correct_accuracy=accuracy,
+            time_penalty=1.0,
+            timestamp=now - age,
+        )
+        for accuracy, age in [
+            (1.0, datetime.timedelta(days=2, hours=1)),
+            (0.0, datetime.timedelta(hours=1)),
+            (0.5, datetime.timedelta(days=15)),
+        ]
+    ]
+    scoring._score_history = ScoreHistoryDO(history=scores)
+    # timedelta.seconds would drop the days, and the first two answers would weigh the same (a score of 0.5).
+    assert math.isclose(
+        scoring.sentence_score(sentence),
+        reference_score(scores, sentence, now),
+        rel_tol=1e-6,
+    )
+    assert scoring.sentence_score(sentence) < 0.25
+    config.close_storage()
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from core.binary_container import BinaryContainer, BinaryWriter
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "data.bin"
+    writer = BinaryWriter("test", {"answer": 42})
+    writer.add_array("floats", np.linspace(0, 1, 11))
+    writer.add_array("matrix", np.arange(12, dtype=np.int16).reshape(3, 4))
+    writer.add_strings("words", ["ala", "", "żółw"])
+    writer.add_ragged("ranges", [np.array([[0, 3]]), np.empty((0, 2))], np.int32)
+    writer.write(path)
+
+    container = BinaryContainer(path, "test")
+    assert container.metadata == {"answer": 42}
+    assert np.array_equal(container.array("floats"), np.linspace(0, 1, 11))
+    assert container.array("matrix").shape == (3, 4)
+    assert not container.array("matrix").flags.writeable
+    assert list(container.strings("words")) == ["ala", "", "żółw"]
+    ranges = container.ragged("ranges")
+    assert len(ranges) == 2
+    assert ranges[0].tolist() == [[0, 3]]
+    assert len(ranges[1]) == 0
+    assert not container.has("missing")
+
+
+def test_damaged_or_foreign_files(tmp_path):
+    path = tmp_path / "data.bin"
+    writer = BinaryWriter("test")
+    writer.add_array("values", np.arange(1000))
+    writer.write(path)
+    with pytest.raises(ValueError):
+        BinaryContainer(path, "other")
+
+    data = bytearray(path.read_bytes())
+    data[-100] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        BinaryContainer(path, "test")
+    BinaryContainer(path, "test", verify=False)
+
+    path.write_text("{}")
+    with pytest.raises(ValueError):
+        BinaryContainer(path)
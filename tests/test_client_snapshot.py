@@ -0,0 +1,109 @@
+import os
+
+from core.client_snapshot import write_client_snapshot
+from core.config import ConfigDataDO
+from core.question_index import QuestionEntryDO, index_path
+from core.respeak_sentence import CachedRespeak, get_fake_respeak_server
+from core.scoring_arcade import Scoring_Arcade
+
+
+def write_snapshot(config: ConfigDataDO) -> Scoring_Arcade:
+    scoring = Scoring_Arcade(config)
+    scoring.set_sentence_answer(
+        "Kot ma Alę.",
+        "kot ma ale",
+        "kot ma ale",
+        1.0,
+        2.0,
+        config.recordings_directory / "a.wav",
+    )
+    config.close_storage()
+    write_client_snapshot(
+        config,
+        scoring.question_index,
+        scoring.score_history,
+        scoring.sentence_scores(),
+        {"Ala ma kota.": "ala ma kota"},
+    )
+    return scoring
+
+
+def test_snapshot_round_trip(make_config):
+    config = make_config(story_mode=False)
+    scoring = write_snapshot(config)
+
+    snapshot = config.load_snapshot()
+    assert snapshot is not None
+    assert [entry.model_dump() for entry in snapshot.question_index().entries] == [
+        entry.model_dump() for entry in scoring.question_index.indexed_entries()
+    ]
+    assert snapshot.arcade_scores() == scoring.sentence_scores()
+    assert snapshot.answer_counts() == {"Kot ma Alę.": 1}  # The indexed questions
+    assert snapshot.history_size == 1
+
+    respeak = CachedRespeak(lambda: None, snapshot.respeak_transcripts())
+    assert respeak.respeak("Ala ma kota.") == (True, "ala ma kota")
+    first = Scoring_Arcade(config).get_next_sentence()
+    assert first == scoring.sentence_scores()[0][1]
+    config.close_storage()
+
+
+def test_answer_after_loading_the_snapshot(make_config):
+    config = make_config(story_mode=False)
+    write_snapshot(config)
+    assert config.load_snapshot() is not None
+
+    scoring = Scoring_Arcade(config)
+    sentence = scoring.get_next_sentence()
+    assert scoring.get_char_ranges("Kot ma Alę.") == [(0, 3), (4, 6), (7, 10)]
+    score = scoring.set_sentence_answer(
+        sentence,
+        sentence.lower(),
+        sentence.lower(),
+        1.0,
+        2.0,
+        config.recordings_directory / "b.wav",
+    )
+    assert score.correct_sentence == sentence
+    assert len(scoring.score_history.scores_by_sentence(sentence)) >= 1
+    config.close_storage()
+
+
+def test_arcade_index_is_lazy(make_config):
+    config = make_config(story_mode=False)
+    scoring = Scoring_Arcade(config)
+    assert scoring.question_index.indexed_entries() == []
+    entry = scoring.question_index.entry("Pies je.")
+    assert entry.model_dump() == QuestionEntryDO.from_sentence("Pies je.").model_dump()
+    assert config.question_store().entry("Pies je.") is entry
+    assert not index_path(config.questions_file).exists()
+    config.close_storage()
+
+
+def test_snapshot_is_invalidated(make_config):
+    config = make_config(story_mode=False)
+    write_snapshot(config)
+    assert config.load_snapshot() is not None
+
+    config.max_answers_per_question += 1
+    assert config.load_snapshot() is None
+    config.max_answers_per_question -= 1
+
+    stat = config.questions_file.stat()
+    os.utime(config.questions_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert config.load_snapshot() is None
+
+
+def test_cached_respeak_starts_the_server_on_a_miss():
+    servers = []
+
+    def make_server():
+        servers.append(get_fake_respeak_server())
+        return servers[-1]
+
+    respeak = CachedRespeak(make_server, {"a": "A"})
+    assert respeak.respeak("a") == (True, "A")
+    assert servers == []
+    assert respeak.respeak("b") == (True, "b")
+    assert len(servers) == 1
+    assert respeak.transcripts == {"a": "A", "b": "b"}
@@ -0,0 +1,50 @@
+import datetime
+from pathlib import Path
+
+import pytest
+
+from core.columnar_history import ColumnarScoreHistory
+from core.scoring_serialization import ScoreDO
+
+
+def make_score(i: int) -> ScoreDO:
+    return ScoreDO(
+        correct_sentence=f"Zdanie {i % 2}.",
+        respeak_sentence=f"Zdanie {i % 2}.",
+        user_answer=f"zdanie {i}",
+        timestamp=datetime.datetime(2024, 6, 1, 12, 0, i, 500),
+        saved_audio=Path(f"audio/{i}.wav"),
+        correct_accuracy=0.5 + i / 10,
+        respeak_accuracy=0.25,
+        time_penalty=0.5,
+        correct_words=[True, False] * i + [True],
+        respeak_words=[i % 2 == 0] * 9,
+        flag_correct=i % 3 != 0,
+    )
+
+
+def test_round_trip():
+    scores = [make_score(i) for i in range(5)] + [ScoreDO()]
+    columnar = ColumnarScoreHistory(scores)
+    assert len(columnar) == 6
+    assert list(columnar) == scores
+    assert columnar[-1] == scores[-1]
+    with pytest.raises(IndexError):
+        columnar[6]
+    assert columnar.to_history().scores_by_sentence("Zdanie 1.") == scores[1:5:2]
+
+
+def test_queries():
+    scores = [make_score(i) for i in range(5)]
+    columnar = ColumnarScoreHistory(scores)
+    assert columnar.overall_scores().tolist() == pytest.approx(
+        [score.overall_score for score in scores]
+    )
+    means = columnar.mean_overall_score_by_sentence()
+    assert means["Zdanie 1."] == pytest.approx(
+        (scores[1].overall_score + scores[3].overall_score) / 2
+    )
+    assert columnar.word_accuracies().tolist() == pytest.approx(
+        [sum(score.words) / len(score.words) for score in scores]
+    )
+    assert columnar.indices_since(scores[3].timestamp).tolist() == [3, 4]
@@ -0,0 +1,102 @@
+import csv
+import datetime
+import json
+
+import numpy as np
+
+from core.config import ConfigDataDO
+from core.history_export import (
+    export_history,
+    export_npz,
+    rebuild_rollups,
+    stream_history,
+)
+from core.scoring_serialization import ScoreDO, TotalScoreDO
+
+
+def store_scores(config: ConfigDataDO, scores: list[ScoreDO]):
+    history = config.load_history()
+    for score in scores:
+        history.add_score(score, score.correct_sentence)
+        config.append_history(score, history)
+    config.close_storage()
+
+
+def test_stream_history(tmp_path, make_config, make_score):
+    scores = [make_score(i) for i in range(5)]
+    for storage_backend in ("json", "sqlite"):
+        config = make_config(
+            tmp_path / storage_backend, storage_backend=storage_backend
+        )
+        store_scores(config, scores)
+        assert list(stream_history(config)) == scores
+        config.close_storage()
+
+
+def test_csv_and_ndjson(tmp_path, make_score):
+    scores = [make_score(i) for i in range(3)]
+    assert export_history(iter(scores), tmp_path / "h.csv", "csv") == 3
+    with (tmp_path / "h.csv").open(encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["user_answer"] for row in rows] == ["zdanie 0", "zdanie 1", "zdanie 2"]
+    assert rows[1]["correct_words"] == "10"
+    assert float(rows[0]["accuracy"]) == scores[0].accuracy
+
+    export_history(iter(scores), tmp_path / "h.ndjson", "ndjson")
+    lines = (tmp_path / "h.ndjson").read_text("utf-8").splitlines()
+    assert [ScoreDO(**json.loads(line)) for line in lines] == scores
+
+
+def test_npz(tmp_path, make_score):
+    scores = [make_score(i) for i in range(7)]
+    assert export_npz(iter(scores), tmp_path / "h.npz", chunk_size=3) == 7
+    with np.load(tmp_path / "h.npz") as data:
+        assert data["time_penalty"].shape == (7,)
+        assert data["flag_correct"].tolist() == [s.flag_correct for s in scores]
+        assert data["timestamp"][2] == np.datetime64(scores[2].timestamp, "us")
+        offsets = data["user_answer.offsets"]
+        text = data["user_answer.data"].tobytes()
+        assert text[offsets[4] : offsets[5]].decode() == "zdanie 4"
+        word_offsets = data["correct_words.offsets"]
+        words = data["correct_words.data"]
+        assert words[word_offsets[1] : word_offsets[2]].tolist() == [True, False]
+
+
+def test_rollups(tmp_path, make_score):
+    scores = [make_score(i) for i in range(4)]
+    scores[3].timestamp += datetime.timedelta(days=1)
+    total = TotalScoreDO()
+    total.set_scores_file(tmp_path / "scores.json")
+    for score in scores:
+        total.add_score(score)
+    assert total.daily["2024-06-01"].answers == 3
+    assert total.daily["2024-06-02"].answers == 1
+    assert total.by_sentence["Zdanie 0."].answers == 2
+    assert (
+        total.by_sentence["Zdanie 1."].mean_accuracy
+        == (scores[1].accuracy + scores[3].accuracy) / 2
+    )
+
+    rebuilt = TotalScoreDO()
+    rebuild_rollups(rebuilt, scores)
+    assert rebuilt.daily == total.daily
+    assert rebuilt.by_sentence == total.by_sentence
+    assert (
+        TotalScoreDO.LoadScores(tmp_path / "scores.json").model_dump()
+        == total.model_dump()
+    )
+
+
+def test_skipped_questions_are_not_in_rollups(tmp_path, make_score):
+    total = TotalScoreDO()
+    total.set_scores_file(tmp_path / "scores.json")
+    total.add_score(make_score(0))
+    total.add_score(ScoreDO())  # What next_question adds for a skipped question
+    assert total.total_questions == 2
+    assert sum(rollup.answers for rollup in total.daily.values()) == 1
+    assert list(total.by_sentence) == ["Zdanie 0."]
+
+    total.clear()
+    assert total.total_questions == 0
+    assert total.daily["2024-06-01"].answers == 1
+    assert total.by_sentence["Zdanie 0."].answers == 1
@@ -0,0 +1,166 @@
+import random
+
+import pytest
+
+from core import levenshtein
+from core.levenshtein import (
+    LOW_MEMORY_THRESHOLD,
+    DiffenenceType,
+    OP_DELETE,
+    OP_INSERT,
+    OP_MATCH,
+    OP_SUBSTITUTE,
+    SequenceMatcher,
+    bitparallel_edit_script,
+    hirschberg_edit_script,
+    levenshtein_distance,
+    levenshtein_edit_script,
+    set_low_memory_threshold,
+    str_levenshtein_distance,
+)
+
+
+def reference_levenshtein(s1: str, s2: str) -> tuple[int, list[int]]:
+    # The classic double loop, with the same tie-breaking as the engines under test.
+    m, n = len(s1), len(s2)
+    dp = [[0] * (n + 1) for _ in range(m + 1)]
+    for i in range(m + 1):
+        for j in range(n + 1):
+            if i == 0:
+                dp[i][j] = j
+            elif j == 0:
+                dp[i][j] = i
+            elif s1[i - 1] == s2[j - 1]:
+                dp[i][j] = dp[i - 1][j - 1]
+            else:
+                dp[i][j] = 1 + min(dp[i - 1][j], dp[i][j - 1], dp[i - 1][j - 1])
+
+    ops = []
+    i, j = m, n
+    while i > 0 or j > 0:
+        if i == 0:
+            ops.append(OP_INSERT)
+            j -= 1
+        elif j == 0:
+            ops.append(OP_DELETE)
+            i -= 1
+        elif s1[i - 1] == s2[j - 1]:
+            ops.append(OP_MATCH)
+            i -= 1
+            j -= 1
+        elif dp[i][j] == dp[i - 1][j] + 1:
+            ops.append(OP_DELETE)
+            i -= 1
+        elif dp[i][j] == dp[i][j - 1] + 1:
+            ops.append(OP_INSERT)
+            j -= 1
+        else:
+            ops.append(OP_SUBSTITUTE)
+            i -= 1
+            j -= 1
+    ops.reverse()
+    return dp[m][n], ops
+
+
+def expand(edit_script) -> list[int]:
+    return [int(op) for op, length in edit_script for _ in range(length)]
+
+
+def random_pairs(count: int, max_len: int = 40):
+    rnd = random.Random(42)
+    for _ in range(count):
+        s1 = "".join(rnd.choice("abcą ") for _ in range(rnd.randint(0, max_len)))
+        s2 = "".join(rnd.choice("abcą ") for _ in range(rnd.randint(0, max_len)))
+        yield s1, s2
+
+
+def test_edit_script_matches_reference():
+    for s1, s2 in random_pairs(300):
+        distance, edit_script = levenshtein_edit_script(s1, s2)
+        ref_distance, ref_ops = reference_levenshtein(s1, s2)
+        assert distance == ref_distance
+        assert expand(edit_script) == ref_ops
+
+
+def test_operations():
+    distance, operations = str_levenshtein_distance("kot", "kat")
+    assert distance == 1
+    assert len(operations) == 1
+    assert operations[0].operation_type == DiffenenceType.ErrorInWord
+    assert operations[0].where_index == 2
+    assert operations[0].what_inserted == "a"
+
+    distance, operations = str_levenshtein_distance("", "ab")
+    assert distance == 2
+    assert [o.operation_type for o in operations] == [DiffenenceType.ExtraPart] * 2
+
+
+def test_matching_blocks():
+    for s1, s2 in random_pairs(100):
+        blocks = SequenceMatcher(s1, s2).get_matching_blocks()
+        matched = 0
+        for block in blocks:
+            a, b, size = block
+            assert size > 0
+            assert s1[a : a + size] == s2[b : b + size]
+            matched += size
+        assert matched == expand(levenshtein_edit_script(s1, s2)[1]).count(OP_MATCH)
+
+
+def test_bitparallel_matches_numpy():
+    pairs = list(random_pairs(300)) + [("", ""), ("a", ""), ("", "a")]
+    for s1, s2 in pairs:
+        distance, edit_script = bitparallel_edit_script(s1, s2)
+        ref_distance, ref_edit_script = levenshtein_edit_script(s1, s2)
+        assert distance == ref_distance
+        assert edit_script.tolist() == ref_edit_script.tolist()
+
+    # More than 64 positions in the bit vector.
+    for s1, s2 in random_pairs(20, max_len=300):
+        assert (
+            bitparallel_edit_script(s1, s2)[1].tolist()
+            == levenshtein_edit_script(s1, s2)[1].tolist()
+        )
+
+
+def test_hirschberg_matches_numpy():
+    # A tiny block forces the recursion down to single rows.
+    for block in [1, 50, 10_000]:
+        for s1, s2 in list(random_pairs(100)) + [("", ""), ("ab", ""), ("", "ab")]:
+            distance, edit_script = hirschberg_edit_script(s1, s2, block=block)
+            ref_distance, ref_edit_script = levenshtein_edit_script(s1, s2)
+            assert distance == ref_distance
+            assert edit_script.tolist() == ref_edit_script.tolist()
+
+
+def test_low_memory_threshold():
+    for s1, s2 in random_pairs(20, max_len=300):
+        assert (
+            levenshtein_edit_script(s1, s2, low_memory_threshold=0)[1].tolist()
+            == levenshtein_edit_script(s1, s2)[1].tolist()
+        )
+
+
+def test_set_low_memory_threshold(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        levenshtein,
+        "hirschberg_edit_script",
+        lambda s1, s2: calls.append((s1, s2)) or (0, None),
+    )
+    try:
+        set_low_memory_threshold(0)
+        levenshtein_edit_script("ala", "ola")
+        assert calls == [("ala", "ola")]
+        set_low_memory_threshold(LOW_MEMORY_THRESHOLD)
+        levenshtein_edit_script("ala", "ola")
+        assert len(calls) == 1
+    finally:
+        set_low_memory_threshold(LOW_MEMORY_THRESHOLD)
+    with pytest.raises(ValueError):
+        set_low_memory_threshold(-1)
+
+
+def test_levenshtein_distance():
+    for s1, s2 in list(random_pairs(200, max_len=100)) + [("", ""), ("a", "")]:
+        assert levenshtein_distance(s1, s2) == reference_levenshtein(s1, s2)[0]
@@ -0,0 +1,29 @@
+from core.question_index import (
+    QuestionEntryDO,
+    calculate_timeout_from_sentence,
+    index_path,
+    load_question_index,
+)
+from core.util import just_letters_mapping
+
+
+def test_question_entry():
+    sentence = "Ala ma kota, a kot ma Alę."
+    entry = QuestionEntryDO.from_sentence(sentence)
+    assert entry.tokens == ["ala", "ma", "kota", "a", "kot", "ma", "ale"]
+    assert entry.char_ranges == just_letters_mapping(sentence)
+    assert entry.timeout == calculate_timeout_from_sentence(sentence)
+    assert entry.prepared().spaced_text == " ala ma kota a kot ma ale "
+
+
+def test_index_is_persisted_and_rebuilt(tmp_path):
+    questions_file = tmp_path / "sentences.txt"
+    questions_file.write_text("Pierwsze zdanie.\nDrugie zdanie.\n", "utf-8")
+
+    index = load_question_index(questions_file)
+    assert index.sentences == ["Pierwsze zdanie.", "Drugie zdanie.", ""]
+    assert index_path(questions_file).exists()
+    assert load_question_index(questions_file) == index
+
+    questions_file.write_text("Trzecie zdanie.", "utf-8")
+    assert load_question_index(questions_file).sentences == ["Trzecie zdanie."]
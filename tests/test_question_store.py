@@ -0,0 +1,57 @@
+import os
+
+from core.config import ConfigDataDO
+from core.question_store import QuestionStore, lines_index_path
+from core.scoring_story import Scoring_Story
+
+TEXT = "Ala ma kota.\n\nKot ma Alę.\r\nAla ma kota.\nŻółw.\n"
+
+
+def test_lines_match_split(tmp_path):
+    questions_file = tmp_path / "sentences.txt"
+    questions_file.write_bytes(TEXT.encode("utf-8"))
+    store = QuestionStore(questions_file)
+    assert list(store) == TEXT.split("\n")
+    assert store[-2] == "Żółw."
+    assert [store.sentence_id(line) for line in range(len(store))] == [0, 1, 2, 0, 4, 1]
+    assert store.unique_sentences() == ["Ala ma kota.", "", "Kot ma Alę.\r", "Żółw."]
+
+    questions_file.write_bytes(b"")
+    assert list(QuestionStore(questions_file)) == [""]
+    assert len(QuestionStore(tmp_path / "missing.txt")) == 0
+
+
+def test_index_is_persisted_and_rebuilt(tmp_path):
+    questions_file = tmp_path / "sentences.txt"
+    questions_file.write_text("Pierwsze.\nDrugie.", "utf-8")
+    QuestionStore(questions_file)
+    index_file = lines_index_path(questions_file)
+    written = index_file.stat().st_mtime_ns
+    assert list(QuestionStore(questions_file)) == ["Pierwsze.", "Drugie."]
+    assert index_file.stat().st_mtime_ns == written
+
+    questions_file.write_text("Trzecie.\nCzwarte.\nPiąte.", "utf-8")
+    stat = questions_file.stat()
+    os.utime(questions_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert list(QuestionStore(questions_file)) == ["Trzecie.", "Czwarte.", "Piąte."]
+
+    index_file.write_bytes(b"damaged")
+    assert list(QuestionStore(questions_file)) == ["Trzecie.", "Czwarte.", "Piąte."]
+
+
+def test_story_reads_the_store(tmp_path):
+    questions_file = tmp_path / "sentences.txt"
+    questions_file.write_text("\n".join(f"Zdanie {i}." for i in range(100)), "utf-8")
+    config = ConfigDataDO(
+        questions_file=questions_file,
+        scores_file=tmp_path / "scores.json",
+        history_file=tmp_path / "history.json",
+        history_journal_file=tmp_path / "history.jsonl",
+    )
+    story = Scoring_Story(config)
+    assert story.get_next_sentence() == "Zdanie 0."
+    story.set_next_sentence(57)
+    assert story.get_next_sentence() == "Zdanie 57."
+    assert story.get_char_ranges("Zdanie 57.") == [(0, 6), (7, 9)]
+    assert config.question_store() is config.question_store()
+    config.close_storage()
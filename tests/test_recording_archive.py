@@ -0,0 +1,41 @@
+from core.recording_archive import RecordingArchive, RecordingWriter
+
+
+def test_flac_round_trip(tmp_path, make_sample):
+    # Lossless, also when ffmpeg is missing and the recording is kept as wav.
+    archive = RecordingArchive(tmp_path, "flac")
+    sample = make_sample()
+    entry = archive.add(sample, tmp_path / "2024-06-01-10:00:00.wav")
+    assert entry.format in ("flac", "wav")
+    assert (tmp_path / entry.archive_file).stat().st_size == entry.size
+    assert entry.duration == sample.length()
+
+    loaded = archive.load(tmp_path / "2024-06-01-10:00:00.wav")
+    assert loaded.data == sample.data
+    assert loaded.frame_rate == 44100
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_writer_saves_the_index(tmp_path, make_sample):
+    writer = RecordingWriter(RecordingArchive(tmp_path, "wav"), max_queue=2)
+    samples = {
+        tmp_path / f"answer-{i}.wav": make_sample(0.1 * (i + 1)) for i in range(5)
+    }
+    for saved_audio, sample in samples.items():
+        writer.submit(sample, saved_audio)
+    first = next(iter(samples))
+    assert writer.load(first).data == samples[first].data
+    writer.close()
+
+    archive = RecordingArchive(tmp_path, "wav")
+    assert set(archive.entries()) == {str(path) for path in samples}
+    for saved_audio, sample in samples.items():
+        assert archive.load(saved_audio).data == sample.data
+
+
+def test_recordings_from_before_the_archive(tmp_path, make_sample):
+    sample = make_sample()
+    sample.save(tmp_path / "old.wav")
+    archive = RecordingArchive(tmp_path / "archive")
+    assert archive.load(tmp_path / "old.wav").data == sample.data
+    assert archive.load(tmp_path / "missing.wav") is None
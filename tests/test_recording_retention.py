@@ -0,0 +1,111 @@
+import datetime
+from pathlib import Path
+
+from core.config import ConfigDataDO
+from core.recording_archive import RecordingArchive
+from core.recording_retention import RecordingRetention
+from core.scoring_serialization import ScoreDO
+
+
+def make_recordings(make_sample, directory, ages_and_accuracies) -> list[ScoreDO]:
+    now = datetime.datetime.now()
+    scores = []
+    for i, (age_days, accuracy) in enumerate(ages_and_accuracies):
+        saved_audio = directory / f"answer-{i}.wav"
+        make_sample().save(saved_audio)
+        scores.append(
+            ScoreDO(
+                correct_accuracy=accuracy,
+                timestamp=now - datetime.timedelta(days=age_days),
+                saved_audio=saved_audio,
+            )
+        )
+    return scores
+
+
+def test_old_recordings_are_evicted(tmp_path, make_sample):
+    scores = make_recordings(
+        make_sample, tmp_path, [(100, 0.9), (100, 0.2), (50, 0.9), (1, 0.9)]
+    )
+    archive = RecordingArchive(tmp_path, "wav")
+    retention = RecordingRetention(archive, max_age_days=30, references=lambda: scores)
+    assert retention.step() == 2
+    assert retention.step() == 0
+
+    kept = [archive.load(score.saved_audio) is not None for score in scores]
+    assert kept == [False, True, False, True]
+    assert [score.saved_audio.exists() for score in scores] == kept
+    assert archive.total_size == sum(
+        score.saved_audio.stat().st_size
+        for score in scores
+        if score.saved_audio.exists()
+    )
+    # The references are adopted once, and the index remembers it.
+    assert RecordingArchive(tmp_path, "wav").references_adopted
+
+
+def test_size_budget_downsamples_then_evicts(tmp_path, make_sample):
+    scores = make_recordings(
+        make_sample, tmp_path, [(30, 0.9), (20, 0.9), (15, 0.9), (1, 0.9)]
+    )
+    archive = RecordingArchive(tmp_path, "wav")
+    full_size = scores[0].saved_audio.stat().st_size
+    retention = RecordingRetention(
+        archive, max_bytes=4 * full_size - 2 * full_size // 3, references=lambda: scores
+    )
+    assert retention.step() == 2
+    entries = [archive.entry(score.saved_audio) for score in scores]
+    assert [entry.downsampled for entry in entries] == [True, True, False, False]
+    assert entries[0].frame_rate == 16000
+    assert len(archive.load(scores[0].saved_audio).data) < full_size
+
+    retention = RecordingRetention(archive, max_bytes=2 * full_size)
+    while retention.step() > 0:
+        pass
+    entries = [archive.entry(score.saved_audio) for score in scores]
+    assert [entry.evicted for entry in entries] == [True, False, False, False]
+    assert entries[2].downsampled
+    assert not entries[3].downsampled  # Recent
+    assert archive.total_size <= 2 * full_size
+
+
+def test_legacy_and_archived_recordings_are_handled_oldest_first(tmp_path, make_sample):
+    archive = RecordingArchive(tmp_path, "wav")
+    now = datetime.datetime.now()
+    # Archived before the legacy WAVs are adopted, so it comes first in the index, but it is not the oldest.
+    archived = tmp_path / "archived.wav"
+    archive.add(make_sample(), archived).timestamp = now - datetime.timedelta(days=20)
+    legacy = make_recordings(make_sample, tmp_path, [(10, 0.9), (40, 0.9), (30, 0.9)])
+    retention = RecordingRetention(
+        archive, max_bytes=1, keep_days=1, references=lambda: legacy
+    )
+    retention.adopt_references()
+
+    changed = []
+    while True:
+        before = {key: entry.model_dump() for key, entry in archive.entries().items()}
+        if retention.step(max_files=1) == 0:
+            break
+        changed += [
+            Path(key)
+            for key, entry in archive.entries().items()
+            if entry.model_dump() != before.get(key)
+        ]
+    order = [
+        legacy[1].saved_audio,
+        legacy[2].saved_audio,
+        archived,
+        legacy[0].saved_audio,
+    ]
+    # Downsampled, then evicted, each time the oldest first.
+    assert changed == order + order
+
+
+def test_retention_is_opt_in(tmp_path):
+    config = ConfigDataDO(recordings_directory=tmp_path)
+    assert (
+        config.recordings_max_bytes is None and config.recordings_max_age_days is None
+    )
+    config.start_recording_retention()
+    assert config._recording_retention is None
+    config.close_storage()
@@ -0,0 +1,46 @@
+from core.rescore import load_checkpoint, make_report, rescore_history
+from core.scoring_serialization import ScoreDO, ScoreHistoryDO
+
+CORRECT = "Ala ma kota, a kot ma Alę."
+
+
+def test_rescore_history(tmp_path):
+    history = ScoreHistoryDO(
+        history=[
+            ScoreDO(
+                correct_sentence=CORRECT,
+                respeak_sentence=CORRECT,
+                user_answer="Ala ma kota a kot ma psa",
+                correct_words=[True] * 7,
+                respeak_words=[True] * 7,
+            ),
+            ScoreDO(user_answer="An old arcade answer, without the sentences"),
+            ScoreDO(
+                correct_sentence=CORRECT,
+                respeak_sentence=CORRECT,
+                user_answer="Ala ma kota, a kot ma Alę",
+            ),
+        ]
+    )
+    checkpoint_file = tmp_path / "checkpoint.jsonl"
+    progress = []
+    rescored = rescore_history(
+        history,
+        checkpoint_file,
+        chunk_size=1,
+        max_workers=1,
+        progress=lambda done, total: progress.append((done, total)),
+    )
+    assert sorted(rescored) == [0, 2]
+    assert progress == [(1, 2), (2, 2)]
+    assert rescored[0].correct_words == [True] * 6 + [False]
+    assert rescored[2].correct_words == [True] * 7
+    assert rescored[2].correct_accuracy == 1.0
+    assert load_checkpoint(checkpoint_file) == rescored
+
+    # Nothing left to do when resumed.
+    assert rescore_history(history, checkpoint_file, max_workers=1) == rescored
+
+    report = make_report(history, rescored)
+    assert report.startswith("Entries: 3, re-scored: 2, skipped: 1, changed: 2")
+    assert "correct_words: ale ✓→✗" in report
@@ -0,0 +1,99 @@
+import datetime
+
+from core import score_journal
+from core.score_journal import ScoreJournal, migrate_history_json
+from core.scoring_serialization import ScoreDO, ScoreHistoryDO
+
+
+def make_score(i: int) -> ScoreDO:
+    return ScoreDO(correct_sentence=f"Zdanie {i % 3}.", user_answer=f"zdanie {i}")
+
+
+def test_append_and_load(tmp_path):
+    journal = ScoreJournal(tmp_path / "history.jsonl", fsync_every=2)
+    assert journal.load().history == []
+    for i in range(5):
+        journal.append(make_score(i))
+    journal.close()
+
+    history = ScoreJournal(tmp_path / "history.jsonl").load()
+    assert [s.user_answer for s in history.history] == [f"zdanie {i}" for i in range(5)]
+    assert len(history.scores_by_sentence("Zdanie 1.")) == 2
+
+
+def test_truncated_line(tmp_path):
+    journal = ScoreJournal(tmp_path / "history.jsonl")
+    journal.load()
+    journal.append(make_score(0))
+    journal.close()
+    with (tmp_path / "history.jsonl").open("a") as f:
+        f.write('{"user_answer": "cut sh')
+
+    journal = ScoreJournal(tmp_path / "history.jsonl")
+    assert len(journal.load().history) == 1
+    journal.append(make_score(1))
+    journal.close()
+    assert len(ScoreJournal(tmp_path / "history.jsonl").load().history) == 2
+
+
+def test_compaction(tmp_path):
+    journal = ScoreJournal(tmp_path / "history.jsonl", compact_every=3)
+    history = journal.load()
+    for i in range(4):
+        score = make_score(i)
+        history.add_score(score, score.correct_sentence)
+        journal.append(score)
+        if journal.needs_compaction:
+            journal.compact(history)
+    journal.close()
+    assert len(journal.snapshot_file.read_text().splitlines()) == 1 + 3
+    assert len(journal.journal_file.read_text().splitlines()) == 1 + 1
+    assert len(ScoreJournal(tmp_path / "history.jsonl").load().history) == 4
+
+    # A compaction interrupted after the snapshot was replaced: the old journal must not be replayed.
+    old_journal = journal.journal_file.read_text()
+    journal.compact(history)
+    journal.journal_file.write_text(old_journal)
+    assert len(ScoreJournal(tmp_path / "history.jsonl").load().history) == 4
+
+
+def test_migration(tmp_path):
+    history_file = tmp_path / "history.json"
+    old = ScoreHistoryDO(history=[make_score(i) for i in range(3)])
+    history_file.write_text(old.model_dump_json(indent=4))
+
+    journal = ScoreJournal(tmp_path / "history.jsonl")
+    assert migrate_history_json(history_file, journal)
+    assert not migrate_history_json(history_file, journal)
+    assert journal.load().history == old.history
+
+
+def test_windowed_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(score_journal, "_SCAN_BLOCK", 7)  # Lines span many blocks
+    start = datetime.datetime(2024, 6, 1)
+    scores = [
+        ScoreDO(
+            user_answer=f'"timestamp":"{i}"',
+            timestamp=start + datetime.timedelta(days=i),
+        )
+        for i in range(10)
+    ]
+    journal = ScoreJournal(tmp_path / "history.jsonl")
+    journal.compact(ScoreHistoryDO(history=scores[:8]))
+    journal.append(scores[8])
+    journal.close()
+
+    for since_day, loaded in [(6, 6), (0, 0), (20, 8)]:
+        journal = ScoreJournal(tmp_path / "history.jsonl")
+        history = journal.load(start + datetime.timedelta(days=since_day))
+        assert history.history == scores[loaded:9]
+        assert list(history.older_scores()) == scores[:loaded]
+        journal.close()
+
+    # Compacting the windowed history keeps the older answers.
+    journal = ScoreJournal(tmp_path / "history.jsonl")
+    history = journal.load(start + datetime.timedelta(days=6))
+    history.add_score(scores[9], "")
+    journal.compact(history)
+    assert list(history.older_scores()) == scores[:6]
+    assert ScoreJournal(tmp_path / "history.jsonl").load().history == scores
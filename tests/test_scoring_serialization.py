@@ -0,0 +1,42 @@
+import datetime
+
+from core.scoring_serialization import ScoreDO, ScoreHistoryDO
+
+NOW = datetime.datetime(2024, 6, 1, 12, 0)
+
+
+def make_score(sentence: str, days_ago: float) -> ScoreDO:
+    return ScoreDO(
+        correct_sentence=sentence, timestamp=NOW - datetime.timedelta(days=days_ago)
+    )
+
+
+def test_index_rebuilt_on_load():
+    history = ScoreHistoryDO(
+        history=[make_score("a", 20), make_score("b", 10), make_score("a", 1)]
+    )
+    loaded = ScoreHistoryDO.model_validate_json(history.model_dump_json())
+    assert len(loaded.scores_by_sentence("a")) == 2
+    assert len(loaded.scores_by_sentence("b")) == 1
+    assert loaded.scores_by_sentence("c") == []
+
+
+def test_scores_since():
+    history = ScoreHistoryDO()
+    history.add_score(make_score("a", 20), "a")
+    history.add_score(make_score("a", 1), "a")
+    since = NOW - datetime.timedelta(days=14)
+    assert [s.timestamp for s in history.scores_since(since, "a")] == [
+        NOW - datetime.timedelta(days=1)
+    ]
+
+    # Kept up to date after the index was built, also for the answers out of order.
+    history.add_score(make_score("a", 5), "a")
+    history.add_score(ScoreDO(timestamp=NOW - datetime.timedelta(days=3)), "b")
+    assert [s.timestamp for s in history.scores_since(since, "a")] == [
+        NOW - datetime.timedelta(days=5),
+        NOW - datetime.timedelta(days=1),
+    ]
+    assert len(history.scores_since(since)) == 3
+    assert history.scores_by_sentence("b")[0].correct_sentence == "b"
+    assert history.scores_since(since, "c") == []
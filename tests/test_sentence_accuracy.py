@@ -0,0 +1,94 @@
+from core.sentence_accuracy import (
+    MatchingContext,
+    PreparedSentence,
+    add_space_tokens,
+    anchored_matching_blocks,
+    find_anchors,
+    get_matching_blocks,
+    make_respeak_map,
+    process_pool,
+    score_sentence,
+    score_sentences_batch,
+)
+
+CORRECT = "Życie to jak jazda na rowerze. Aby utrzymać równowagę, musisz się poruszać."
+RESPEAK = "Życie to jak jazda na rowerze. Aby utrzymać równowagę, musisz ją poruszać."
+USER = "Życie to jak jazda na rowerze aby utrzymać równowagę musisz się poruszać"
+
+
+def test_prepared_sentence():
+    prepared = PreparedSentence(CORRECT)
+    assert prepared.spaced_text == "".join(add_space_tokens(prepared.tokens))
+    assert prepared.token_sizes == [len(token) for token in prepared.tokens]
+    assert len(prepared.char_ranges) == len(prepared.tokens)
+    letters = "".join(prepared.tokens)
+    breaks = prepared.token_breaks.tolist()
+    assert [letters[a:b] for a, b in zip(breaks, breaks[1:])] == prepared.tokens
+    assert PreparedSentence("").spaced_text == " "
+    assert PreparedSentence("").token_breaks.tolist() == [0]
+
+
+def test_prepared_sentence_gives_the_same_score():
+    expected = score_sentence(CORRECT, RESPEAK, USER)
+    correct = PreparedSentence(CORRECT)
+    respeak = PreparedSentence(RESPEAK)
+    assert score_sentence(correct, respeak, PreparedSentence(USER)) == expected
+    assert (
+        score_sentence(
+            correct,
+            respeak,
+            USER,
+            correct2respeak_map=make_respeak_map(correct, respeak),
+        )
+        == expected
+    )
+
+
+def test_matching_context():
+    # Correct: "ab cd ef", user: "ab c ef"
+    context = MatchingContext([2, 1, 2, 1, 2], [2, 1, 1, 1, 2])
+    context.add_match(0, 0, 4)  # "ab c"
+    context.add_match(5, 4, 3)  # " ef"
+    context.add_unknowns()
+    # "cd" is half unknown: the tie is won by the earlier (matched) part, but it is not a clean match.
+    assert context.dominant_matches == [0, 1, 2, 3, 4]
+    assert context.cleanly_matched_tokens == [True, True, False, True, True]
+
+
+def test_find_anchors():
+    correct = ["a", " ", "b", " ", "c", " ", "a", " ", "d"]
+    user = ["d", " ", "b", " ", "c", " ", "e"]
+    # "a" is not unique, and "d" is out of order with "b" and "c".
+    assert find_anchors(correct, user) == [(2, 2), (4, 4)]
+    assert find_anchors(correct, []) == []
+
+
+def test_anchored_matching_blocks():
+    correct = PreparedSentence(CORRECT).tokens_spaces
+    user = PreparedSentence(USER).tokens_spaces
+    blocks = anchored_matching_blocks(correct, user)
+    assert tuple(blocks[-1]) == (len("".join(correct)), len("".join(user)), 0)
+    # Here the anchors do not change the alignment.
+    assert [tuple(block) for block in blocks] == [
+        tuple(block) for block in get_matching_blocks("".join(correct), "".join(user))
+    ]
+    # The same when the gaps are aligned in the process pool.
+    parallel = anchored_matching_blocks(correct, user, parallel_cells=0)
+    assert [tuple(block) for block in parallel] == [tuple(block) for block in blocks]
+
+
+def test_score_sentences_batch():
+    triples = [
+        (CORRECT, RESPEAK, USER),
+        ("Ala ma kota.", "Ala ma kota.", "ala ma psa"),
+        (CORRECT, RESPEAK, "Życie to jazda na rowerze"),
+    ]
+    expected = [score_sentence(*triple) for triple in triples]
+    assert score_sentences_batch(triples) == expected
+    assert score_sentences_batch(triples, max_workers=2, chunk_size=1) == expected
+    # The workers are kept for the next batch, whatever its max_workers.
+    pool = process_pool()
+    assert score_sentences_batch(triples, max_workers=3, chunk_size=1) == expected
+    assert score_sentences_batch(triples, chunk_size=1) == expected
+    assert process_pool() is pool
+    assert score_sentences_batch([]) == []
@@ -0,0 +1,92 @@
+import sys
+from pathlib import Path
+
+from core.sentence_breaking import (
+    CLAUSE_END,
+    SENTENCE_END,
+    WORD_BREAK,
+    Box,
+    Penalty,
+    break_paragraph,
+    break_text,
+    main,
+    paragraphs,
+    tokenize,
+)
+from core.util import just_letters
+
+BOOK = Path(__file__).parent.parent / "elf77.txt"
+
+
+def test_tokenize():
+    tokens = list(tokenize("Ala ma kota – i psa. Kot, nie."))
+    boxes = [token.text for token in tokens if isinstance(token, Box)]
+    assert boxes == ["Ala", "ma", "kota –", "i", "psa.", "Kot,", "nie."]
+    costs = [token.cost for token in tokens if isinstance(token, Penalty)]
+    assert costs == [
+        WORD_BREAK,
+        WORD_BREAK,
+        CLAUSE_END,
+        WORD_BREAK,
+        SENTENCE_END,
+        CLAUSE_END,
+        0.0,
+    ]
+    assert tokens[-1].forced
+    # An abbreviation is not the end of a sentence.
+    assert [t.cost for t in tokenize("np. psa") if isinstance(t, Penalty)][
+        0
+    ] == CLAUSE_END
+
+
+def test_paragraphs():
+    lines = ["Pierwszy.\n", "Dalej.\n", "\n", "  \n", "Drugi.\n"]
+    assert [list(p) for p in paragraphs(lines)] == [["Pierwszy.", "Dalej."], ["Drugi."]]
+
+
+def test_breaks_at_the_ends_of_sentences():
+    text = "Ala ma kota. Kot ma Alę, a pies ma budę. Koniec."
+    assert list(break_text([text], 15, 30)) == [
+        "Ala ma kota.",
+        "Kot ma Alę,",
+        "a pies ma budę.",
+        "Koniec.",
+    ]
+    assert list(break_text([text], 40, 80)) == [text]
+
+
+def test_book():
+    with BOOK.open(encoding="utf-8") as f:
+        lines = f.readlines()[:200]
+    pieces = list(break_text(lines, 48, 96))
+    assert " ".join(pieces).split() == " ".join(lines).split()
+    assert all(len(just_letters(piece)) <= 96 for piece in pieces)
+
+    # Emitting the pieces as soon as they are settled does not change the result.
+    text = " ".join(line.strip() for line in lines)
+    streamed = list(break_paragraph(tokenize(text), 48, 96, settle_every=1))
+    whole = list(
+        break_paragraph(tokenize(text), 48, 96, settle_every=10**9, max_buffered=10**9)
+    )
+    assert streamed == whole
+
+    # Forcing the pieces out still gives all the words, in pieces of the allowed length.
+    forced = list(
+        break_paragraph(tokenize(text), 48, 96, settle_every=1, max_buffered=20)
+    )
+    assert " ".join(forced).split() == text.split()
+    assert all(len(just_letters(piece)) <= 96 for piece in forced)
+
+
+def test_long_word():
+    word = "Konstantynopolitańczykowianeczka"
+    assert list(break_text([f"Ala {word} ma."], 5, 10)) == ["Ala", word, "ma."]
+
+
+def test_cli(tmp_path, monkeypatch):
+    book = tmp_path / "book.txt"
+    book.write_text("Ala ma kota.\n\nKot ma Alę.\n", "utf-8")
+    questions_file = tmp_path / "sentences.txt"
+    monkeypatch.setattr(sys, "argv", ["x", str(book), str(questions_file)])
+    main()
+    assert questions_file.read_text("utf-8") == "Ala ma kota.\nKot ma Alę."
@@ -0,0 +1,91 @@
+import datetime
+
+from core.config import ConfigDataDO
+from core.scoring_serialization import ScoreHistoryDO
+from core.storage_json import JsonScoreStorage
+from core.storage_sqlite import SqliteScoreStorage
+from core.write_behind import WriteBehind
+
+
+def test_sqlite_storage(tmp_path, make_score):
+    storage = SqliteScoreStorage(tmp_path / "scores.sqlite3", commit_every=2)
+    history = storage.load_history()
+    for i in range(3):
+        score = make_score(i)
+        history.add_score(score, score.correct_sentence)
+        storage.append_score(score, history)
+    totals = storage.load_total_scores()
+    totals.add_score(make_score(0), increase_story_index=True)
+    storage.close()
+
+    storage = SqliteScoreStorage(tmp_path / "scores.sqlite3")
+    assert storage.load_history().history == history.history
+    assert len(storage.load_history().scores_by_sentence("Zdanie 0.")) == 2
+    assert storage.load_total_scores().model_dump() == totals.model_dump()
+
+    storage.save_history(ScoreHistoryDO(history=history.history[:1]))
+    assert storage.load_history().history == history.history[:1]
+    storage.close()
+
+
+def test_sqlite_rollups_are_saved_incrementally(tmp_path, make_score):
+    storage = SqliteScoreStorage(tmp_path / "scores.sqlite3")
+    write_behind = WriteBehind(debounce=60.0)
+    totals = storage.load_total_scores()
+    totals.set_write_behind(write_behind)
+    for i in range(3):
+        totals.add_score(make_score(i))  # Coalesced into one write
+    write_behind.flush()
+    score = make_score(4)
+    score.timestamp += datetime.timedelta(days=1)
+    totals.add_score(score)
+    write_behind.close()
+    assert storage.load_total_scores().model_dump() == totals.model_dump()
+
+    rebuilt = storage.load_total_scores()
+    rebuilt.set_rollups({}, {"Zdanie 1.": totals.by_sentence["Zdanie 1."]})
+    rebuilt.save()
+    assert storage.load_total_scores().model_dump() == rebuilt.model_dump()
+    storage.close()
+
+
+def test_json_is_imported_into_new_database(tmp_path, make_score):
+    config = ConfigDataDO(
+        history_file=tmp_path / "history.json",
+        history_journal_file=tmp_path / "history.jsonl",
+        scores_file=tmp_path / "scores.json",
+        database_file=tmp_path / "scores.sqlite3",
+    )
+    history = config.load_history()
+    score = make_score(1)
+    history.add_score(score, score.correct_sentence)
+    config.append_history(score, history)
+    config.load_total_scores().add_score(score)
+    config.close_storage()
+
+    config.storage_backend = "sqlite"
+    assert config.load_history(complete=True).history == [score]
+    assert config.load_total_scores().total_questions == 1
+    config.close_storage()
+
+
+def test_windowed_loading(tmp_path, make_score):
+    scores = [make_score(i) for i in range(6)]
+    since = scores[4].timestamp
+    json_storage = JsonScoreStorage(
+        tmp_path / "history.jsonl", tmp_path / "history.json", tmp_path / "scores.json"
+    )
+    sqlite_storage = SqliteScoreStorage(tmp_path / "scores.sqlite3")
+    for storage in [json_storage, sqlite_storage]:
+        storage.save_history(ScoreHistoryDO(history=scores[:5]))
+        history = storage.load_history(since)
+        assert history.history == scores[4:5]
+        assert list(history.older_scores()) == scores[:4]
+
+        # The answers before the window are kept when the windowed history is saved.
+        history.add_score(scores[5], scores[5].correct_sentence)
+        storage.append_score(scores[5], history)
+        storage.save_history(history)
+        assert list(history.all_scores()) == scores
+        assert storage.load_history().history == scores
+        storage.close()
@@ -0,0 +1,91 @@
+from core.config import ConfigDataDO
+from core.iface_scoring import IRespeak
+from core.question_index import QuestionEntryDO
+from core.question_store import QuestionStore
+from core.scoring_arcade import Scoring_Arcade
+from core.scoring_story import Scoring_Story
+from core.sentence_accuracy import make_respeak_map
+from core.story_bundle import StoryBundle, build_story_bundle
+
+TEXT = "Ala ma kota.\n\nKot ma Alę.\nAla ma kota.\nPies je kość."
+
+
+class LowercaseRespeak(IRespeak):
+    def respeak(self, text: str) -> tuple[bool, str]:
+        return True, text.lower().rstrip(".")
+
+
+def make_bundle_config(
+    make_config, respeak: IRespeak | None = None, **kwargs
+) -> ConfigDataDO:
+    config = make_config(questions=TEXT, **kwargs)
+    config.story_bundle_file = config.questions_file.with_name("sentences.bundle.bin")
+    build_story_bundle(config.questions_file, config.story_bundle_file, respeak)
+    config.questions_file.unlink()  # The bundle is all the client needs
+    return config
+
+
+def test_bundle_matches_the_questions_file(tmp_path):
+    questions_file = tmp_path / "sentences.txt"
+    questions_file.write_text(TEXT, "utf-8")
+    store = QuestionStore(questions_file)
+    build_story_bundle(questions_file, tmp_path / "bundle.bin", LowercaseRespeak())
+    bundle = StoryBundle(tmp_path / "bundle.bin")
+
+    assert list(bundle) == list(store)
+    assert [bundle.sentence_id(line) for line in range(len(bundle))] == [
+        store.sentence_id(line) for line in range(len(store))
+    ]
+    assert bundle.unique_sentences() == store.unique_sentences()
+    for sentence in store.unique_sentences():
+        assert (
+            bundle.entry(sentence).model_dump()
+            == QuestionEntryDO.from_sentence(sentence).model_dump()
+        )
+    assert bundle.entry("Nie ma mnie.") is None
+
+    assert bundle.respeak_transcripts() == {
+        "Ala ma kota.": "ala ma kota",
+        "Kot ma Alę.": "kot ma alę",
+        "Pies je kość.": "pies je kość",
+    }
+    assert bundle.respeak_map("Kot ma Alę.", "kot ma alę") == make_respeak_map(
+        "Kot ma Alę.", "kot ma alę"
+    )
+    assert bundle.respeak_map("Kot ma Alę.", "kot ma ale") is None
+
+
+def test_bundle_without_respeak(tmp_path):
+    questions_file = tmp_path / "sentences.txt"
+    questions_file.write_text(TEXT, "utf-8")
+    build_story_bundle(questions_file, tmp_path / "bundle.bin")
+    bundle = StoryBundle(tmp_path / "bundle.bin")
+    assert bundle.respeak_transcripts() == {}
+    assert bundle.respeak_map("Kot ma Alę.", "kot ma alę") is None
+    assert bundle.entry("Kot ma Alę.").tokens == ["kot", "ma", "ale"]
+
+
+def test_modes_read_the_bundle(tmp_path, make_config):
+    config = make_bundle_config(make_config, LowercaseRespeak())
+    story = Scoring_Story(config)
+    story.set_next_sentence(2)
+    assert story.get_next_sentence() == "Kot ma Alę."
+    assert story.get_char_ranges("Kot ma Alę.") == [(0, 3), (4, 6), (7, 10)]
+    score = story.set_sentence_answer(
+        "Kot ma Alę.", "kot ma alę", "kot ma alę", 1.0, 2.0, tmp_path / "a.wav"
+    )
+    assert score.correct_words == [True, True, True]
+    config.close_storage()
+
+    config = make_bundle_config(make_config, story_mode=False)
+    arcade = Scoring_Arcade(config)
+    assert sorted(sentence for _, sentence in arcade.sentence_scores()) == [
+        "",
+        "Ala ma kota.",
+        "Kot ma Alę.",
+        "Pies je kość.",
+    ]
+    assert arcade.question_index.entry("Pies je kość.").timeout == (
+        QuestionEntryDO.from_sentence("Pies je kość.").timeout
+    )
+    config.close_storage()
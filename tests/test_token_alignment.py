@@ -0,0 +1,117 @@
+import numpy as np
+
+from core.alignment_backends import (
+    AUTO_BACKEND,
+    get_backend_counters,
+    reset_backend_counters,
+    select_backend,
+    set_default_backend,
+)
+from core.sentence_accuracy import (
+    TOKEN_MATCHER,
+    map_prepared_words,
+    prepare_sentence,
+    word_mapper,
+)
+from core.token_alignment import TokenVocabulary, align_token_ids, word_mapper_tokens
+
+
+def test_vocabulary():
+    vocabulary = TokenVocabulary()
+    assert vocabulary.intern("kot") == vocabulary.intern("kot") == 0
+    assert vocabulary.intern("kat") == 1
+    assert vocabulary.word(1) == "kat"
+    assert vocabulary.substitution_cost(0, 0) == 0.0
+    assert vocabulary.substitution_cost(0, 1) == 1 / 3
+    assert vocabulary.substitution_cost(0, vocabulary.intern(" ")) == 1.0
+
+    costs = vocabulary.substitution_costs(
+        vocabulary.intern_tokens(["kot", "kat", "kot"]),
+        vocabulary.intern_tokens(["kat", "kot"]),
+    )
+    assert costs.shape == (3, 2)
+    assert costs.tolist() == [[1 / 3, 0], [0, 1 / 3], [1 / 3, 0]]
+
+
+def test_word_mapper_tokens():
+    vocabulary = TokenVocabulary()
+    correct = ["ala", " ", "ma", " ", "kota"]
+    dominant, clean = word_mapper_tokens(correct, correct, vocabulary)
+    assert dominant == [0, 1, 2, 3, 4]
+    assert clean == [True] * 5
+
+    # A missing word, and a misread one.
+    dominant, clean = word_mapper_tokens(correct, ["ala", " ", "kot"], vocabulary)
+    assert dominant == [0, -1, -1, 1, 2]
+    assert clean == [True, False, False, True, False]
+
+    dominant, clean = word_mapper_tokens(correct, [], vocabulary)
+    assert dominant == [-1] * 5
+    assert clean == [False] * 5
+
+
+def test_token_matcher():
+    correct = prepare_sentence("Ala ma kota, a kot ma Alę.")
+    user = prepare_sentence("ala ma kot a kot ma ola")
+    dominant, clean = map_prepared_words(correct, user, TOKEN_MATCHER)
+    assert len(dominant) == len(clean) == len(correct.tokens_spaces)
+    assert (dominant, clean) == word_mapper(
+        correct.tokens_spaces, user.tokens_spaces, TOKEN_MATCHER
+    )
+    assert [token for token, ok in zip(correct.tokens_spaces, clean) if not ok] == [
+        "kota",
+        "ale",
+    ]
+
+
+def _reference_cost(costs: np.ndarray) -> float:
+    m, n = costs.shape
+    d = [
+        [float(i + j) if i == 0 or j == 0 else 0.0 for j in range(n + 1)]
+        for i in range(m + 1)
+    ]
+    for i in range(1, m + 1):
+        for j in range(1, n + 1):
+            d[i][j] = min(
+                d[i - 1][j - 1] + costs[i - 1, j - 1], d[i - 1][j] + 1, d[i][j - 1] + 1
+            )
+    return d[m][n]
+
+
+def test_align_token_ids_is_optimal():
+    rng = np.random.default_rng(7)
+    for _ in range(2000):
+        m, n = rng.integers(0, 9, size=2)
+        # Multiples of 0.1 have many ties and are not exact in binary, like the normalized distances.
+        costs = rng.integers(0, 11, size=(m, n)) / 10
+        pairs = align_token_ids(np.arange(m), np.arange(n), costs)
+        assert all(a[0] < b[0] and a[1] < b[1] for a, b in zip(pairs, pairs[1:]))
+        cost = sum(costs[i, j] for i, j in pairs) + (m - len(pairs)) + (n - len(pairs))
+        assert abs(cost - _reference_cost(costs)) < 1e-9
+
+
+def test_clean_matches_follow_word_mapper():
+    # A token is clean when (almost) all of its characters match, in both engines.
+    for correct, user in [
+        (["ala", " ", "ma", " ", "kot"], ["ala", " ", "ma", " ", "koty"]),
+        (["pies", " ", "je"], ["piesek", " ", "je"]),
+        (["kot", " ", "je"], ["kto", " ", "je"]),
+    ]:
+        assert word_mapper_tokens(correct, user, TokenVocabulary()) == word_mapper(
+            correct, user
+        )
+
+
+def test_token_backend_is_the_default():
+    correct = prepare_sentence("Ala ma kota.")
+    user = prepare_sentence("ala ma kot")
+    reset_backend_counters()
+    set_default_backend(TOKEN_MATCHER)
+    try:
+        assert select_backend(10, 10) == "difflib"  # The character alignments
+        assert map_prepared_words(correct, user) == map_prepared_words(
+            correct, user, TOKEN_MATCHER
+        )
+        assert get_backend_counters()[TOKEN_MATCHER].calls == 2
+    finally:
+        set_default_backend(AUTO_BACKEND)
@@ -0,0 +1,71 @@
+import time
+
+from core.config import ConfigDataDO
+from core.scoring_serialization import ScoreDO
+from core.write_behind import WriteBehind
+
+
+def test_marks_are_coalesced_and_written_on_close():
+    written = []
+    write_behind = WriteBehind(debounce=60.0)
+    for i in range(5):
+        write_behind.mark_dirty("a", lambda i=i: written.append(("a", i)))
+    write_behind.mark_dirty("b", lambda: written.append(("b", 0)))
+    assert written == []
+    assert write_behind.pending == 2
+
+    write_behind.close()
+    assert written == [("a", 4), ("b", 0)]
+    metrics = write_behind.metrics()
+    assert metrics.writes == 2
+    assert metrics.coalesced == 4
+    assert metrics.flushes == 1
+
+
+def test_background_flush_after_debounce():
+    written = []
+    write_behind = WriteBehind(debounce=0.05)
+    write_behind.mark_dirty("a", lambda: written.append("a"))
+    deadline = time.monotonic() + 5.0
+    while written == [] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert written == ["a"]
+    assert write_behind.pending == 0
+    write_behind.close()
+    assert written == ["a"]
+
+
+def test_failed_write_is_counted():
+    def fail():
+        raise OSError("disk full")
+
+    write_behind = WriteBehind(debounce=60.0)
+    write_behind.mark_dirty("a", fail)
+    write_behind.close()
+    assert write_behind.metrics().errors == 1
+    assert write_behind.metrics().writes == 0
+
+
+def test_total_scores_are_written_behind(tmp_path):
+    config = ConfigDataDO(
+        history_journal_file=tmp_path / "history.jsonl",
+        history_file=tmp_path / "history.json",
+        scores_file=tmp_path / "scores.json",
+        save_debounce_seconds=60.0,
+    )
+    total_score = config.load_total_scores()
+    for _ in range(3):
+        total_score.add_score(ScoreDO(correct_accuracy=1.0), True)
+    assert not (tmp_path / "scores.json").exists()
+
+    config.save_later(tmp_path / "config.json")
+    config.close_storage()
+    saved = config.load_total_scores()
+    assert saved.total_questions == 3
+    assert saved.story_index == 3
+    assert (tmp_path / "config.json").exists()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "config.json",
+        "scores.json",
+    ]
+    config.close_storage()